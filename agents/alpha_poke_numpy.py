@@ -0,0 +1,145 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# AlphaPoke agent running an exported policy without TensorFlow
+import os
+
+from code_extractor import load_code
+from functools import lru_cache
+from poke_env.environment.abstract_battle import AbstractBattle
+from poke_env.player.battle_order import BattleOrder
+from poke_env.player.player import Player
+from types import SimpleNamespace
+from typing import Callable, List, Optional
+
+from agents.utils.alpha_poke_embedding import (
+    embed_single_battle,
+    single_battle_embedding,
+)
+from agents.utils.numpy_policy import (
+    ACTION_MASK_FEATURE,
+    flatten_layout,
+    load_numpy_policy,
+    masked_argmax,
+    save_observations,
+)
+from utils.action_to_move_function import (
+    get_int_action_to_move,
+    get_int_action_space_size,
+)
+
+
+class AlphaPokeNumpyPlayer(Player):
+    def __init__(self, model: str, record_observations: bool = False, *args, **kwargs):
+        if model is None:
+            raise ValueError("Expected model to be not None")
+        super().__init__(*args, **kwargs)
+        self.policy = load_numpy_policy(model)
+        format_lowercase = self.format.lower()
+        double = (
+            "vgc" in format_lowercase
+            or "double" in format_lowercase
+            or "metronome" in format_lowercase
+        )
+        self.action_to_move_func = get_int_action_to_move(self.format, double)
+        self.space_size = get_int_action_space_size(self.format, double)
+        self.embed_battle_func = None
+        if self.policy.embedding is not None:
+            self.embed_battle_func = load_embed_battle_func(self.policy.embedding)
+        else:
+            check_layout(
+                self.policy.layout,
+                flatten_layout(single_battle_embedding(self.space_size)),
+                model,
+                complete=False,
+            )
+        self.recorded_features = [] if record_observations else None
+        self.recorded_masks = [] if record_observations else None
+
+    def embed_battle(self, battle: AbstractBattle) -> dict:
+        if self.embed_battle_func is not None:
+            return self.embed_battle_func(self, battle)
+        return embed_single_battle(
+            self, battle, self.space_size, self.action_to_move_func
+        )
+
+    def choose_move(self, battle: AbstractBattle) -> BattleOrder:
+        observation = self.embed_battle(battle)
+        features = self.policy.flatten_observation(observation)
+        mask = observation[ACTION_MASK_FEATURE]
+        if self.recorded_features is not None:
+            self.recorded_features.append(features)
+            self.recorded_masks.append(mask)
+        action = int(masked_argmax(self.policy.q_values(features), mask))
+        return self.action_to_move_func(self, action, battle)
+
+    def save_observations(self, path: str):
+        if self.recorded_features is None:
+            raise RuntimeError("This player is not recording its observations")
+        save_observations(path, self.recorded_features, self.recorded_masks)
+
+
+# Frozen embed_battle of a saved AlphaPoke model, to be exported with its network.
+# Models saved without it can only be exported if they match the current embedding
+def get_model_embedding(model: str, layout: List[dict]) -> Optional[str]:
+    sizes = {feature["name"]: feature["size"] for feature in layout}
+    if ACTION_MASK_FEATURE not in sizes.keys():
+        raise ValueError(f"The network of {model} does not take the available actions")
+    player = SimpleNamespace(space_size=sizes[ACTION_MASK_FEATURE])
+    embed_path = os.path.join(model, "embed_battle_func.json")
+    description_path = os.path.join(model, "embedding_description.json")
+    if not os.path.isfile(embed_path) or not os.path.isfile(description_path):
+        check_layout(
+            layout, flatten_layout(single_battle_embedding(player.space_size)), model
+        )
+        return None
+    with open(description_path) as file:
+        description = load_code(file.read())
+    check_layout(layout, flatten_layout(description(player)), model)
+    with open(embed_path) as file:
+        return file.read()
+
+
+# Every input of the network must be a feature of the embedding with the same size.
+# Exported networks must also take every feature of the embedding
+def check_layout(
+    layout: List[dict], embedding_layout: List[dict], model: str, complete=True
+):
+    sizes = {feature["name"]: feature["size"] for feature in embedding_layout}
+    mismatches = [
+        f"{feature['name']} ({feature['size']} inputs, embedding "
+        f"{sizes.get(feature['name'], 'missing')})"
+        for feature in layout
+        if sizes.get(feature["name"]) != feature["size"]
+    ]
+    if complete:
+        inputs = {feature["name"] for feature in layout}
+        mismatches += [
+            f"{name} (missing inputs, embedding {size})"
+            for name, size in sizes.items()
+            if name not in inputs
+        ]
+    if len(mismatches) > 0:
+        raise ValueError(
+            f"The inputs of {model} do not match the embedding: {', '.join(mismatches)}"
+        )
+
+
+# The frozen code is the same for every player of the artifact
+@lru_cache(None)
+def load_embed_battle_func(embedding: str) -> Callable:
+    return load_code(embedding)
@@ -34,8 +34,9 @@ from poke_env.player.player import Player
 from tf_agents.agents import TFAgent
 from tf_agents.drivers.py_driver import PyDriver
 from tf_agents.environments import suite_gym, tf_py_environment
-from tf_agents.policies import TFPolicy, policy_saver, py_tf_eager_policy
+from tf_agents.policies import TFPolicy, policy_saver
 from tf_agents.replay_buffers.replay_buffer import ReplayBuffer
+from tf_agents.specs import tensor_spec
 from tf_agents.trajectories import TimeStep
 from typing import Awaitable, Callable, Iterator, List, Optional, Union, Type, Tuple
 
@@ -113,9 +114,11 @@ class _Env(OpenAIGymEnv):
 class _SavedPolicy:
     def __init__(self, model_path):
         self.policy = tf.saved_model.load(model_path)
-        self.time_step_spec = py_tf_eager_policy.SavedModelPyTFEagerPolicy(
-            model_path, load_specs_from_pbtxt=True
-        ).time_step_spec
+        # Read the specs saved next to the model instead of loading it twice
+        spec_path = os.path.join(model_path, policy_saver.POLICY_SPECS_PBTXT)
+        self.time_step_spec = policy_saver.specs_from_collect_data_spec(
+            tensor_spec.from_pbtxt_file(spec_path)
+        )["time_step_spec"]
 
     def action(self, time_step, state=()):
         new_observation = _SavedPolicy.to_tensor(
@@ -147,6 +150,26 @@ class _SavedPolicy:
         return getattr(self.policy, item)
 
 
+# Loaded policies and embedding functions are shared by all the players of a process
+@lru_cache(None)
+def load_saved_policy(model_path: str) -> _SavedPolicy:
+    return _SavedPolicy(model_path=model_path)
+
+
+@lru_cache(None)
+def load_embedding_functions(model: str) -> Tuple[Callable, Callable]:
+    with open(os.path.join(model, "embed_battle_func.json")) as file:
+        embed_battle_function = load_code(file.read())
+    with open(os.path.join(model, "embedding_description.json")) as file:
+        embedding_description_function = load_code(file.read())
+    return embed_battle_function, embedding_description_function
+
+
+def clear_policy_cache():
+    load_saved_policy.cache_clear()
+    load_embedding_functions.cache_clear()
+
+
 class TFPlayer(Player, ABC):
     def __init__(  # noqa: super().__init__ won't get called as this is a "fake" Player class
         self, model: str = None, test=False, *args, **kwargs
@@ -158,12 +181,11 @@ class TFPlayer(Player, ABC):
         if model is not None:
             print(f"Using model {model}...")
             print("Extracting model embedding functions...")
-            with open(os.path.join(model, "embed_battle_func.json")) as file:
-                embed_battle_function_string = file.read()
-            self.embed_battle_function = load_code(embed_battle_function_string)
-            with open(os.path.join(model, "embedding_description.json")) as file:
-                embedding_description_string = file.read()
-            self.embedding_description = load_code(embedding_description_string)(self)
+            (
+                self.embed_battle_function,
+                embedding_description_function,
+            ) = load_embedding_functions(model)
+            self.embedding_description = embedding_description_function(self)
         kwargs["start_challenging"] = False
         if test:
             print("Testing environment...")
@@ -220,7 +242,7 @@ class TFPlayer(Player, ABC):
             if not tf.saved_model.contains_saved_model(model):
                 raise ValueError("Expected saved model as model parameter.")
             self.can_train = False
-            self.policy = _SavedPolicy(model_path=model)
+            self.policy = load_saved_policy(model)
         if getattr(self.policy, "action", None) is None or not callable(
             self.policy.action
         ):
@@ -25,7 +25,7 @@ from poke_env.environment.abstract_battle import AbstractBattle
 from poke_env.environment.battle import Battle
 from poke_env.player.battle_order import BattleOrder
 from poke_env.player.player import Player
-from typing import Tuple, Callable, List
+from typing import Tuple, Callable, List, Optional
 
 from agents import (
     EPSILON_WHILE_TRAINING_AND_PLAYING,
@@ -34,6 +34,8 @@ from agents import (
     MIN_LEARNING_RATE_WHILE_TRAINING,
 )
 from utils import init_action_space
+from utils.state_encoder import StateEncoder
+from utils.tabular_model import encode_model_states
 
 
 class TrainablePlayer(Player, ABC):
@@ -46,6 +48,9 @@ class TrainablePlayer(Player, ABC):
         self.b_format = kwargs.get("battle_format")
         self.action_to_move_function = self._get_action_to_move_func()
         self.battle_to_state_func = self._get_battle_to_state_func()
+        self.state_encoder = self._get_state_encoder()
+        if self.state_encoder is not None:
+            self.model = encode_model_states(self.model, self.state_encoder)
         self.action_space_size = self._get_action_space_size()
         self.last_state = None
         self.last_action = None
@@ -77,13 +82,17 @@ class TrainablePlayer(Player, ABC):
         return self._action_to_move(action, battle)
 
     def _choose_action(self, state):
-        if state not in self.model.keys():
-            self.model[state] = [
+        value = self.model.get(state)
+        if value is None:
+            value = [
                 init_action_space(self.action_space_size),
                 0,
                 init_action_space(self.action_space_size),
             ]
-        value = self.model[state]
+            # Agents that do not learn share their model with the other agents
+            # loaded from the same file, so they leave it as it is
+            if self.training or self.train_while_playing:
+                self.model[state] = value
         action_space = value[0]
         epsilon = self._get_epsilon(value[1])
         max_value = max(action_space)
@@ -107,12 +116,26 @@ class TrainablePlayer(Player, ABC):
     def _battle_to_state(self, battle: AbstractBattle):
         return self.battle_to_state_func(battle)
 
+    def battles_to_states(self, battles: List[AbstractBattle]) -> List:
+        battles_to_states_func = self._get_battles_to_states_func()
+        if battles_to_states_func is None:
+            return [self._battle_to_state(battle) for battle in battles]
+        return battles_to_states_func(battles)
+
     @abstractmethod
     def _get_battle_to_state_func(
         self,
     ) -> Callable[[AbstractBattle], Tuple[float]]:  # pragma: no cover
         pass
 
+    def _get_battles_to_states_func(
+        self,
+    ) -> Optional[Callable[[List[AbstractBattle]], List]]:
+        return None
+
+    def _get_state_encoder(self) -> Optional[StateEncoder]:
+        return None
+
     @abstractmethod
     def _get_action_to_move_func(
         self,
@@ -188,6 +211,8 @@ class TrainablePlayer(Player, ABC):
             headers.append(h)
         table = [headers]
         for state, actions in model.items():
+            if self.state_encoder is not None:
+                state = self.state_encoder.decode(state)
             to_append = []
             for s in state:
                 to_append.append(s)
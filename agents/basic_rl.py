@@ -16,13 +16,38 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 #
 # AI trained with a simple RL algorithm
+import numpy as np
+
 from poke_env.environment.abstract_battle import AbstractBattle
-from typing import List
+from typing import List, Tuple
 
 from . import VICTORY_REWARD, MON_HP_REWARD, MON_FAINTED_REWARD
 from agents.base_classes.trainable_player import TrainablePlayer
+from agents.utils.battle_features import (
+    damage_multiplier,
+    damage_multipliers,
+    get_type_indexes,
+    sign,
+    type_matchup,
+    type_matchups,
+)
 from utils import InvalidArgument
 from utils.action_to_move_function import action_to_move_gen8single
+from utils.state_encoder import StateEncoder
+
+STATE_ENCODER_GEN8RANDOM = StateEncoder(
+    [
+        (-2, 2),  # stat balance
+        (-1, 1),  # type balance
+        (-1, 1),  # boosts balance
+        (0, 1),  # is dynamaxed
+        (0, 1),  # forced switch
+        (-5, 3),  # move 1 value
+        (-5, 3),  # move 2 value
+        (-5, 3),  # move 3 value
+        (-5, 3),  # move 4 value
+    ]
+)
 
 
 class SimpleRLAgent(TrainablePlayer):
@@ -34,6 +59,22 @@ class SimpleRLAgent(TrainablePlayer):
                 f"{self.b_format} is not a valid battle format for this RL agent"
             )
 
+    def _get_battles_to_states_func(self):
+        if self.b_format == "gen8randombattle":
+            return battles_to_states_gen8random
+        else:
+            raise InvalidArgument(
+                f"{self.b_format} is not a valid battle format for this RL agent"
+            )
+
+    def _get_state_encoder(self):
+        if self.b_format == "gen8randombattle":
+            return STATE_ENCODER_GEN8RANDOM
+        else:
+            raise InvalidArgument(
+                f"{self.b_format} is not a valid battle format for this RL agent"
+            )
+
     def _get_action_to_move_func(self):
         if self.b_format == "gen8randombattle":
             return action_to_move_gen8single
@@ -168,88 +209,99 @@ class SimpleRLAgent(TrainablePlayer):
             )
 
 
-def _battle_to_state_gen8random(battle: AbstractBattle):  # pragma: no cover
-    to_embed = []
-
-    # Battle balance stats
-    player_mon_stats = sum(battle.active_pokemon.base_stats.values())
-    opponent_mon_stats = sum(battle.opponent_active_pokemon.base_stats.values())
-    diff = player_mon_stats - opponent_mon_stats
-    balance = 0
-    if diff < -150:
-        balance = -2
-    elif diff < 0:
-        balance = -1
-    elif diff > 150:
-        balance = 2
-    elif diff > 0:
-        balance = 1
-    to_embed.append(balance)
-
-    # Battle balance damage multipliers
-    player_mon_types = battle.active_pokemon.types
-    opponent_mon_types = battle.opponent_active_pokemon.types
-    player_multiplier = 1.0
-    opponent_multiplier = 1.0
-    for t in player_mon_types:
-        player_multiplier *= battle.opponent_active_pokemon.damage_multiplier(t)
-    for t in opponent_mon_types:
-        opponent_multiplier *= battle.active_pokemon.damage_multiplier(t)
-    player_multiplier = round(player_multiplier)
-    opponent_multiplier = round(opponent_multiplier)
-    type_balance = player_multiplier - opponent_multiplier
-    if type_balance > 0:
-        type_balance = 1
-    elif type_balance < 0:
-        type_balance = -1
-    else:
-        type_balance = 0
-    to_embed.append(type_balance)
-
-    # Boosts balance
-    boosts = 0
-    boosts += sum(battle.active_pokemon.boosts.values())
-    boosts -= sum(battle.opponent_active_pokemon.boosts.values())
-    if boosts > 0:
-        boosts = 1
-    elif boosts < 0:
-        boosts = -1
-    to_embed.append(boosts)
-
-    # Is dynamaxed
-    is_dyna = 0
-    if battle.active_pokemon.is_dynamaxed:
-        is_dyna = 1
-    to_embed.append(is_dyna)
-
-    # Force switch
-    forced_switch = 0
-    if battle.force_switch:
-        forced_switch = 1
-    to_embed.append(forced_switch)
-
-    # Move value
-    move_values = [0, 0, 0, 0]
-    for i, move in enumerate(battle.active_pokemon.moves.values()):
-        if battle.opponent_active_pokemon.damage_multiplier(move.type) > 1.0:
-            move_values[i] += 1
-            if battle.opponent_active_pokemon.damage_multiplier(move.type) > 2.0:
-                move_values[i] += 1
-        else:
-            if battle.opponent_active_pokemon.damage_multiplier(move.type) < 1.0:
-                move_values[i] -= 1
-                if battle.opponent_active_pokemon.damage_multiplier(move.type) < 0.5:
-                    move_values[i] -= 1
-        if move.base_power > 80:
-            move_values[i] += 1
-        if move.base_power == 0:
-            move_values[i] = -3
-            if move.self_boost is not None:
-                advantage_boosts = sum(move.self_boost.values()) >= 0
-                if advantage_boosts:
-                    move_values[i] -= 1
-                else:
-                    move_values[i] -= 2
-    to_embed.extend(move_values)
+# Raw features of a battle, gathered in the same way for one battle or for many:
+# the base stats and boosts differences, the dynamax and forced switch flags, the
+# types of the active pokémon and, for each of the first four moves, its type,
+# base power, whether it is known, whether it boosts the user and by how much
+def _battle_features(battle: AbstractBattle) -> Tuple[list, list, list]:
+    type_indexes = get_type_indexes()
+    active_mon = battle.active_pokemon
+    opponent_mon = battle.opponent_active_pokemon
+    values = [
+        sum(active_mon.base_stats.values()) - sum(opponent_mon.base_stats.values()),
+        sum(active_mon.boosts.values()) - sum(opponent_mon.boosts.values()),
+        int(bool(active_mon.is_dynamaxed)),
+        int(bool(battle.force_switch)),
+    ]
+    types = [
+        [type_indexes[t] for t in active_mon.types],
+        [type_indexes[t] for t in opponent_mon.types],
+    ]
+    moves = [[type_indexes[None], 0, 0, 0, 0] for _ in range(4)]
+    for i, move in enumerate(list(active_mon.moves.values())[:4]):
+        self_boost = move.self_boost
+        moves[i] = [
+            type_indexes[move.type],
+            move.base_power,
+            1,
+            int(self_boost is not None),
+            sum(self_boost.values()) if self_boost is not None else 0,
+        ]
+    return values, types, moves
+
+
+# The discrete features are computed in the same way from single values or from
+# arrays with the values of many battles. The type matchups come already rounded
+def _balances(stat_diff, boosts, matchup, opponent_matchup) -> list:
+    return [
+        sign(stat_diff) + (stat_diff > 150) - (stat_diff < -150),
+        sign(matchup - opponent_matchup),
+        sign(boosts),
+    ]
+
+
+def _move_value(multiplier, base_power, has_move, has_self_boost, self_boost):
+    damaging = (
+        (multiplier > 1.0) * 1
+        + (multiplier > 2.0)
+        - (multiplier < 1.0)
+        - (multiplier < 0.5)
+        + (base_power > 80)
+    )
+    status = -3 - has_self_boost * (1 + (self_boost < 0))
+    is_status = (base_power == 0) * 1
+    return has_move * (is_status * status + (1 - is_status) * damaging)
+
+
+# Same state as battles_to_states_gen8random, without the array overhead on one battle
+def _battle_to_state_gen8random(battle: AbstractBattle) -> int:
+    values, (active_types, opponent_types), moves = _battle_features(battle)
+    stat_diff, boosts, is_dynamaxed, force_switch = values
+    return STATE_ENCODER_GEN8RANDOM.encode(
+        [
+            *_balances(
+                stat_diff,
+                boosts,
+                round(type_matchup(active_types, opponent_types)),
+                round(type_matchup(opponent_types, active_types)),
+            ),
+            is_dynamaxed,
+            force_switch,
+            *[
+                _move_value(damage_multiplier(move_type, opponent_types), *move)
+                for move_type, *move in moves
+            ],
+        ],
+        clamp=True,
+    )
+
 
-    return tuple(to_embed)
+def battles_to_states_gen8random(battles: List[AbstractBattle]) -> List[int]:
+    if len(battles) == 0:
+        return []
+    features = [_battle_features(battle) for battle in battles]
+    values = np.array([battle_values for battle_values, _, _ in features])
+    mon_types = np.array([types for _, types, _ in features])
+    moves = np.array([battle_moves for _, _, battle_moves in features])
+    multipliers = np.round(type_matchups(mon_types, mon_types[:, ::-1]))
+    move_multipliers = damage_multipliers(moves[..., 0], mon_types[:, 1:2])
+    states = np.column_stack(
+        [
+            *_balances(
+                values[:, 0], values[:, 1], multipliers[:, 0], multipliers[:, 1]
+            ),
+            values[:, 2:],
+            _move_value(move_multipliers, *np.moveaxis(moves[..., 1:], -1, 0)),
+        ]
+    )
+    return STATE_ENCODER_GEN8RANDOM.encode_array(states, clamp=True).tolist()
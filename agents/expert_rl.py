@@ -25,16 +25,41 @@
 # 7: offensive switch (switch to a pokémon supereffective against the enemy's active pokémon or really strong)
 # 8: fight predict (use a move predicting a switch)
 # 9: heal
+import numpy as np
 import random
 
 from poke_env.environment.battle import Battle, AbstractBattle
 from poke_env.environment.pokemon_type import PokemonType
 from poke_env.player.battle_order import BattleOrder
 from poke_env.player.player import Player
-from typing import List
+from typing import List, Tuple
 
 from .basic_rl import SimpleRLAgent
+from agents.utils.battle_features import (
+    get_type_indexes,
+    sign,
+    type_matchup,
+    type_matchups,
+)
 from utils import InvalidArgument
+from utils.state_encoder import StateEncoder
+
+STATE_ENCODER_GEN8RANDOM = StateEncoder(
+    [
+        (0, 2),  # player hp
+        (0, 2),  # opponent hp
+        (0, 6),  # fainted pokémons
+        (0, 6),  # opponent fainted pokémons
+        (-1, 1),  # stat balance
+        (-1, 1),  # type balance
+        (-1, 1),  # boosts balance
+        (0, 1),  # is dynamaxed
+        (0, 1),  # forced switch
+        (0, 1),  # can apply status
+        (0, 1),  # can power up
+        (0, 1),  # can heal
+    ]
+)
 
 
 class ExpertRLAgent(SimpleRLAgent):
@@ -46,6 +71,22 @@ class ExpertRLAgent(SimpleRLAgent):
                 f"{self.b_format} is not a valid battle format for this RL agent"
             )
 
+    def _get_battles_to_states_func(self):
+        if self.b_format == "gen8randombattle":
+            return battles_to_states_gen8random
+        else:
+            raise InvalidArgument(
+                f"{self.b_format} is not a valid battle format for this RL agent"
+            )
+
+    def _get_state_encoder(self):
+        if self.b_format == "gen8randombattle":
+            return STATE_ENCODER_GEN8RANDOM
+        else:
+            raise InvalidArgument(
+                f"{self.b_format} is not a valid battle format for this RL agent"
+            )
+
     def _get_action_to_move_func(self):
         if self.b_format == "gen8randombattle":
             return _action_to_move_gen8random
@@ -127,115 +168,93 @@ def _action_to_move_gen8random(
         raise RuntimeError("???")
 
 
-def _battle_to_state_gen8random(battle: AbstractBattle):  # pragma: no cover
-    to_embed = []
-
-    # Player pokémon hp
-    player_hp = 2
-    if battle.active_pokemon.current_hp_fraction < 0.66:
-        player_hp -= 1
-    if battle.active_pokemon.current_hp_fraction < 0.33:
-        player_hp -= 1
-    to_embed.append(player_hp)
-
-    # Opponent pokémon hp
-    opponent_hp = 2
-    if battle.opponent_active_pokemon.current_hp_fraction < 0.66:
-        opponent_hp -= 1
-    if battle.opponent_active_pokemon.current_hp_fraction < 0.33:
-        opponent_hp -= 1
-    to_embed.append(opponent_hp)
-
-    # Fainted pokémons
-    fainted_mons = 0
-    for mon in battle.team.values():
-        if mon.fainted:
-            fainted_mons += 1
-    to_embed.append(fainted_mons)
-
-    # Opponent fainted pokémons
-    opponent_fainted_mons = 0
-    for mon in battle.opponent_team.values():
-        if mon.fainted:
-            opponent_fainted_mons += 1
-    to_embed.append(opponent_fainted_mons)
-
-    # Battle balance stats
-    player_mon_stats = sum(battle.active_pokemon.base_stats.values())
-    opponent_mon_stats = sum(battle.opponent_active_pokemon.base_stats.values())
-    diff = player_mon_stats - opponent_mon_stats
-    balance = 0
-    if diff < -150:
-        balance = -1
-    elif diff > 150:
-        balance = 1
-    to_embed.append(balance)
-
-    # Battle balance damage multipliers
-    player_mon_types = battle.active_pokemon.types
-    opponent_mon_types = battle.opponent_active_pokemon.types
-    player_multiplier = 1.0
-    opponent_multiplier = 1.0
-    for t in player_mon_types:
-        player_multiplier *= battle.opponent_active_pokemon.damage_multiplier(t)
-    for t in opponent_mon_types:
-        opponent_multiplier *= battle.active_pokemon.damage_multiplier(t)
-    type_balance = player_multiplier - opponent_multiplier
-    if type_balance < 0:
-        type_balance = 1
-    elif type_balance > 0:
-        type_balance = -1
-    else:
-        type_balance = 0
-    to_embed.append(type_balance)
-
-    # Boosts balance
-    boost_balance = 0
-    boost_balance += sum(battle.active_pokemon.boosts.values())
-    boost_balance -= sum(battle.opponent_active_pokemon.boosts.values())
-    if boost_balance < 1:
-        boost_balance = -1
-    elif boost_balance > 1:
-        boost_balance = 1
-    else:
-        boost_balance = 0
-    to_embed.append(boost_balance)
-
-    # Is dynamaxed
-    is_dyna = 0
-    if battle.active_pokemon.is_dynamaxed:
-        is_dyna = 1
-    to_embed.append(is_dyna)
-
-    # Force switch
-    forced_switch = 0
-    if battle.force_switch:
-        forced_switch = 1
-    to_embed.append(forced_switch)
-
-    # Can apply status
-    can_status = 0
-    for move in battle.available_moves:
-        if move.status:
-            can_status = 1
-    to_embed.append(can_status)
-
-    # Can power up
-    can_power_up = 0
-    for move in battle.available_moves:
-        if move.self_boost:
-            if sum(move.self_boost.values()) > 0:
-                can_power_up = 1
-    to_embed.append(can_power_up)
-
-    # Can heal
-    can_heal = 0
+# Raw features of a battle, gathered in the same way for one battle or for many:
+# the hp fractions, the fainted pokémons, the base stats and boosts differences,
+# the flags of the state and the types of the active pokémon
+def _battle_features(battle: AbstractBattle) -> Tuple[list, list]:
+    type_indexes = get_type_indexes()
+    active_mon = battle.active_pokemon
+    opponent_mon = battle.opponent_active_pokemon
+    can_status = False
+    can_power_up = False
+    can_heal = False
     for move in battle.available_moves:
-        if move.heal > 0:
-            can_heal = 1
-    to_embed.append(can_heal)
-
-    return tuple(to_embed)
+        can_status = can_status or bool(move.status)
+        can_power_up = can_power_up or bool(
+            move.self_boost and sum(move.self_boost.values()) > 0
+        )
+        can_heal = can_heal or move.heal > 0
+    values = [
+        active_mon.current_hp_fraction,
+        opponent_mon.current_hp_fraction,
+        sum(mon.fainted for mon in battle.team.values()),
+        sum(mon.fainted for mon in battle.opponent_team.values()),
+        sum(active_mon.base_stats.values()) - sum(opponent_mon.base_stats.values()),
+        sum(active_mon.boosts.values()) - sum(opponent_mon.boosts.values()),
+        int(bool(active_mon.is_dynamaxed)),
+        int(bool(battle.force_switch)),
+        int(can_status),
+        int(can_power_up),
+        int(can_heal),
+    ]
+    types = [
+        [type_indexes[t] for t in active_mon.types],
+        [type_indexes[t] for t in opponent_mon.types],
+    ]
+    return values, types
+
+
+# The discrete features are computed in the same way from single values or from
+# arrays with the values of many battles
+def _discrete_features(
+    hp, opponent_hp, stat_diff, boosts, matchup, opponent_matchup
+) -> list:
+    return [
+        2 - (hp < 0.66) - (hp < 0.33),
+        2 - (opponent_hp < 0.66) - (opponent_hp < 0.33),
+        (stat_diff > 150) * 1 - (stat_diff < -150),
+        sign(opponent_matchup - matchup),
+        (boosts > 1) * 1 - (boosts < 1),
+    ]
+
+
+# Same state as battles_to_states_gen8random, without the array overhead on one battle
+def _battle_to_state_gen8random(battle: AbstractBattle) -> int:
+    values, (active_types, opponent_types) = _battle_features(battle)
+    hp, opponent_hp, fainted, opponent_fainted, stat_diff, boosts, *flags = values
+    player_hp, opponent_hp, *balances = _discrete_features(
+        hp,
+        opponent_hp,
+        stat_diff,
+        boosts,
+        type_matchup(active_types, opponent_types),
+        type_matchup(opponent_types, active_types),
+    )
+    return STATE_ENCODER_GEN8RANDOM.encode(
+        [player_hp, opponent_hp, fainted, opponent_fainted, *balances, *flags],
+        clamp=True,
+    )
+
+
+def battles_to_states_gen8random(battles: List[AbstractBattle]) -> List[int]:
+    if len(battles) == 0:
+        return []
+    features = [_battle_features(battle) for battle in battles]
+    values = np.array([battle_values for battle_values, _ in features])
+    mon_types = np.array([types for _, types in features])
+    multipliers = type_matchups(mon_types, mon_types[:, ::-1])
+    hp, opponent_hp, *balances = _discrete_features(
+        values[:, 0],
+        values[:, 1],
+        values[:, 4],
+        values[:, 5],
+        multipliers[:, 0],
+        multipliers[:, 1],
+    )
+    states = np.column_stack(
+        [hp, opponent_hp, values[:, 2:4], *balances, values[:, 6:]]
+    )
+    return STATE_ENCODER_GEN8RANDOM.encode_array(states, clamp=True).tolist()
 
 
 # 1: fight to kill
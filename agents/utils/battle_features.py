@@ -0,0 +1,96 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Type chart helpers shared by the battle-to-state functions of the tabular agents
+import numpy as np
+
+from functools import lru_cache
+from poke_env.data.gen_data import GenData
+from poke_env.environment.pokemon_type import PokemonType
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+@lru_cache(maxsize=None)
+def get_type_chart(gen: int = 8) -> Tuple[np.ndarray, Dict[str, int]]:
+    type_chart = GenData.from_gen(gen).type_chart
+    type_indexes = {name: i for i, name in enumerate(type_chart.keys())}
+    # The last row and column stand for a missing type and are always neutral
+    chart = np.ones((len(type_indexes) + 1, len(type_indexes) + 1))
+    for defender, multipliers in type_chart.items():
+        for attacker, multiplier in multipliers.items():
+            chart[type_indexes[attacker], type_indexes[defender]] = multiplier
+    return chart, type_indexes
+
+
+# Nested lists are faster than the array to read one multiplier at a time
+@lru_cache(maxsize=None)
+def get_type_chart_rows(gen: int = 8) -> List[List[float]]:
+    chart, _ = get_type_chart(gen)
+    return chart.tolist()
+
+
+@lru_cache(maxsize=None)
+def get_type_indexes(gen: int = 8) -> Dict[Optional[PokemonType], int]:
+    _, type_indexes = get_type_chart(gen)
+    indexes = {t: type_indexes.get(t.name, len(type_indexes)) for t in PokemonType}
+    indexes[None] = len(type_indexes)
+    return indexes
+
+
+def type_index(pokemon_type: Optional[PokemonType], gen: int = 8) -> int:
+    return get_type_indexes(gen).get(pokemon_type, get_type_indexes(gen)[None])
+
+
+def damage_multipliers(
+    attack_types: np.ndarray, defender_types: np.ndarray, gen: int = 8
+) -> np.ndarray:
+    chart, _ = get_type_chart(gen)
+    return (
+        chart[attack_types, defender_types[..., 0]]
+        * chart[attack_types, defender_types[..., 1]]
+    )
+
+
+def type_matchups(
+    attacker_types: np.ndarray, defender_types: np.ndarray, gen: int = 8
+) -> np.ndarray:
+    # Product of the multipliers of every attacker type on the defender types
+    chart, _ = get_type_chart(gen)
+    return chart[attacker_types[..., :, None], defender_types[..., None, :]].prod(
+        axis=(-2, -1)
+    )
+
+
+def damage_multiplier(
+    attack_type: int, defender_types: Sequence[int], gen: int = 8
+) -> float:
+    multipliers = get_type_chart_rows(gen)[attack_type]
+    return multipliers[defender_types[0]] * multipliers[defender_types[1]]
+
+
+def type_matchup(
+    attacker_types: Sequence[int], defender_types: Sequence[int], gen: int = 8
+) -> float:
+    multiplier = 1.0
+    for attack_type in attacker_types:
+        multiplier *= damage_multiplier(attack_type, defender_types, gen)
+    return multiplier
+
+
+# Works on single values and on arrays alike
+def sign(value):
+    return (value > 0) * 1 - (value < 0) * 1
@@ -0,0 +1,221 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Inference of exported dense Q-networks with NumPy only
+import json
+import numpy as np
+
+from functools import lru_cache
+from typing import List, Optional, Tuple, Union
+
+ACTIVATIONS = {
+    "elu": lambda x: np.where(x > 0, x, np.expm1(np.minimum(x, 0))),
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0),
+}
+
+ACTION_MASK_FEATURE = "available_actions"
+
+# Rows of an int8 kernel converted to float32 at a time: small blocks stay in cache
+QUANTIZED_BLOCK_ROWS = 128
+
+
+class NumpyPolicy:
+    def __init__(
+        self,
+        kernels: List[np.ndarray],
+        biases: List[np.ndarray],
+        activations: List[str],
+        layout: List[dict],
+        scales: Optional[List[Optional[np.ndarray]]] = None,
+        embedding: Optional[str] = None,
+    ):
+        if scales is None:
+            scales = [None for _ in kernels]
+        if not len(kernels) == len(biases) == len(activations) == len(scales):
+            raise ValueError("Expected a kernel, a bias and an activation per layer")
+        for activation in activations:
+            if activation not in ACTIVATIONS.keys():
+                raise ValueError(f"{activation} is not a supported activation")
+        self.kernels = kernels
+        self.biases = biases
+        self.activations = activations
+        self.layout = layout
+        self.scales = scales
+        # Frozen embed_battle of the model, as extracted by code_extractor
+        self.embedding = embedding
+        self.input_size = sum(feature["size"] for feature in layout)
+        if kernels[0].shape[0] != self.input_size:
+            raise ValueError(
+                f"The network expects {kernels[0].shape[0]} inputs but the "
+                f"layout describes {self.input_size}"
+            )
+
+    @staticmethod
+    def load(path: str) -> "NumpyPolicy":
+        with np.load(path) as artifact:
+            layers = int(artifact["layers"])
+            kernels = [artifact[f"kernel_{i}"] for i in range(layers)]
+            biases = [artifact[f"bias_{i}"] for i in range(layers)]
+            activations = json.loads(str(artifact["activations"]))
+            layout = json.loads(str(artifact["layout"]))
+            scales = [
+                artifact[f"scale_{i}"] if f"scale_{i}" in artifact.files else None
+                for i in range(layers)
+            ]
+            embedding = None
+            if "embedding" in artifact.files:
+                embedding = str(artifact["embedding"])
+        return NumpyPolicy(kernels, biases, activations, layout, scales, embedding)
+
+    def save(self, path: str):
+        arrays = {"layers": np.array(len(self.kernels))}
+        for i, (kernel, bias) in enumerate(zip(self.kernels, self.biases)):
+            arrays[f"kernel_{i}"] = kernel
+            arrays[f"bias_{i}"] = bias
+            if self.scales[i] is not None:
+                arrays[f"scale_{i}"] = self.scales[i]
+        arrays["activations"] = np.array(json.dumps(self.activations))
+        arrays["layout"] = np.array(json.dumps(self.layout))
+        if self.embedding is not None:
+            arrays["embedding"] = np.array(self.embedding)
+        np.savez_compressed(path, **arrays)
+
+    def flatten_observation(self, observation: dict) -> np.ndarray:
+        features = np.empty(self.input_size, dtype=np.float32)
+        start = 0
+        for feature in self.layout:
+            value = observation
+            for key in feature["name"].split("/"):
+                value = value[key]
+            value = np.asarray(value, dtype=np.float32).reshape(-1)
+            if value.size != feature["size"]:
+                raise ValueError(
+                    f"Expected {feature['size']} values for {feature['name']}. "
+                    f"Got {value.size}"
+                )
+            features[start : start + value.size] = value
+            start += value.size
+        return features
+
+    @property
+    def quantized(self) -> bool:
+        return any(scale is not None for scale in self.scales)
+
+    def q_values(self, features: np.ndarray) -> np.ndarray:
+        values = features
+        for i, activation in enumerate(self.activations):
+            values = ACTIVATIONS[activation](self._dense(i, values) + self.biases[i])
+        return values
+
+    def _dense(self, layer: int, values: np.ndarray) -> np.ndarray:
+        kernel = self.kernels[layer]
+        # Battle embeddings are mostly one-hot encodings, so the first layer of a
+        # single observation only needs the kernel rows of its non-zero features
+        if layer == 0 and values.ndim == 1:
+            non_zero = np.flatnonzero(values)
+            values = values[non_zero]
+            kernel = kernel[non_zero]
+        scale = self.scales[layer]
+        if scale is None:
+            return values @ kernel
+        result = 0
+        for start in range(0, kernel.shape[0], QUANTIZED_BLOCK_ROWS):
+            end = start + QUANTIZED_BLOCK_ROWS
+            block = kernel[start:end].astype(np.float32)
+            result = result + values[..., start:end] @ block
+        return result * scale
+
+    def action(
+        self, observation: dict, mask: Optional[Union[List, np.ndarray]] = None
+    ) -> int:
+        if mask is None and ACTION_MASK_FEATURE in observation.keys():
+            mask = observation[ACTION_MASK_FEATURE]
+        q_values = self.q_values(self.flatten_observation(observation))
+        return int(masked_argmax(q_values, mask))
+
+    def quantize(self) -> "NumpyPolicy":
+        kernels, scales = [], []
+        for kernel in self.kernels:
+            quantized_kernel, scale = quantize_kernel(kernel)
+            kernels.append(quantized_kernel)
+            scales.append(scale)
+        return NumpyPolicy(
+            kernels, self.biases, self.activations, self.layout, scales, self.embedding
+        )
+
+
+# Same order as tf.nest.flatten, which is what the networks concatenate. Works on
+# both the saved tensor specs and the gym spaces of the embeddings
+def flatten_layout(spec, name: str = "") -> List[dict]:
+    spaces = getattr(spec, "spaces", None)
+    if isinstance(spaces, dict):
+        spec = spaces
+    if isinstance(spec, dict):
+        layout = []
+        for key in sorted(spec.keys()):
+            layout += flatten_layout(spec[key], f"{name}/{key}" if name else key)
+        return layout
+    return [{"name": name, "size": int(np.prod(spec.shape))}]
+
+
+def quantize_kernel(kernel: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # One scale per output unit, so that small and large units keep their precision
+    scale = np.abs(kernel).max(axis=0) / 127
+    scale[scale == 0] = 1
+    quantized_kernel = np.clip(np.rint(kernel / scale), -127, 127).astype(np.int8)
+    return quantized_kernel, scale.astype(np.float32)
+
+
+def masked_argmax(
+    q_values: np.ndarray, mask: Optional[Union[List, np.ndarray]] = None
+) -> np.ndarray:
+    if mask is not None:
+        q_values = np.where(np.asarray(mask) > 0, q_values, -np.inf)
+    return np.argmax(q_values, axis=-1)
+
+
+def action_agreement(
+    policy: NumpyPolicy,
+    other: NumpyPolicy,
+    features: np.ndarray,
+    masks: Optional[np.ndarray] = None,
+) -> float:
+    if len(features) == 0:
+        raise ValueError("Expected at least one observation")
+    agreements = 0
+    for i in range(len(features)):
+        mask = masks[i] if masks is not None else None
+        action = masked_argmax(policy.q_values(features[i]), mask)
+        other_action = masked_argmax(other.q_values(features[i]), mask)
+        agreements += int(action == other_action)
+    return agreements / len(features)
+
+
+def save_observations(path: str, features: List[np.ndarray], masks: List[np.ndarray]):
+    np.savez_compressed(path, features=np.stack(features), masks=np.stack(masks))
+
+
+def load_observations(path: str) -> Tuple[np.ndarray, np.ndarray]:
+    with np.load(path) as observations:
+        return observations["features"], observations["masks"]
+
+
+# Exported policies are read-only, so all the players of a process can share them
+@lru_cache(None)
+def load_numpy_policy(path: str) -> NumpyPolicy:
+    return NumpyPolicy.load(path)
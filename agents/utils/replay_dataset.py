@@ -0,0 +1,464 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Offline AlphaPoke transitions reconstructed from saved battle logs and replays.
+# Replays do not contain the requests of the players, so they are rebuilt from what
+# the whole log reveals about each side: the team, the used moves and dynamax.
+import json
+import logging
+import numpy as np
+import os
+import re
+
+from multiprocessing import Pool
+from poke_env.data import GenData
+from poke_env.environment.battle import Battle
+from poke_env.environment.move import Move
+from poke_env.environment.move_category import MoveCategory
+from poke_env.player.player import Player
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from agents.utils.alpha_poke_embedding import embed_single_battle
+from utils.action_to_move_function import (
+    action_to_move_gen8single,
+    get_int_action_space_size,
+)
+
+REPLAY_LOG = re.compile(
+    r'<script type="text/plain" class="battle-log-data">(.*?)</script>', re.DOTALL
+)
+REPLAY_EXTENSIONS = (".html", ".json", ".log")
+SIDES = ("p1", "p2")
+GEN = 8
+ACTION_SPACE_SIZE = get_int_action_space_size(f"gen{GEN}randombattle", False)
+DYNAMAX_ACTIONS = 12
+SWITCH_ACTIONS = 16
+VICTORY_REWARD = 1.0
+DEFAULT_SHARD_SIZE = 1000
+LOGGER = logging.getLogger(__name__)
+
+
+def read_replay_log(path: str) -> List[str]:
+    with open(path, encoding="utf-8") as file:
+        content = file.read()
+    if path.endswith(".json"):
+        content = json.loads(content)["log"]
+    elif path.endswith(".html"):
+        match = REPLAY_LOG.search(content)
+        if match is None:
+            raise ValueError(f"{path} does not contain a battle log")
+        content = match.group(1).replace("<\\/", "</")
+    lines = []
+    for line in content.split("\n"):
+        line = line.strip()
+        # poke_env writes the battle tag and the first message on the same line
+        if line.startswith(">"):
+            line = line[line.find("|") :] if "|" in line else ""
+        if line.startswith("|"):
+            lines.append(line)
+    return lines
+
+
+def find_replays(paths: List[str]) -> List[str]:
+    replays = []
+    for path in paths:
+        if not os.path.isdir(path):
+            replays.append(path)
+            continue
+        for directory, _, files in os.walk(path):
+            replays += [
+                os.path.join(directory, file)
+                for file in sorted(files)
+                if file.endswith(REPLAY_EXTENSIONS)
+            ]
+    return replays
+
+
+class ReplayedBattle:
+    def __init__(self, lines: List[str], side: str):
+        if side not in SIDES:
+            raise ValueError(f"Expected one of {SIDES} as side. Got {side}")
+        self.side = side
+        self.messages = [_normalize(line.split("|")) for line in lines]
+        players = {m[2]: m[3] for m in self.messages if m[1] == "player" and m[3]}
+        if f"|gen|{GEN}" not in lines or "|gametype|singles" not in lines:
+            raise ValueError(f"Only gen {GEN} single battles can be replayed")
+        if side not in players:
+            raise ValueError(f"The log does not name the player of {side}")
+        self.battle = Battle(
+            f"replay-{side}", players[side], LOGGER, save_replays=False, gen=GEN
+        )
+        self.team: Dict[str, str] = {}
+        self.moves: Dict[str, List[str]] = {}
+        for message in self.messages:
+            if len(message) < 4 or not message[2].startswith(side):
+                continue
+            if message[1] in ("switch", "drag", "replace"):
+                self.team.setdefault(_ident(message[2]), message[3])
+            elif message[1] == "move" and not _is_called(message):
+                move_id = Move.retrieve_id(message[3])
+                moves = self.moves.setdefault(_ident(message[2]), [])
+                if (
+                    move_id not in moves
+                    and not _is_max_move(move_id)
+                    and Move.should_be_stored(move_id, GEN)
+                ):
+                    moves.append(move_id)
+        self.dynamaxed = False
+        self.rqid = 0
+
+    def decisions(self) -> Iterator[Tuple[Dict, Optional[int]]]:
+        # Yields the observation of every request with the action answering it, if known
+        pending = None
+        started = False
+        for message in self.messages:
+            kind = message[1]
+            own = len(message) > 2 and message[2].startswith(self.side)
+            if pending is not None:
+                if kind == "-start" and own and message[3] == "Dynamax":
+                    pending["dynamax"] = True
+                elif kind == "move" and own and not _is_called(message):
+                    yield pending["observation"], _move_action(pending, message[3])
+                    pending = None
+                elif kind == "switch" and own:
+                    yield pending["observation"], _switch_action(pending, message[2])
+                    pending = None
+                elif (kind in ("cant", "faint") and own) or kind in (
+                    "turn",
+                    "win",
+                    "tie",
+                ):
+                    yield pending["observation"], None
+                    pending = None
+            elif started and kind == "switch" and own:
+                # Switches not answering a move request answer a forced switch
+                decision = self._decision(force_switch=True)
+                yield decision["observation"], _switch_action(decision, message[2])
+            if kind == "-start" and own and message[3] == "Dynamax":
+                self.dynamaxed = True
+            self._parse(message)
+            if kind == "turn":
+                started = True
+                pending = self._decision(force_switch=False)
+        if pending is not None:
+            yield pending["observation"], None
+
+    def observation(self) -> Dict:
+        return embed_single_battle(
+            Player, self.battle, ACTION_SPACE_SIZE, action_to_move_gen8single
+        )
+
+    def _decision(self, force_switch: bool) -> dict:
+        self.battle._parse_request(self._request(force_switch))
+        return {
+            "observation": self.observation(),
+            "moves": self.battle.available_moves[:],
+            "switches": [
+                ident
+                for mon in self.battle.available_switches
+                for ident, team_mon in self.battle.team.items()
+                if team_mon is mon
+            ],
+            "dynamax": False,
+        }
+
+    def _request(self, force_switch: bool) -> dict:
+        self.rqid += 1
+        active = self.battle.active_pokemon
+        team = []
+        for ident, details in self.team.items():
+            mon = self.battle.team.get(ident)
+            team.append(
+                {
+                    "ident": ident,
+                    "details": details,
+                    "condition": _condition(mon),
+                    "active": mon is not None and mon is active,
+                    "moves": self.moves.get(ident, [])[:4],
+                    "item": GenData.UNKNOWN_ITEM if mon is None else mon.item,
+                }
+            )
+        team.sort(key=lambda mon: not mon["active"])
+        request = {
+            "side": {"name": self.battle.player_username, "id": self.side},
+            "rqid": self.rqid,
+        }
+        request["side"]["pokemon"] = team
+        if force_switch:
+            request["forceSwitch"] = [True]
+        elif active is not None:
+            active_ident = next(mon["ident"] for mon in team if mon["active"])
+            moves = self.moves.get(active_ident, [])[:4]
+            request["active"] = [
+                {
+                    "moves": [{"move": move, "id": move} for move in moves],
+                    "canDynamax": not self.dynamaxed,
+                }
+            ]
+        return request
+
+    def _parse(self, message: List[str]):
+        kind = message[1]
+        if kind in Player.MESSAGES_TO_IGNORE or kind in (
+            "request",
+            "error",
+            "bigerror",
+        ):
+            return
+        if kind == "win":
+            self.battle._won_by(message[2])
+        elif kind == "tie":
+            self.battle._tied()
+        else:
+            self.battle._parse_message(message)
+
+    @property
+    def reward(self) -> float:
+        if self.battle.won:
+            return VICTORY_REWARD
+        if self.battle.lost:
+            return -VICTORY_REWARD
+        return 0.0
+
+
+def replay_transitions(lines: List[str], side: str) -> Iterator[Dict]:
+    replay = ReplayedBattle(lines, side)
+    # Requests answered by an unknown action are folded into the following transition
+    decisions = [decision for decision in replay.decisions() if decision[1] is not None]
+    for i, (observation, action) in enumerate(decisions):
+        last = i == len(decisions) - 1
+        yield {
+            "observation": observation,
+            "action": np.array(action, dtype=np.int64),
+            "reward": np.array(replay.reward if last else 0.0, dtype=np.float32),
+            "discount": np.array(
+                0.0 if last and replay.battle.finished else 1.0, dtype=np.float32
+            ),
+            "next_observation": (replay.observation() if last else decisions[i + 1][0]),
+        }
+
+
+def read_transitions(path: str) -> List[Dict]:
+    lines = read_replay_log(path)
+    transitions = []
+    for side in SIDES:
+        transitions += replay_transitions(lines, side)
+    return transitions
+
+
+class TransitionShardWriter:
+    def __init__(self, directory: str, shard_size: int = DEFAULT_SHARD_SIZE):
+        if shard_size < 1:
+            raise ValueError(f"Expected a positive shard size. Got {shard_size}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.shard_size = shard_size
+        self.shards = 0
+        self.transitions = 0
+        self.buffer: List[Dict[str, np.ndarray]] = []
+
+    def write(self, transition: Dict):
+        self.buffer.append(flatten_transition(transition))
+        self.transitions += 1
+        if len(self.buffer) >= self.shard_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        path = os.path.join(self.directory, f"transitions-{self.shards:05d}.npz")
+        np.savez_compressed(
+            path,
+            **{
+                key: np.stack([transition[key] for transition in self.buffer])
+                for key in self.buffer[0].keys()
+            },
+        )
+        self.shards += 1
+        self.buffer = []
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def flatten_transition(transition: Dict, prefix: str = "") -> Dict[str, np.ndarray]:
+    # Integer features of the AlphaPoke embedding are bounded by 100, so they fit int8
+    flat = {}
+    for key, value in transition.items():
+        name = f"{prefix}/{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten_transition(value, name))
+            continue
+        value = np.asarray(value)
+        if np.issubdtype(value.dtype, np.integer) and name != "action":
+            value = value.astype(np.int8)
+        elif np.issubdtype(value.dtype, np.floating):
+            value = value.astype(np.float32)
+        flat[name] = value
+    return flat
+
+
+def unflatten_transition(flat: Dict) -> Dict:
+    transition = {}
+    for name, value in flat.items():
+        *parents, key = name.split("/")
+        node = transition
+        for parent in parents:
+            node = node.setdefault(parent, {})
+        node[key] = value
+    return transition
+
+
+def ingest_replays(
+    paths: List[str],
+    directory: str,
+    shard_size: int = DEFAULT_SHARD_SIZE,
+    workers: int = 1,
+) -> Tuple[int, List[str]]:
+    skipped = []
+    with TransitionShardWriter(directory, shard_size) as writer:
+        if workers > 1:
+            with Pool(workers) as pool:
+                for path, transitions in pool.imap(_safe_read_transitions, paths):
+                    _write_transitions(writer, path, transitions, skipped)
+        else:
+            for path, transitions in map(_safe_read_transitions, paths):
+                _write_transitions(writer, path, transitions, skipped)
+    return writer.transitions, skipped
+
+
+def load_transition_dataset(directory: str):
+    import tensorflow as tf
+
+    shards = sorted(
+        os.path.join(directory, file)
+        for file in os.listdir(directory)
+        if file.startswith("transitions-") and file.endswith(".npz")
+    )
+    if not shards:
+        raise ValueError(f"{directory} does not contain transition shards")
+    with np.load(shards[0]) as shard:
+        signature = unflatten_transition(
+            {
+                key: tf.TensorSpec(shard[key].shape[1:], shard[key].dtype)
+                for key in shard.files
+            }
+        )
+
+    def transitions():
+        for path in shards:
+            with np.load(path) as shard:
+                arrays = {key: shard[key] for key in shard.files}
+            for i in range(len(arrays["action"])):
+                yield unflatten_transition({k: v[i] for k, v in arrays.items()})
+
+    return tf.data.Dataset.from_generator(transitions, output_signature=signature)
+
+
+def _safe_read_transitions(path: str) -> Tuple[str, Optional[List[Dict]]]:
+    # A single unreadable replay should not stop the ingestion of a whole corpus
+    try:
+        return path, read_transitions(path)
+    except Exception as e:
+        LOGGER.warning("Skipping %s: %s", path, e)
+        return path, None
+
+
+def _write_transitions(
+    writer: TransitionShardWriter,
+    path: str,
+    transitions: Optional[List[Dict]],
+    skipped: List[str],
+):
+    if transitions is None:
+        skipped.append(path)
+        return
+    for transition in transitions:
+        writer.write(transition)
+
+
+def _normalize(message: List[str]) -> List[str]:
+    # poke_env expects |player| messages with avatar and rating
+    if len(message) > 1 and message[1] == "player":
+        message = (message + ["", "", "", ""])[:6]
+    return message
+
+
+def _ident(pokemon: str) -> str:
+    return pokemon[:2] + pokemon[3:] if pokemon[2] != ":" else pokemon
+
+
+def _is_called(message: List[str]) -> bool:
+    return any(part.startswith("[from]") for part in message[4:])
+
+
+def _is_max_move(move_id: str) -> bool:
+    return move_id.startswith("max") or move_id.startswith("gmax")
+
+
+def _condition(mon) -> str:
+    if mon is None or mon.current_hp is None:
+        return "100/100"
+    if mon.fainted:
+        return "0 fnt"
+    condition = f"{mon.current_hp}/{mon.max_hp}"
+    if mon.status is not None:
+        condition += f" {mon.status.name.lower()}"
+    return condition
+
+
+def _move_action(decision: dict, move_name: str) -> Optional[int]:
+    move_id = Move.retrieve_id(move_name)
+    moves = decision["moves"]
+    if _is_max_move(move_id):
+        # Max moves only tell the type of the base move, or that it was a status move
+        used = Move(move_id, gen=GEN)
+        candidates = [
+            i
+            for i, move in enumerate(moves)
+            if (move.category == MoveCategory.STATUS) == (move_id == "maxguard")
+            and (move_id == "maxguard" or move.type == used.type)
+        ]
+    else:
+        candidates = [i for i, move in enumerate(moves) if move.id == move_id]
+    if len(candidates) != 1:
+        return None
+    action = candidates[0]
+    if decision["dynamax"]:
+        action += DYNAMAX_ACTIONS
+    return _valid_action(decision, action)
+
+
+def _switch_action(decision: dict, pokemon: str) -> Optional[int]:
+    identifier = _ident(pokemon)
+    if identifier not in decision["switches"]:
+        return None
+    return _valid_action(
+        decision, SWITCH_ACTIONS + decision["switches"].index(identifier)
+    )
+
+
+def _valid_action(decision: dict, action: int) -> Optional[int]:
+    if decision["observation"]["available_actions"][action] != 1:
+        return None
+    return action
@@ -0,0 +1,156 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Battle states for the benchmarks, rebuilt from replays or synthesized from random
+# gen 8 teams, so that no server is needed to measure the agents
+import copy
+import logging
+import random
+
+from poke_env.data import GenData
+from poke_env.environment.battle import Battle
+from typing import Dict, List, Optional
+
+from agents.utils.replay_dataset import (
+    find_replays,
+    read_replay_log,
+    ReplayedBattle,
+    SIDES,
+)
+
+GEN = 8
+LEVEL = 80
+TEAM_SIZE = 6
+MAX_MOVES = 4
+BOOSTS = ["atk", "def", "spa", "spd", "spe"]
+STATUSES = ["brn", "par", "psn", "tox", "slp"]
+WEATHERS = ["RainDance", "SunnyDay", "Sandstorm", "Hail"]
+SIDE_CONDITIONS = ["Stealth Rock", "Spikes", "Reflect", "Light Screen"]
+LOGGER = logging.getLogger(__name__)
+
+_LEARNABLE_MOVES: Optional[Dict[str, List[str]]] = None
+
+
+# Species of the pokedex with the moves they can learn in gen 8
+def learnable_moves() -> Dict[str, List[str]]:
+    global _LEARNABLE_MOVES
+    if _LEARNABLE_MOVES is None:
+        data = GenData.from_gen(GEN)
+        _LEARNABLE_MOVES = {}
+        for species, entry in sorted(data.learnset.items()):
+            if species not in data.pokedex or data.pokedex[species].get("num", 0) <= 0:
+                continue
+            moves = sorted(
+                move
+                for move, sources in entry.get("learnset", {}).items()
+                if move in data.moves
+                and not data.moves[move].get("isNonstandard")
+                and any(source.startswith(str(GEN)) for source in sources)
+            )
+            if len(moves) >= MAX_MOVES:
+                _LEARNABLE_MOVES[species] = moves
+    return _LEARNABLE_MOVES
+
+
+def synthesize_battle(index: int, rng: random.Random) -> Battle:
+    data = GenData.from_gen(GEN)
+    moves = learnable_moves()
+    species = rng.sample(sorted(moves.keys()), 2 * TEAM_SIZE)
+    battle = Battle(f"battle-synthesized-{index}", "benchmark", LOGGER, gen=GEN)
+    battle._parse_message(["", "player", "p1", "benchmark", "", ""])
+    battle._parse_message(["", "player", "p2", "opponent", "", ""])
+    team = []
+    for i, mon in enumerate(species[:TEAM_SIZE]):
+        entry = data.pokedex[mon]
+        max_hp = rng.randint(150, 350)
+        hp = rng.choice([max_hp, rng.randint(1, max_hp), 0]) if i > 0 else max_hp
+        team.append(
+            {
+                "ident": f"p1: {entry['name']}",
+                "details": f"{entry['name']}, L{LEVEL}",
+                "condition": f"{hp}/{max_hp}" if hp > 0 else "0 fnt",
+                "active": i == 0,
+                "stats": {
+                    stat: rng.randint(100, 300)
+                    for stat in ["atk", "def", "spa", "spd", "spe"]
+                },
+                "moves": rng.sample(moves[mon], MAX_MOVES),
+                "baseAbility": entry["abilities"]["0"],
+                "item": "leftovers",
+                "pokeball": "pokeball",
+            }
+        )
+    active = team[0]
+    battle._parse_message(
+        ["", "switch", "p1a: " + active["ident"][4:], active["details"], "100/100"]
+    )
+    # The last revealed opponent is the active one
+    for mon in species[TEAM_SIZE : TEAM_SIZE + rng.randint(1, TEAM_SIZE)]:
+        name = data.pokedex[mon]["name"]
+        condition = f"{rng.randint(1, 100)}/100"
+        battle._parse_message(
+            ["", "switch", f"p2a: {name}", f"{name}, L{LEVEL}", condition]
+        )
+    for role in ["p1a: " + active["ident"][4:], f"p2a: {name}"]:
+        for boost in rng.sample(BOOSTS, rng.randint(0, 2)):
+            battle._parse_message(["", "-boost", role, boost, str(rng.randint(1, 2))])
+    if rng.random() < 0.3:
+        battle._parse_message(["", "-status", f"p2a: {name}", rng.choice(STATUSES)])
+    if rng.random() < 0.3:
+        battle._parse_message(["", "-weather", rng.choice(WEATHERS)])
+    for side in ["p1", "p2"]:
+        if rng.random() < 0.3:
+            condition = rng.choice(SIDE_CONDITIONS)
+            battle._parse_message(["", "-sidestart", f"{side}: x", condition])
+    battle._parse_request(
+        {
+            "side": {"name": "benchmark", "id": "p1", "pokemon": team},
+            "rqid": 1,
+            "active": [
+                {
+                    "moves": [
+                        {"move": move, "id": move, "pp": 16, "maxpp": 16}
+                        for move in active["moves"]
+                    ],
+                    "canDynamax": rng.random() < 0.5,
+                }
+            ],
+        }
+    )
+    battle.turn = rng.randint(1, 30)
+    return battle
+
+
+def synthesize_battles(count: int, seed: int = 0) -> List[Battle]:
+    rng = random.Random(seed)
+    return [synthesize_battle(i, rng) for i in range(count)]
+
+
+# States of both sides at every request of the replays
+def replay_battles(paths: List[str]) -> List[Battle]:
+    battles = []
+    for path in find_replays(paths):
+        lines = read_replay_log(path)
+        for side in SIDES:
+            # Replays of other generations and formats are skipped
+            try:
+                replay = ReplayedBattle(lines, side)
+            except ValueError:
+                continue
+            for _ in replay.decisions():
+                battles.append(copy.deepcopy(replay.battle))
+    return battles
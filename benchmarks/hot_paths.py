@@ -0,0 +1,261 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#################################################################################
+# Usage: python -m benchmarks.hot_paths STATES OUTPUT_PATH [REPLAY_PATH]        #
+#        python -m benchmarks.hot_paths compare BASELINE_PATH OUTPUT_PATH       #
+#                                                                               #
+# Measures the throughput and the latency percentiles of the embedding,         #
+# inference and decision hot paths over STATES synthesized battle states and    #
+# the states of the replays in REPLAY_PATH, without a server, and saves them as #
+# JSON in OUTPUT_PATH. With compare, exits with an error if the median of a     #
+# benchmark in OUTPUT_PATH is more than REGRESSION_THRESHOLD slower than in     #
+# BASELINE_PATH.                                                                #
+#                                                                               #
+# Example: python -m benchmarks.hot_paths 500 logs/benchmarks.json replays      #
+#################################################################################
+import json
+import numpy as np
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from poke_env.player.player import Player
+from tabulate import tabulate
+from typing import Callable, Dict, List, Optional
+
+from agents.utils.alpha_poke_embedding import embed_single_battle
+from benchmarks.battle_corpus import replay_battles, synthesize_battles
+from utils import InvalidArgument
+from utils.action_to_move_function import (
+    action_to_move_gen8single,
+    get_int_action_space_size,
+)
+from utils.decision_latency import LatencyHistogram
+
+REPOSITORY_PATH = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+BATTLE_FORMAT = "gen8randombattle"
+SEED = 0
+REPETITIONS = 5
+REGRESSION_THRESHOLD = 0.1
+# Agent whose saved policy is measured, skipped if its model is not available
+SAVED_POLICY_AGENT = "alphaPokeSingle-doubleDQNsingle/simple-embedding"
+
+
+def embedding_benchmark(battles) -> Callable[[int], object]:
+    action_space_size = get_int_action_space_size(BATTLE_FORMAT, False)
+    return lambda i: embed_single_battle(
+        Player, battles[i], action_space_size, action_to_move_gen8single
+    )
+
+
+def saved_policy_benchmark(battles) -> Callable[[int], object]:
+    import tensorflow as tf
+
+    from tf_agents.trajectories import time_step as ts
+    from utils.create_agent import create_agent
+
+    agent = create_agent(SAVED_POLICY_AGENT, BATTLE_FORMAT, start_listening=False)[0]
+    time_steps = []
+    for battle in battles:
+        # The policy expects batches of tensors
+        observation = tf.nest.map_structure(
+            lambda value: tf.convert_to_tensor(np.asarray(value)[None, ...]),
+            agent.wrapped_env.embed_battle(battle),
+        )
+        time_steps.append(ts.restart(observation, batch_size=1))
+    return lambda i: agent.policy.action(time_steps[i])
+
+
+def tabular_state_benchmark(battles) -> Callable[[int], object]:
+    agent = _create_tabular_agent()
+    return lambda i: agent._battle_to_state(battles[i])
+
+
+def tabular_action_benchmark(battles) -> Callable[[int], object]:
+    agent = _create_tabular_agent()
+    states = agent.battles_to_states(battles)
+    return lambda i: agent._choose_action(states[i])
+
+
+def advanced_heuristics_benchmark(battles) -> Callable[[int], object]:
+    from agents.advanced_heuristics import AdvancedHeuristics
+
+    agent = AdvancedHeuristics(battle_format=BATTLE_FORMAT, start_listening=False)
+    return lambda i: agent.choose_move(battles[i])
+
+
+def _create_tabular_agent():
+    from agents.expert_rl import ExpertRLAgent
+
+    return ExpertRLAgent(
+        battle_format=BATTLE_FORMAT,
+        start_listening=False,
+        model=None,
+        training=False,
+        keep_training=False,
+    )
+
+
+# Benchmark name and function creating the measured call for each state
+BENCHMARKS = {
+    "AlphaPokeSingleEmbedded.embed_battle": embedding_benchmark,
+    "_SavedPolicy.action": saved_policy_benchmark,
+    "TrainablePlayer._battle_to_state": tabular_state_benchmark,
+    "TrainablePlayer._choose_action": tabular_action_benchmark,
+    "AdvancedHeuristics.choose_move": advanced_heuristics_benchmark,
+}
+
+
+# The first pass over the states warms up caches and is not measured
+def measure(function: Callable[[int], object], states: int, repetitions: int) -> dict:
+    for i in range(states):
+        function(i)
+    histogram = LatencyHistogram()
+    total = 0.0
+    for _ in range(repetitions):
+        for i in range(states):
+            start = time.perf_counter()
+            function(i)
+            elapsed = time.perf_counter() - start
+            histogram.record(elapsed)
+            total += elapsed
+    return {
+        "calls": histogram.count,
+        "throughput": histogram.count / total if total > 0 else None,
+        "mean": histogram.mean,
+        "p50": histogram.percentile(50),
+        "p99": histogram.percentile(99),
+        "max": histogram.max / 1e6,
+    }
+
+
+def run_benchmarks(
+    synthesized_states: int,
+    replay_paths: Optional[List[str]] = None,
+    repetitions: int = REPETITIONS,
+    benchmarks: Optional[Dict[str, Callable]] = None,
+) -> dict:
+    if benchmarks is None:
+        benchmarks = BENCHMARKS
+    battles = synthesize_battles(synthesized_states, SEED)
+    replayed = replay_battles(replay_paths) if replay_paths else []
+    battles += replayed
+    if len(battles) == 0:
+        raise ValueError("Expected at least one battle state to measure")
+    results = {}
+    for name, benchmark in benchmarks.items():
+        try:
+            function = benchmark(battles)
+        except (ImportError, ValueError) as e:
+            results[name] = {"skipped": str(e)}
+            continue
+        results[name] = measure(function, len(battles), repetitions)
+    return {
+        "commit": _get_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "corpus": {
+            "synthesized": synthesized_states,
+            "seed": SEED,
+            "replayed": len(replayed),
+        },
+        "repetitions": repetitions,
+        "benchmarks": results,
+    }
+
+
+# Benchmarks whose median got slower than the threshold allows
+def compare_benchmarks(
+    baseline: dict, current: dict, threshold: float = REGRESSION_THRESHOLD
+) -> List[str]:
+    regressions = []
+    for name, result in current["benchmarks"].items():
+        baseline_result = baseline["benchmarks"].get(name, {})
+        if "p50" not in result or "p50" not in baseline_result:
+            continue
+        if result["p50"] > baseline_result["p50"] * (1 + threshold):
+            regressions.append(name)
+    return regressions
+
+
+def prettify_benchmarks(results: dict, baseline: Optional[dict] = None) -> str:
+    headers = ["Benchmark", "Calls/s", "p50 (us)", "p99 (us)"]
+    if baseline is not None:
+        headers += ["p50 change", "p99 change"]
+    table = []
+    skipped = []
+    for name, result in results["benchmarks"].items():
+        if "skipped" in result:
+            skipped.append(f"{name} skipped: {result['skipped']}")
+            continue
+        row = [name, result["throughput"], result["p50"] * 1e6, result["p99"] * 1e6]
+        baseline_result = {} if baseline is None else baseline["benchmarks"].get(name)
+        if baseline is not None and baseline_result and "p50" in baseline_result:
+            for percentile in ["p50", "p99"]:
+                change = result[percentile] / baseline_result[percentile] - 1
+                row.append(f"{change:+.1%}")
+        table.append(row)
+    return "\n".join(
+        [tabulate(table, headers=headers, floatfmt=[".0f", ".0f", ".1f", ".1f"])]
+        + skipped
+    )
+
+
+def _get_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=REPOSITORY_PATH,
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    if len(sys.argv) < 3:
+        raise InvalidArgument("Expected the number of states and the output path.")
+    if sys.argv[1] == "compare":
+        if len(sys.argv) < 4:
+            raise InvalidArgument("Expected the baseline and the output to compare.")
+        with open(sys.argv[2]) as file:
+            baseline = json.load(file)
+        with open(sys.argv[3]) as file:
+            current = json.load(file)
+        print(prettify_benchmarks(current, baseline))
+        regressions = compare_benchmarks(baseline, current)
+        if len(regressions) > 0:
+            sys.exit(f"Slower than {sys.argv[2]}: {', '.join(regressions)}")
+        return
+    if not sys.argv[1].isnumeric():
+        raise InvalidArgument(f"{sys.argv[1]} is not a valid number of states.")
+    results = run_benchmarks(int(sys.argv[1]), sys.argv[3:])
+    directory = os.path.dirname(sys.argv[2])
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(sys.argv[2], "w") as file:
+        json.dump(results, file, indent=2)
+    print(prettify_benchmarks(results))
+
+
+if __name__ == "__main__":
+    main()
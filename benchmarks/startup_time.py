@@ -0,0 +1,105 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+##########################################################################
+# Usage: python benchmarks/startup_time.py REPETITIONS [AGENT_TYPE]      #
+#                                                                        #
+# Measures, in fresh interpreters, how long importing create_agent and   #
+# creating each agent takes. Exits with an error if an agent that does   #
+# not need TensorFlow imports it.                                        #
+#                                                                        #
+# Example: python benchmarks/startup_time.py 5 dad advanced-heuristics   #
+##########################################################################
+import json
+import os
+import subprocess
+import sys
+
+from tabulate import tabulate
+
+REPOSITORY_PATH = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+TENSORFLOW_FREE_AGENTS = [
+    "dad",
+    "8-year-old-me",
+    "20-year-old-me",
+    "advanced-heuristics",
+]
+STARTUP_CODE = """
+import json
+import sys
+import time
+
+start = time.perf_counter()
+from utils.create_agent import create_agent
+
+imported = time.perf_counter()
+create_agent(sys.argv[1], "gen8randombattle", start_listening=False)
+created = time.perf_counter()
+print(
+    json.dumps(
+        {
+            "import": imported - start,
+            "create": created - imported,
+            "tensorflow": "tensorflow" in sys.modules,
+        }
+    )
+)
+"""
+
+
+def measure_startup(agent_name: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", STARTUP_CODE, agent_name],
+        cwd=REPOSITORY_PATH,
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    agent_names = sys.argv[2:] if len(sys.argv) > 2 else TENSORFLOW_FREE_AGENTS
+    results = []
+    regressions = []
+    for agent_name in agent_names:
+        measures = [measure_startup(agent_name) for _ in range(repetitions)]
+        uses_tensorflow = any(m["tensorflow"] for m in measures)
+        results.append(
+            [
+                agent_name,
+                min(m["import"] for m in measures),
+                min(m["create"] for m in measures),
+                uses_tensorflow,
+            ]
+        )
+        if uses_tensorflow and agent_name in TENSORFLOW_FREE_AGENTS:
+            regressions.append(agent_name)
+    print(
+        tabulate(
+            results,
+            headers=["Agent", "Import (s)", "Creation (s)", "Imports TensorFlow"],
+            floatfmt=".3f",
+        )
+    )
+    if len(regressions) > 0:
+        sys.exit(f"TensorFlow imported while creating {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -19,17 +19,61 @@
 # Usage: python cross_eval.py NUM_CHALLENGES BATTLE_FORMAT [(AGENT_TYPE QUANTITY)] #
 #                                                                                  #
 # Example: python cross_eval.py 1000 gen8randombattle dad 1 expertRL-best 2        #
+#                                                                                  #
+# Note: With CROSS_EVALUATION_WORKERS > 1 each pair of agents is played by one of  #
+#       that many processes, with its own players, at the same time as the others  #
+# Note: With SHOWDOWN_SERVERS > 1 the processes are spread over that many local    #
+#       servers launched on the ports following 8000                               #
+# Note: With RESULTS_DATABASE the results of each pair are stored as soon as it    #
+#       ends, so only the missing battles are played when the evaluation is run    #
+#       again, for example after a crash or with new agents. Agents whose model    #
+#       files changed are evaluated again                                          #
+#       The Bradley-Terry ratings of the agents over all the stored results are    #
+#       printed after the win rates                                                #
+# Note: With RATINGS_PLOT the ratings of the models are also plotted in that       #
+#       folder, with the fitted strengths of the other agents as baselines         #
+# Note: With MATCHMAKING_BATTLES, instead of playing every pair, the processes     #
+#       play NUM_CHALLENGES battles at a time between the pairs expected to make   #
+#       the ratings most precise, until MATCHMAKING_BATTLES battles are played     #
+# Note: With LATENCY_HISTOGRAMS the time the agents take to choose their moves is  #
+#       printed and saved at the end                                               #
+# Note: With SETTLE_BATCH each pair plays batches of that many battles and stops   #
+#       as soon as one agent is better than the other with 95% confidence, shared  #
+#       among all the checks of the pair                                           #
 ####################################################################################
 import asyncio
+import matplotlib.pyplot as plt
+import os
 import sys
 
 from poke_env.server_configuration import LocalhostServerConfiguration
 from poke_env.player.player import Player
 from poke_env.player.utils import cross_evaluate
-from typing import List
+from tabulate import tabulate
+from typing import Iterable, List
 from utils import InvalidArgument, InvalidArgumentNumber
-from utils.create_agent import create_agent
-from utils.prettify_cross_evaluation import prettify_evaluation
+from utils.create_agent import create_agent, get_model_paths
+from utils.decision_latency import (
+    export_latency_histograms,
+    instrument_player,
+    load_latency_histograms,
+    prettify_latency_histograms,
+)
+from utils.matchmaking import adaptive_cross_evaluate, get_players
+from utils.plot_eval import plot_eval
+from utils.parallel_cross_evaluation import parallel_cross_evaluate
+from utils.prettify_cross_evaluation import __cut_player_number, prettify_evaluation
+from utils.ratings import RatingEngine
+from utils.result_store import ResultStore
+from utils.server_pool import ShowdownServerPool
+
+CROSS_EVALUATION_WORKERS = os.cpu_count() or 1
+SHOWDOWN_SERVERS = 1
+RESULTS_DATABASE = None
+MATCHMAKING_BATTLES = None
+LATENCY_HISTOGRAMS = "./logs/latency cross eval.json"
+SETTLE_BATCH = None
+RATINGS_PLOT = "./logs"
 
 
 async def main():
@@ -38,7 +82,7 @@ async def main():
             f"Wrong number of arguments. Correct format:\n"
             f"NUMBER_OF_CHALLENGES BATTLE_FORMAT [(AGENT_NAME, NUMBER_OF_AGENTS)]+\n"
         )
-    players = []
+    agent_names = []
     challenges = 0
     battle_format = ""
     for i in range(1, len(sys.argv)):
@@ -60,26 +104,156 @@ async def main():
                     f"number to specify how many agents of type {sys.argv[i]} to put in the"
                     f"evaluation process.\n"
                 )
-            agent_name = sys.argv[i]
-            agent_quantity = int(sys.argv[i + 1])
-            for _ in range(agent_quantity):
-                to_append = create_agent(
-                    agent_name,
-                    battle_format,
-                    None,
-                    LocalhostServerConfiguration,
-                    False,
-                    False,
-                    30,
-                )
-                for p in to_append:
-                    players.append(p)
+            agent_names.extend([sys.argv[i]] * int(sys.argv[i + 1]))
+    if MATCHMAKING_BATTLES is not None:
+        adaptive_cross_evaluate_agents(agent_names, battle_format, challenges)
+        return
+    if (
+        CROSS_EVALUATION_WORKERS > 1
+        or RESULTS_DATABASE is not None
+        or SETTLE_BATCH is not None
+    ):
+        parallel_cross_evaluate_agents(agent_names, battle_format, challenges)
+        return
+    players = []
+    for agent_name in agent_names:
+        players.extend(
+            create_agent(
+                agent_name,
+                battle_format,
+                None,
+                LocalhostServerConfiguration,
+                False,
+                False,
+                30,
+            )
+        )
     await cross_evaluate_players(players, challenges)
 
 
 async def cross_evaluate_players(players: List[Player], challenges: int):
+    if LATENCY_HISTOGRAMS is not None:
+        for player in players:
+            instrument_player(player, __cut_player_number(player.username))
     evaluation = await cross_evaluate(players, n_challenges=challenges)
     print(prettify_evaluation(evaluation))
+    if LATENCY_HISTOGRAMS is not None:
+        export_latency_histograms(LATENCY_HISTOGRAMS)
+        print_latency_histograms()
+
+
+def parallel_cross_evaluate_agents(
+    agent_names: List[str], battle_format: str, challenges: int
+):
+    server_pool = None
+    configurations = [LocalhostServerConfiguration]
+    if SHOWDOWN_SERVERS > 1:
+        server_pool = ShowdownServerPool(SHOWDOWN_SERVERS, first_port=8001)
+        configurations = server_pool.server_configurations
+    store = None
+    if RESULTS_DATABASE is not None:
+        store = ResultStore(RESULTS_DATABASE)
+    try:
+        evaluation = parallel_cross_evaluate(
+            agent_names,
+            battle_format,
+            challenges,
+            CROSS_EVALUATION_WORKERS,
+            configurations,
+            store=store,
+            latency_histograms=LATENCY_HISTOGRAMS,
+            settle_batch=SETTLE_BATCH,
+        )
+        print(prettify_evaluation(evaluation))
+        if store is not None:
+            engine = RatingEngine.from_store(store, battle_format)
+            print_ratings(engine, evaluation)
+            if RATINGS_PLOT is not None:
+                plot_ratings(engine, agent_names, battle_format)
+        if LATENCY_HISTOGRAMS is not None:
+            print_latency_histograms()
+    finally:
+        if store is not None:
+            store.close()
+        if server_pool is not None:
+            server_pool.close()
+
+
+def adaptive_cross_evaluate_agents(
+    agent_names: List[str], battle_format: str, challenges: int
+):
+    server_pool = None
+    configurations = [LocalhostServerConfiguration]
+    if SHOWDOWN_SERVERS > 1:
+        server_pool = ShowdownServerPool(SHOWDOWN_SERVERS, first_port=8001)
+        configurations = server_pool.server_configurations
+    store = None
+    if RESULTS_DATABASE is not None:
+        store = ResultStore(RESULTS_DATABASE)
+    try:
+        engine = adaptive_cross_evaluate(
+            agent_names,
+            battle_format,
+            MATCHMAKING_BATTLES,
+            challenges,
+            CROSS_EVALUATION_WORKERS,
+            configurations,
+            store=store,
+            latency_histograms=LATENCY_HISTOGRAMS,
+        )
+        players = list(get_players(agent_names, battle_format).keys())
+        if store is not None:
+            print(prettify_evaluation(store.cross_evaluation(battle_format, players)))
+        else:
+            print(prettify_evaluation(engine.win_rates(players)))
+        print_ratings(engine, players)
+        if RATINGS_PLOT is not None:
+            plot_ratings(engine, agent_names, battle_format)
+        if LATENCY_HISTOGRAMS is not None:
+            print_latency_histograms()
+    finally:
+        if store is not None:
+            store.close()
+        if server_pool is not None:
+            server_pool.close()
+
+
+# Ratings fitted over every stored result of the format, not only this evaluation
+def print_ratings(engine: RatingEngine, players: Iterable[str]):
+    ratings = engine.ratings()
+    elo_ratings = engine.elo_ratings()
+    table = [["Player", "Strength", "95% interval", "Elo"]]
+    for player in players:
+        if player in ratings.keys():
+            strength, (lower_bound, upper_bound) = ratings[player]
+            table.append(
+                [
+                    player,
+                    f"{strength:.3f}",
+                    f"{lower_bound:.3f} - {upper_bound:.3f}",
+                    f"{elo_ratings[player][0]:.0f}",
+                ]
+            )
+    print(tabulate(table))
+
+
+# The agents without a model, like the heuristic ones, are drawn as baselines
+def plot_ratings(engine: RatingEngine, agent_names: List[str], battle_format: str):
+    players = get_players(agent_names, battle_format)
+    baselines = [
+        player
+        for player, (_, agent_name, _) in players.items()
+        if not get_model_paths(agent_name, battle_format)
+    ]
+    models = [player for player in players.keys() if player not in baselines]
+    plt.figure(dpi=600)
+    plot_eval(
+        engine.evaluations(models), True, RATINGS_PLOT, engine.strengths(baselines)
+    )
+
+
+def print_latency_histograms():
+    print(prettify_latency_histograms(load_latency_histograms([LATENCY_HISTOGRAMS])))
 
 
 if __name__ == "__main__":  # pragma: no cover
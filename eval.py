@@ -15,11 +15,25 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 #
-###############################################################
-# Usage: python eval.py NUM_CHALLENGES SAVE_PLOT [AGENT_TYPE] #
-#                                                             #
-# Example: python eval.py 10000 False dad expertRL-best       #
-###############################################################
+###################################################################################
+# Usage: python eval.py NUM_CHALLENGES SAVE_PLOT MAX_WIDTH(optional) [AGENT_TYPE] #
+#                                                                                 #
+# MAX_WIDTH stops the evaluation of an agent as soon as the width of the          #
+# confidence interval relative to the estimate is at most MAX_WIDTH; in this      #
+# case NUM_CHALLENGES is the maximum number of battles per agent.                 #
+#                                                                                 #
+# Example: python eval.py 10000 False 0.2 dad expertRL-best                       #
+#                                                                                 #
+# Note: With RESULTS_DATABASE each evaluation is stored as soon as it ends and    #
+#       the agents already evaluated with NUM_CHALLENGES and MAX_WIDTH are not    #
+#       played again, unless their model files changed                            #
+#                                                                                 #
+# Note: With EVALUATION_TELEMETRY every battle is appended to the log as soon as  #
+#       it ends                                                                   #
+#                                                                                 #
+# Note: With LATENCY_HISTOGRAMS the time the agents take to choose their moves is #
+#       printed and saved at the end                                              #
+###################################################################################
 import asyncio
 import matplotlib.pyplot as plt
 import sys
@@ -28,12 +42,28 @@ from poke_env.player.player import Player
 from poke_env.player.utils import evaluate_player
 from poke_env.server_configuration import LocalhostServerConfiguration
 from tabulate import tabulate
-from typing import Iterable
+from typing import Iterable, List, Optional
 
 from utils import InvalidArgument
+from utils.battle_telemetry import BattleTelemetry, TelemetryLog
 from utils.create_agent import create_agent
+from utils.decision_latency import (
+    export_latency_histograms,
+    instrument_player,
+    load_latency_histograms,
+    prettify_latency_histograms,
+)
+from utils.player_evaluation import (
+    create_baselines,
+    sequential_evaluate_against_baselines,
+)
 from utils.plot_eval import plot_eval
 from utils.prettify_cross_evaluation import __cut_player_number
+from utils.result_store import get_player_key, ResultStore
+
+RESULTS_DATABASE = None
+EVALUATION_TELEMETRY = "./logs/eval telemetry.jsonl"
+LATENCY_HISTOGRAMS = "./logs/latency eval.json"
 
 
 async def main():
@@ -49,9 +79,22 @@ async def main():
         save = False
     else:
         raise InvalidArgument(f"{sys.argv[2]} is not a valid boolean argument.")
+    max_relative_width = None
+    first_agent = 3
+    if len(sys.argv) > 3:
+        try:
+            max_relative_width = float(sys.argv[3])
+            first_agent = 4
+        except ValueError:
+            pass
+    if max_relative_width is not None and max_relative_width <= 0:
+        raise InvalidArgument(
+            f"{sys.argv[3]} is not a valid confidence interval width."
+        )
     players = []
+    keys = []
     used_players = []
-    for i in range(3, len(sys.argv)):
+    for i in range(first_agent, len(sys.argv)):
         agent_name = sys.argv[i]
         if agent_name not in used_players:
             used_players.append(agent_name)
@@ -64,19 +107,82 @@ async def main():
                 False,
                 10,
             )
-            for p in to_append:
+            for j, p in enumerate(to_append):
                 players.append(p)
-    await evaluate_players(players, challenges, save)
+                keys.append(get_player_key(agent_name, 1, j, battle_format))
+    store = None
+    if RESULTS_DATABASE is not None:
+        store = ResultStore(RESULTS_DATABASE)
+    telemetry = None
+    if EVALUATION_TELEMETRY is not None:
+        telemetry = TelemetryLog(EVALUATION_TELEMETRY)
+    try:
+        await evaluate_players(
+            players,
+            challenges,
+            save,
+            max_relative_width=max_relative_width,
+            store=store,
+            keys=keys,
+            battle_format=battle_format,
+            telemetry=telemetry,
+            latency_histograms=LATENCY_HISTOGRAMS,
+        )
+    finally:
+        if store is not None:
+            store.close()
+        if telemetry is not None:
+            telemetry.close()
 
 
 async def evaluate_players(
-    players: Iterable[Player], challenges: int, save: bool, save_path="./logs"
+    players: Iterable[Player],
+    challenges: int,
+    save: bool,
+    save_path="./logs",
+    max_relative_width: Optional[float] = None,
+    store: Optional[ResultStore] = None,
+    keys: Optional[List[str]] = None,
+    battle_format: str = "gen8randombattle",
+    telemetry: Optional[TelemetryLog] = None,
+    latency_histograms: Optional[str] = None,
 ):
     results = [["Player", "Evaluation"]]
-    for player in players:
-        evaluation = await evaluate_player(player, challenges, 40)
+    baselines = None
+    if max_relative_width is not None:
+        baselines = create_baselines(10)
+    for i, player in enumerate(players):
+        key = keys[i] if keys is not None else __cut_player_number(player.username)
+        evaluation = None
+        if store is not None:
+            evaluation = store.evaluation(
+                battle_format, key, challenges, max_relative_width
+            )
+        if evaluation is None:
+            # The telemetry reads the decision times from the profiler
+            if telemetry is not None or latency_histograms is not None:
+                profiler = instrument_player(player, key)
+                if telemetry is not None:
+                    BattleTelemetry(
+                        player, telemetry, key, profiler, record_finished=True
+                    )
+            if baselines is None:
+                evaluation = await evaluate_player(player, challenges, 40)
+            else:
+                evaluation = await sequential_evaluate_against_baselines(
+                    player, baselines, challenges, 40, 200, max_relative_width
+                )
+            if store is not None:
+                store.record_evaluation(
+                    battle_format, key, challenges, evaluation, max_relative_width
+                )
         results.append([__cut_player_number(player.username), evaluation])
     print(tabulate(results))
+    if latency_histograms is not None:
+        export_latency_histograms(latency_histograms)
+        print(
+            prettify_latency_histograms(load_latency_histograms([latency_histograms]))
+        )
     if save:
         plt.figure(dpi=600)
     else:
@@ -0,0 +1,99 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+###################################################################################
+# Usage: python export_policy.py MODEL_PATH OUTPUT_PATH(optional)                 #
+#                                                                                 #
+# Converts a saved AlphaPoke policy into a NumPy artifact that can be played with #
+# alphaPokeNumpy-... agents, without TensorFlow. MODEL_PATH is relative to        #
+# models/tf_models and OUTPUT_PATH defaults to the same path in                   #
+# models/numpy_models.                                                            #
+# The embedding frozen with the model is exported with it. Models saved without   #
+# one are only exported if they were trained on the current embedding.            #
+#                                                                                 #
+# Example: python export_policy.py doubleDQNsingle/simple-embedding               #
+###################################################################################
+import numpy as np
+import os
+import sys
+import tensorflow as tf
+
+from tf_agents.policies import policy_saver
+from tf_agents.specs import tensor_spec
+from typing import List, Tuple
+
+from agents.alpha_poke_numpy import get_model_embedding
+from agents.utils.numpy_policy import flatten_layout, NumpyPolicy
+from utils import InvalidArgument
+from utils.create_agent import MODELS_PATH
+
+
+def get_observation_layout(model_path: str) -> List[dict]:
+    spec_path = os.path.join(model_path, policy_saver.POLICY_SPECS_PBTXT)
+    specs = policy_saver.specs_from_collect_data_spec(
+        tensor_spec.from_pbtxt_file(spec_path)
+    )
+    return flatten_layout(specs["time_step_spec"].observation)
+
+
+def get_dense_layers(
+    variables: List[np.ndarray],
+) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+    if len(variables) == 0 or len(variables) % 2 != 0:
+        raise ValueError("Expected a kernel and a bias for every layer")
+    kernels = variables[0::2]
+    biases = variables[1::2]
+    for i, (kernel, bias) in enumerate(zip(kernels, biases)):
+        if kernel.ndim != 2 or bias.shape != (kernel.shape[1],):
+            raise ValueError(f"Layer {i} is not a dense layer")
+        if i > 0 and kernel.shape[0] != kernels[i - 1].shape[1]:
+            raise ValueError(f"Layer {i} does not follow layer {i - 1}")
+    return kernels, biases
+
+
+def export_policy(model: str, output: str) -> NumpyPolicy:
+    model_path = os.path.join(model, "model")
+    if not tf.saved_model.contains_saved_model(model_path):
+        raise ValueError(f"{model} does not contain a saved model.")
+    layout = get_observation_layout(model_path)
+    embedding = get_model_embedding(model, layout)
+    policy = tf.saved_model.load(model_path)
+    kernels, biases = get_dense_layers(
+        [variable.numpy().astype(np.float32) for variable in policy.model_variables]
+    )
+    # The AlphaPoke networks use elu on every hidden layer and return raw Q-values
+    activations = ["elu" for _ in range(len(kernels) - 1)] + ["linear"]
+    exported = NumpyPolicy(kernels, biases, activations, layout, embedding=embedding)
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    exported.save(output)
+    return exported
+
+
+def main():
+    if len(sys.argv) < 2:
+        raise InvalidArgument("Expected the path of the model to export.")
+    model = os.path.join(MODELS_PATH, "tf_models", sys.argv[1])
+    if len(sys.argv) > 2:
+        output = sys.argv[2]
+    else:
+        output = os.path.join(MODELS_PATH, "numpy_models", sys.argv[1] + ".npz")
+    export_policy(model, output)
+    print(f"Exported {model} to {output}")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,57 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+###################################################################################
+# Usage: python ingest_replays.py OUTPUT_PATH REPLAY_PATH [REPLAY_PATH...]        #
+#                                                                                 #
+# Converts saved battle replays into sharded, compressed AlphaPoke transitions    #
+# for behaviour cloning or offline training. REPLAY_PATH can be a replay or a     #
+# folder of replays, saved by poke_env (.html), downloaded from the Showdown      #
+# replay server (.json) or raw battle logs (.log). Both sides of every gen 8      #
+# single battle are converted. The transitions can be read with                   #
+# agents.utils.replay_dataset.load_transition_dataset as a tf.data.Dataset.       #
+#                                                                                 #
+# Example: python ingest_replays.py datasets/replays replays                      #
+###################################################################################
+import os
+import sys
+import time
+
+from agents.utils.replay_dataset import DEFAULT_SHARD_SIZE, find_replays, ingest_replays
+from utils import InvalidArgument
+
+INGESTION_WORKERS = os.cpu_count() or 1
+
+
+def main():
+    if len(sys.argv) < 3:
+        raise InvalidArgument("Expected the output path and at least one replay path.")
+    replays = find_replays(sys.argv[2:])
+    start = time.perf_counter()
+    transitions, skipped = ingest_replays(
+        replays, sys.argv[1], DEFAULT_SHARD_SIZE, INGESTION_WORKERS
+    )
+    print(
+        f"Wrote {transitions} transitions from {len(replays) - len(skipped)} replays "
+        f"to {sys.argv[1]} in {time.perf_counter() - start:.1f}s"
+    )
+    for path in skipped:
+        print(f"Skipped {path}")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
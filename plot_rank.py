@@ -0,0 +1,58 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+###################################################################################
+# Usage: python plot_rank.py LOGS_SAVE_PATH REFRESH_SECONDS(optional)             #
+#                                                                                 #
+# Plots the elo of every agent from the telemetry logs that rank.py writes in     #
+# LOGS_SAVE_PATH and merges them in data.csv. With REFRESH_SECONDS the plots are  #
+# updated every REFRESH_SECONDS seconds while the ranking runs.                   #
+#                                                                                 #
+# Example: python plot_rank.py ./logs 60                                          #
+###################################################################################
+import matplotlib.pyplot as plt
+import sys
+import time
+
+from utils import InvalidArgument, InvalidArgumentNumber
+from utils.plot_rank import aggregate_rank_telemetry
+
+
+def main():
+    if len(sys.argv) < 2:
+        raise InvalidArgumentNumber()
+    save_path = sys.argv[1]
+    refresh = None
+    if len(sys.argv) > 2:
+        try:
+            refresh = float(sys.argv[2])
+        except ValueError:
+            raise InvalidArgument(f"{sys.argv[2]} is not a valid number of seconds.")
+        if refresh <= 0:
+            raise InvalidArgument(f"{sys.argv[2]} is not a valid number of seconds.")
+    plt.switch_backend("agg")
+    while True:
+        telemetry = aggregate_rank_telemetry(save_path)
+        for agent, records in telemetry.items():
+            print(f"{agent}: {len(records)} battles, elo {records[-1]['rating']}")
+        if refresh is None:
+            break
+        time.sleep(refresh)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,97 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+###################################################################################
+# Usage: python quantize_policy.py POLICY_PATH NUM_BATTLES(optional)              #
+#                                                                                 #
+# Quantizes the weights of a policy exported with export_policy.py to int8 and    #
+# checks how often the quantized policy picks the same action as the original.   #
+# The observations are recorded by playing NUM_BATTLES battles (default 100)      #
+# against SimpleHeuristicsPlayer on the local server, and saved for later runs.   #
+# POLICY_PATH is relative to models/numpy_models; the quantized policy is saved   #
+# next to it and can be played as alphaPokeNumpy-POLICY_PATH-int8.                #
+#                                                                                 #
+# Example: python quantize_policy.py doubleDQNsingle/simple-embedding 200         #
+###################################################################################
+import asyncio
+import os
+import sys
+import time
+
+from poke_env.player.baselines import SimpleHeuristicsPlayer
+
+from agents.alpha_poke_numpy import AlphaPokeNumpyPlayer
+from agents.utils.numpy_policy import (
+    NumpyPolicy,
+    action_agreement,
+    load_observations,
+)
+from utils import InvalidArgument
+from utils.create_agent import MODELS_PATH
+
+
+async def record_observations(policy_path: str, observations_path: str, battles: int):
+    player = AlphaPokeNumpyPlayer(
+        model=policy_path,
+        record_observations=True,
+        battle_format="gen8randombattle",
+    )
+    opponent = SimpleHeuristicsPlayer(battle_format="gen8randombattle")
+    await player.battle_against(opponent, battles)
+    player.save_observations(observations_path)
+
+
+def mean_decision_time(policy: NumpyPolicy, features) -> float:
+    start = time.perf_counter()
+    for observation in features:
+        policy.q_values(observation)
+    return (time.perf_counter() - start) / len(features)
+
+
+async def main():
+    if len(sys.argv) < 2:
+        raise InvalidArgument("Expected the path of the policy to quantize.")
+    battles = 100
+    if len(sys.argv) > 2:
+        if not sys.argv[2].isnumeric():
+            raise InvalidArgument(f"{sys.argv[2]} is not a valid number of battles.")
+        battles = int(sys.argv[2])
+    policy_path = os.path.join(MODELS_PATH, "numpy_models", sys.argv[1] + ".npz")
+    observations_path = policy_path[: -len(".npz")] + "-observations.npz"
+    quantized_path = policy_path[: -len(".npz")] + "-int8.npz"
+    if not os.path.isfile(observations_path):
+        print(f"Recording observations of {battles} battles...")
+        await record_observations(policy_path, observations_path, battles)
+    features, masks = load_observations(observations_path)
+    policy = NumpyPolicy.load(policy_path)
+    quantized_policy = policy.quantize()
+    quantized_policy.save(quantized_path)
+    agreement = action_agreement(policy, quantized_policy, features, masks)
+    print(f"Saved quantized policy to {quantized_path}")
+    print(f"Action agreement on {len(features)} observations: {agreement:.2%}")
+    print(
+        f"Size: {os.path.getsize(policy_path) / 2 ** 20:.1f} MB -> "
+        f"{os.path.getsize(quantized_path) / 2 ** 20:.1f} MB"
+    )
+    print(
+        f"Decision time: {mean_decision_time(policy, features) * 1000:.3f} ms -> "
+        f"{mean_decision_time(quantized_policy, features) * 1000:.3f} ms"
+    )
+
+
+if __name__ == "__main__":  # pragma: no cover
+    asyncio.get_event_loop().run_until_complete(main())
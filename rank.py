@@ -20,39 +20,60 @@
 # Usage: python rank.py BATTLE_FORMAT SAVE_REPLAYS LOGS_SAVE_PATH NUM_CHALLENGES(optional) [AGENT_TYPE]  #
 #                                                                                                        #
 # Example: python rank.py gen8randombattle False ./logs 1000 simpleRL-best dad                           #
+#                                                                                                        #
+# Note: Each account plays up to CONCURRENT_LADDER_BATTLES ladder battles at the same time, searching a  #
+#       new one as soon as one ends. Battles without messages for BATTLE_INACTIVITY_TIMEOUT seconds are  #
+#       forfeited and replaced by a new search                                                           #
+#                                                                                                        #
+# Note: Every battle is appended to 'rank AGENT TIME.jsonl' in LOGS_SAVE_PATH as soon as it ends and the #
+#       time the agents take to choose their moves is saved in 'latency AGENT TIME.json'                 #
+#                                                                                                        #
+# Note: With LOCAL_LADDER the agents play on the ladder of LOCAL_LADDER_SERVERS local servers, starting  #
+#       from port 8000, with ratings computed locally instead of on the official server. Each server     #
+#       needs at least two agents                                                                        #
 ##########################################################################################################
 import asyncio
-import asyncio.exceptions
 import datetime
-import gc
 import getpass
-import math
 import matplotlib.pyplot as plt
 import multiprocessing
 import os
-import seaborn as sns
 import sys
 import time
 
-from csv import DictReader
-from numpy import mean
 from poke_env.environment.abstract_battle import AbstractBattle
 from poke_env.player.battle_order import ForfeitBattleOrder, BattleOrder
+from poke_env.data import to_id_str
 from poke_env.server_configuration import ShowdownServerConfiguration
 from poke_env.player.player import Player
 from poke_env.player_configuration import PlayerConfiguration
-from typing import Awaitable, Union
+from typing import Awaitable, List, Optional, Union
 
 from agents.base_classes.trainable_player import TrainablePlayer
-from utils.close_player import close_player
+from utils.battle_telemetry import BattleTelemetry, TelemetryLog
+from utils.battle_watchdog import BattleWatchdog
 from utils.create_agent import create_agent
+from utils.decision_latency import (
+    export_latency_histograms,
+    instrument_player,
+    load_latency_histograms,
+    prettify_latency_histograms,
+)
 from utils.invalid_argument import InvalidArgumentNumber
-from utils.get_player_info import get_ratings
+from utils.ladder_queue import LadderQueue
+from utils.get_player_info import get_ratings, wait_for_rating_update
+from utils.local_ladder import LocalLadderManager
+from utils.plot_rank import aggregate_rank_telemetry
+from utils.rating_listener import RatingListener
 from utils.save_updated_model import update_model
+from utils.server_pool import ShowdownServerPool
 
-
+MAX_WAIT_TIME_FOR_RATING_MESSAGE = 30
 MAX_WAIT_TIME_FOR_ELO_UPDATE = 120
-MAX_BATTLE_TIME = 3600
+CONCURRENT_LADDER_BATTLES = 3
+BATTLE_INACTIVITY_TIMEOUT = 600
+LOCAL_LADDER = False
+LOCAL_LADDER_SERVERS = 1
 
 
 def main():
@@ -75,6 +96,21 @@ def main():
     processes = []
     max_completed_battles = multiprocessing.Value("i", 0)
     cont = multiprocessing.Value("i", 1)
+    manager = None
+    server_pool = None
+    local_ladder = None
+    server_configurations = [ShowdownServerConfiguration]
+    if LOCAL_LADDER:
+        if len(sys.argv) - start_agent < 2 * LOCAL_LADDER_SERVERS:
+            raise InvalidArgumentNumber(
+                f"The local ladder needs at least two agents for each of its "
+                f"{LOCAL_LADDER_SERVERS} servers"
+            )
+        manager = LocalLadderManager()
+        manager.start()
+        local_ladder = manager.LocalLadder()
+        server_pool = ShowdownServerPool(LOCAL_LADDER_SERVERS)
+        server_configurations = server_pool.server_configurations
     for i in range(start_agent, len(sys.argv)):
         processes.append(
             PlayerProcess(
@@ -85,6 +121,15 @@ def main():
                 current_time_string,
                 max_completed_battles,
                 cont,
+                local_ladder=local_ladder,
+                server_configuration=server_configurations[
+                    (i - start_agent) % len(server_configurations)
+                ],
+                username=(
+                    f"Ladder{i - start_agent} {sys.argv[i]}"[:18]
+                    if LOCAL_LADDER
+                    else None
+                ),
             )
         )
     for p in processes:
@@ -100,20 +145,18 @@ def main():
             cont.value = 0
     for p in processes:
         p.join()
-    complete_data = []
-    for file in os.listdir(save_path):
-        if ".csv" in file:
-            with open(os.path.join(save_path, file)) as agent_file:
-                reader = DictReader(agent_file, delimiter=";")
-                for row in reader:
-                    complete_data.append(
-                        (file.replace(".csv", ""), row["index_of_battle"], row["elo"])
-                    )
-            os.remove(os.path.join(save_path, file))
-    with open(os.path.join(save_path, "data.csv"), "w") as data_file:
-        data_file.write("agent;index_of_battle;elo\n")
-        for data in complete_data:
-            data_file.write(f"{data[0]};{data[1]};{data[2]}\n")
+    if server_pool is not None:
+        server_pool.close()
+    if manager is not None:
+        manager.shutdown()
+    plt.switch_backend("agg")
+    aggregate_rank_telemetry(save_path, current_time_string)
+    latency_histograms = [
+        os.path.join(save_path, file)
+        for file in sorted(os.listdir(save_path))
+        if file.startswith("latency ") and file.endswith(f" {current_time_string}.json")
+    ]
+    print(prettify_latency_histograms(load_latency_histograms(latency_histograms)))
 
 
 class PlayerProcess(multiprocessing.Process):
@@ -126,93 +169,88 @@ class PlayerProcess(multiprocessing.Process):
         plot_time,
         stop,
         cont,
+        local_ladder=None,
+        server_configuration=ShowdownServerConfiguration,
+        username=None,
         **kwargs,
     ):
         super().__init__(**kwargs)
         self.cont = True
         self.cont_int = cont
         self.stop_on_shared = stop
-        self.username = input("Account username: ")
-        self.password = getpass.getpass()
+        self.local_ladder = local_ladder
+        self.server_configuration = server_configuration
+        if local_ladder is None:
+            self.username = input("Account username: ")
+            self.password = getpass.getpass()
+        else:
+            # Local servers accept any username without password
+            self.username = username
+            self.password = None
+        self.recorded_battles = set()
+        self.rating_listener = None
+        self.watchdog = None
+        self.ladder_queue = None
         self.agent_type = agent_type
         self.battle_format = battle_format
         self.save_replays = save_replays
         self.save_path = save_path
         self.plot_time = plot_time
         self.agent = None
-        self.plot_path = None
+        self.telemetry_log = None
+        self.telemetry = None
+        self.last_elo = 1000
         self.count = 1
         self.stop_on = 1
 
     def run(self) -> None:
-        print(f"Resetting elo for player {self.username}...")
-        self.reset_elo()
-        plt.switch_backend("agg")
+        if self.local_ladder is None:
+            print(f"Resetting elo for player {self.username}...")
+            self.reset_elo()
         print(f"Creating agent of type {self.agent_type}...")
-        self.agent = create_agent(
-            self.agent_type,
-            self.battle_format,
-            PlayerConfiguration(self.username, self.password),
-            ShowdownServerConfiguration,
-            True,
-            self.save_replays,
-        )[0]
-        file_name = f"rank {self.agent.__class__.__name__} {self.plot_time}.png"
-        self.plot_path = os.path.join(self.save_path, file_name)
-        elo_stats = [[0], [1000]]
+        self.agent = self.create_agent()
+        file_name = f"rank {self.log_name} {self.plot_time}.jsonl"
+        self.telemetry_log = TelemetryLog(os.path.join(self.save_path, file_name))
+        profiler = instrument_player(self.agent, self.log_name)
+        self.telemetry = BattleTelemetry(
+            self.agent, self.telemetry_log, self.log_name, profiler
+        )
         while self.cont or self.stop_on >= self.count:
-            print(f"Starting battle {self.count} for agent {self.username}...")
-            try:
-                asyncio.get_event_loop().run_until_complete(
-                    asyncio.wait_for(self.agent.ladder(1), MAX_BATTLE_TIME)
-                )
-            except asyncio.exceptions.TimeoutError:
-                print(f"Error with battle {self.count} for agent {self.username}...")
-                model = None
-                if isinstance(self.agent, TrainablePlayer) and (
-                    self.agent.training or self.agent.train_while_playing
-                ):
-                    model = self.agent.model
-                print(f"Closing player {self.username}...")
-                close_player(self.agent)
+            # Battles already being played count towards the ones still to play
+            remaining = None
+            if not self.cont:
+                remaining = self.stop_on - self.count + 1
+            rating_updates = 0
+            if self.rating_listener is not None:
+                rating_updates = self.rating_listener.updates
+            asyncio.get_event_loop().run_until_complete(self.play_battles(remaining))
+            new_battles = self.new_finished_battles()
+            if len(new_battles) > 0:
+                last_battle = self.count + len(new_battles) - 1
                 print(
-                    f"Creating new agent of type {self.agent_type} for account {self.username}"
-                )
-                self.agent = create_agent(
-                    self.agent_type,
-                    self.battle_format,
-                    PlayerConfiguration(self.username, self.password),
-                    ShowdownServerConfiguration,
-                    True,
-                    self.save_replays,
+                    f"Battles {self.count} to {last_battle} finished for agent {self.username}..."
                 )
-                if model is not None:
-                    assert isinstance(self.agent, TrainablePlayer)
-                    self.agent.model = model
-                gc.collect()
-                continue
-            print(f"Battle {self.count} finished for agent {self.username}...")
-            elo_stats[0].append(self.count)
-            last_elo = elo_stats[1][-1]
-            print(f"Last elo for agent {self.username}: {last_elo}...")
-            new_elo = get_ratings(self.username, self.battle_format)["elo"]
-            counter = MAX_WAIT_TIME_FOR_ELO_UPDATE
-            if last_elo != 1000:
-                counter *= 10
-            while new_elo == last_elo and counter > 0:
-                time.sleep(1)
-                new_elo = get_ratings(self.username, self.battle_format)["elo"]
-                counter -= 1
-            print(f"New elo for agent {self.username}: {new_elo}...")
-            elo_stats[1].append(new_elo)
+                if self.local_ladder is not None:
+                    new_elos = self.report_battles(new_battles)
+                else:
+                    new_elos = self.read_elos(rating_updates, new_battles)
+                print(f"New elos for agent {self.username}: {new_elos}...")
+                # Each battle is streamed as soon as its rating is known
+                for battle, new_elo in zip(new_battles, new_elos):
+                    self.recorded_battles.add(battle.battle_tag)
+                    self.telemetry.record(battle, new_elo)
+                    if new_elo is not None:
+                        self.last_elo = new_elo
+                    self.count += 1
+                print(f"Last elo for agent {self.username}: {self.last_elo}...")
             print(f"Getting lock on stop_on and cont_int for player {self.username}...")
             with self.stop_on_shared.get_lock():
                 with self.cont_int.get_lock():
-                    if self.stop_on_shared.value < self.count:
+                    if self.stop_on_shared.value < self.count - 1:
                         print(
-                            f"Updating stop_on value from {self.stop_on_shared.value} to {self.count}..."
+                            f"Updating stop_on value from {self.stop_on_shared.value} to {self.count - 1}..."
                         )
-                        self.stop_on_shared.value = self.count
+                        self.stop_on_shared.value = self.count - 1
                     if self.stop_on != self.stop_on_shared.value:
                         print(
                             f"Updating stop_on variable for agent {self.username} from {self.stop_on} to {self.stop_on_shared.value}"
@@ -229,56 +267,92 @@ class PlayerProcess(multiprocessing.Process):
                     print(
                         f"Value of cont variable for agent {self.username}: {self.cont}..."
                     )
-            self.count += 1
         if isinstance(self.agent, TrainablePlayer) and (
             self.agent.training or self.agent.train_while_playing
         ):
             update_model(self.agent, "./models")
-        print(f"Saving logs for player {self.username}...")
-        with open(
-            os.path.join(self.save_path, f"{self.agent.__class__.__name__}.csv"), "w"
-        ) as data_file:
-            data_file.write("index_of_battle;elo\n")
-            for index_of_battle, elo in zip(elo_stats[0], elo_stats[1]):
-                data_file.write(f"{index_of_battle};{elo}\n")
-        os.makedirs(os.path.dirname(self.plot_path), exist_ok=True)
-        means = []
-        window_size = max(math.floor(math.log2(len(elo_stats[0]))), 1)
-        if window_size % 2 == 0:
-            window_size += 1
-        window_half_size = (window_size - 1) // 2
-        extended_stats = [
-            *[elo_stats[1][0] for _ in range(window_half_size)],
-            *elo_stats[1],
-            *[elo_stats[1][-1] for _ in range(window_half_size)],
+        self.telemetry_log.close()
+        file_name = f"latency {self.log_name} {self.plot_time}.json"
+        export_latency_histograms(os.path.join(self.save_path, file_name))
+
+    # Agents of the same class can share the local ladder
+    @property
+    def log_name(self) -> str:
+        if self.local_ladder is None:
+            return self.agent.__class__.__name__
+        return f"{self.agent.__class__.__name__} {self.username}"
+
+    def create_agent(self) -> Player:
+        agent = create_agent(
+            self.agent_type,
+            self.battle_format,
+            PlayerConfiguration(self.username, self.password),
+            self.server_configuration,
+            True,
+            self.save_replays,
+            # The ladder queue limits the battles, since the forfeited ones that
+            # never end would keep their slots in the player
+            0,
+        )[0]
+        if self.local_ladder is None:
+            self.rating_listener = RatingListener(agent)
+        self.watchdog = BattleWatchdog(agent, BATTLE_INACTIVITY_TIMEOUT)
+        self.ladder_queue = LadderQueue(agent, CONCURRENT_LADDER_BATTLES, self.watchdog)
+        return agent
+
+    # Keeps CONCURRENT_LADDER_BATTLES battles going, searching a new one as soon
+    # as one ends or is forfeited, until at least one of them ends
+    async def play_battles(self, remaining: Optional[int]):
+        if getattr(self.agent, "internal_agent", None) is None:
+            await self.ladder_queue.play(remaining)
+            return
+        # TFPlayer plays one battle at a time through its environment
+        watch = asyncio.ensure_future(self.watchdog.watch())
+        try:
+            await self.agent.ladder(1)
+        finally:
+            watch.cancel()
+
+    def new_finished_battles(self) -> List[AbstractBattle]:
+        return [
+            battle
+            for battle_tag, battle in self.agent.battles.items()
+            if battle.finished and battle_tag not in self.recorded_battles
         ]
-        for i in range(len(elo_stats[0])):
-            window = extended_stats[i : i + window_size]
-            means.append(mean(window))
-        means[0] = 1000
-        sns.set_theme()
-        plt.figure(dpi=300)
-        plt.bar(
-            elo_stats[0],
-            elo_stats[1],
-            alpha=0.6,
-            color=sns.color_palette("colorblind")[0],
-            zorder=1,
-        )
-        plt.plot(
-            elo_stats[0], means, color=sns.color_palette("colorblind")[0], zorder=2
-        )
-        plt.suptitle(
-            f"Elo of agent {self.agent.__class__.__name__} during {self.count - 1} battles"
+
+    # The server announces the new rating in the battle room of each battle; the
+    # battles whose announcement does not arrive are recorded without a rating,
+    # since the rating on the website may already include the following battles
+    def read_elos(
+        self, rating_updates: int, battles: List[AbstractBattle]
+    ) -> List[Optional[int]]:
+        self.rating_listener.wait_for_updates(
+            rating_updates, len(battles), MAX_WAIT_TIME_FOR_RATING_MESSAGE
         )
-        plt.title("from a new account")
-        plt.xlabel("Battles")
-        plt.ylabel("Elo")
-        plt.ylim(0, max(elo_stats[1]) * 1.1)
-        if len(elo_stats[0]) < 10:
-            plt.gca().tick_params(axis="x", label1On=False)
-        plt.tight_layout()
-        plt.savefig(self.plot_path, backend="agg")
+        new_elos = [
+            self.rating_listener.battle_ratings.get(battle.battle_tag)
+            for battle in battles
+        ]
+        if None in new_elos:
+            print(f"No rating message for some battles of agent {self.username}...")
+        return new_elos
+
+    # Reports the battles to the local ladder and returns the elo after each of them
+    def report_battles(self, battles: List[AbstractBattle]) -> List[float]:
+        new_elos = []
+        for battle in battles:
+            # Ties are reported without a score
+            score = None
+            if battle.won is not None:
+                score = 1.0 if battle.won else 0.0
+            ratings = self.local_ladder.report(
+                battle.battle_tag,
+                to_id_str(self.username),
+                to_id_str(battle.opponent_username),
+                score,
+            )
+            new_elos.append(ratings["elo"])
+        return new_elos
 
     def reset_elo(self):
         p = ResetProcess(self.username, self.password, self.battle_format)
@@ -308,17 +382,25 @@ class ResetProcess(multiprocessing.Process):
             battle_format=self.battle_format,
             server_configuration=ShowdownServerConfiguration,
         )
+        rating_listener = RatingListener(agent)
         current_elo = get_ratings(self.username, self.battle_format)["elo"]
         print(f"Current elo for player {self.username}: {current_elo}")
         while current_elo != 1000:
             time.sleep(20)
             print(f"Starting battle to forfeit for player {self.username}...")
+            rating_updates = rating_listener.updates
             asyncio.get_event_loop().run_until_complete(agent.ladder(1))
             print(f"Battle forfeited for player {self.username}...")
-            new_elo = get_ratings(self.username, self.battle_format)["elo"]
-            while new_elo == current_elo:
-                time.sleep(1)
-                new_elo = get_ratings(self.username, self.battle_format)["elo"]
+            new_elo = rating_listener.wait_for_update(
+                rating_updates, MAX_WAIT_TIME_FOR_RATING_MESSAGE
+            )
+            while new_elo is None or new_elo == current_elo:
+                new_elo = wait_for_rating_update(
+                    self.username,
+                    self.battle_format,
+                    current_elo,
+                    MAX_WAIT_TIME_FOR_ELO_UPDATE,
+                )["elo"]
             current_elo = new_elo
             print(f"Current elo for player {self.username}: {current_elo}")
 
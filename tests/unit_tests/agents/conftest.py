@@ -0,0 +1,59 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import pytest
+
+from poke_env.environment.effect import Effect
+from poke_env.environment.move import Move
+from poke_env.environment.pokemon import Pokemon
+from poke_env.environment.status import Status
+from unittest.mock import MagicMock
+
+
+@pytest.fixture
+def create_mon():
+    def create(species, hp=100, moves=(), boosts=None, dynamaxed=False, fainted=False):
+        mon = Pokemon(gen=8, species=species)
+        mon._max_hp = 100
+        mon._current_hp = hp
+        mon._moves = {move: Move(move, 8) for move in moves}
+        if boosts is not None:
+            mon._boosts.update(boosts)
+        if dynamaxed:
+            mon._effects = {Effect.DYNAMAX: 1}
+        if fainted:
+            mon._status = Status.FNT
+        return mon
+
+    return create
+
+
+@pytest.fixture
+def create_battle():
+    def create(active_mon, opponent_mon, force_switch=False, team=(), opponent_team=()):
+        battle = MagicMock()
+        battle.active_pokemon = active_mon
+        battle.opponent_active_pokemon = opponent_mon
+        battle.force_switch = force_switch
+        battle.team = {str(i): mon for i, mon in enumerate([active_mon, *team])}
+        battle.opponent_team = {
+            str(i): mon for i, mon in enumerate([opponent_mon, *opponent_team])
+        }
+        battle.available_moves = list(active_mon.moves.values())
+        return battle
+
+    return create
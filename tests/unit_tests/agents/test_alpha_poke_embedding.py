@@ -0,0 +1,42 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import pickle
+
+from unittest.mock import MagicMock
+
+from agents.utils.alpha_poke_embedding import (
+    _LazyIndexes,  # noqa
+    ABILITIES,
+    get_abilities,
+)
+
+
+def test_lazy_indexes_load_on_first_use():
+    load = MagicMock(return_value={"adaptability": 0, "aerilate": 1})
+    indexes = _LazyIndexes(load)
+    load.assert_not_called()
+    assert indexes["aerilate"] == 1
+    assert len(indexes) == 2
+    assert list(indexes) == ["adaptability", "aerilate"]
+    assert "levitate" not in indexes
+
+
+def test_lazy_indexes_are_saved_as_a_dict():
+    indexes = pickle.loads(pickle.dumps(ABILITIES))
+    assert type(indexes) is dict
+    assert indexes == get_abilities()
@@ -0,0 +1,156 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import logging
+import numpy as np
+import os
+import pytest
+import shutil
+
+from poke_env.environment.battle import Battle
+from poke_env.environment.move import Move
+from tf_agents.policies import policy_saver
+from tf_agents.specs import tensor_spec
+from unittest.mock import MagicMock
+
+from agents.alpha_poke_numpy import AlphaPokeNumpyPlayer, get_model_embedding
+from agents.utils.numpy_policy import flatten_layout, NumpyPolicy, load_observations
+from utils.create_agent import MODELS_PATH
+
+SHIPPED_MODEL = os.path.join(
+    MODELS_PATH, "tf_models", "doubleDQNsingle", "simple-embedding"
+)
+
+
+def get_player(tmp_path, record_observations):
+    kernels = [np.eye(22, dtype=np.float32)]
+    biases = [np.arange(22, dtype=np.float32)]
+    layout = [{"name": "available_actions", "size": 22}]
+    path = str(tmp_path / f"policy-{record_observations}.npz")
+    NumpyPolicy(kernels, biases, ["linear"], layout).save(path)
+    player = AlphaPokeNumpyPlayer(
+        model=path,
+        record_observations=record_observations,
+        battle_format="gen8randombattle",
+        start_listening=False,
+    )
+    player.action_to_move_func = MagicMock()
+    return player
+
+
+def get_observation(available_actions):
+    mask = np.zeros(22, dtype=int)
+    mask[available_actions] = 1
+    return {"available_actions": mask}
+
+
+def test_choose_move(tmp_path):
+    player = get_player(tmp_path, False)
+    battle = MagicMock()
+    player.embed_battle = MagicMock(return_value=get_observation([0, 3, 5]))
+    order = player.choose_move(battle)
+    player.action_to_move_func.assert_called_once_with(player, 5, battle)
+    assert order is player.action_to_move_func.return_value
+    with pytest.raises(RuntimeError):
+        player.save_observations(str(tmp_path / "observations.npz"))
+
+
+def test_record_observations(tmp_path):
+    player = get_player(tmp_path, True)
+    player.embed_battle = MagicMock(
+        side_effect=[get_observation([0, 3]), get_observation([1])]
+    )
+    player.choose_move(MagicMock())
+    player.choose_move(MagicMock())
+    path = str(tmp_path / "observations.npz")
+    player.save_observations(path)
+    features, masks = load_observations(path)
+    assert features.shape == (2, 22)
+    assert masks.tolist() == [
+        get_observation([0, 3])["available_actions"].tolist(),
+        get_observation([1])["available_actions"].tolist(),
+    ]
+
+
+def get_shipped_layout():
+    specs = policy_saver.specs_from_collect_data_spec(
+        tensor_spec.from_pbtxt_file(
+            os.path.join(SHIPPED_MODEL, "model", policy_saver.POLICY_SPECS_PBTXT)
+        )
+    )
+    return flatten_layout(specs["time_step_spec"].observation)
+
+
+def create_battle():
+    battle = Battle("battle-gen8randombattle-1", "Alice", logging.getLogger(), gen=8)
+    battle._player_role = "p1"  # noqa
+    for message in [
+        "|switch|p1a: Pikachu|Pikachu, L92, M|100/100",
+        "|switch|p2a: Snorlax|Snorlax, L84, F|100/100",
+    ]:
+        battle._parse_message(message.split("|"))  # noqa
+    thunderbolt = Move("thunderbolt", 8)
+    battle.active_pokemon._moves = {"thunderbolt": thunderbolt}  # noqa
+    battle._available_moves = [thunderbolt]  # noqa
+    return battle
+
+
+def test_exported_layout_of_shipped_model(tmp_path):
+    layout = get_shipped_layout()
+    assert sum(feature["size"] for feature in layout) == 4591
+    embedding = get_model_embedding(SHIPPED_MODEL, layout)
+    assert embedding is not None
+    path = str(tmp_path / "shipped.npz")
+    NumpyPolicy(
+        [np.ones((4591, 22), dtype=np.float32)],
+        [np.arange(22, dtype=np.float32)],
+        ["linear"],
+        layout,
+        embedding=embedding,
+    ).save(path)
+    player = AlphaPokeNumpyPlayer(
+        model=path,
+        record_observations=True,
+        battle_format="gen8randombattle",
+        start_listening=False,
+    )
+    order = player.choose_move(create_battle())
+    assert order.order.id == "thunderbolt"
+    assert player.recorded_features[0].shape == (4591,)
+
+
+def test_shipped_model_without_frozen_embedding(tmp_path):
+    # The current embedding has more abilities and items than the shipped model
+    model = tmp_path / "simple-embedding"
+    shutil.copytree(os.path.join(SHIPPED_MODEL, "model"), model / "model")
+    with pytest.raises(ValueError):
+        get_model_embedding(str(model), get_shipped_layout())
+
+
+def test_mismatched_artifact(tmp_path):
+    path = str(tmp_path / "policy.npz")
+    layout = [{"name": "available_actions", "size": 21}]
+    NumpyPolicy(
+        [np.eye(21, dtype=np.float32)],
+        [np.zeros(21, dtype=np.float32)],
+        ["linear"],
+        layout,
+    ).save(path)
+    with pytest.raises(ValueError):
+        AlphaPokeNumpyPlayer(
+            model=path, battle_format="gen8randombattle", start_listening=False
+        )
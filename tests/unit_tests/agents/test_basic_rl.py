@@ -0,0 +1,60 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+from agents.basic_rl import (
+    STATE_ENCODER_GEN8RANDOM,
+    SimpleRLAgent,
+    _battle_to_state_gen8random,  # noqa
+    battles_to_states_gen8random,
+)
+
+
+def test_battles_to_states_gen8random(create_mon, create_battle):
+    battles = [
+        create_battle(
+            create_mon(
+                "pikachu",
+                moves=["thunderwave", "tackle", "closecombat", "flamethrower"],
+                boosts={"atk": 1},
+            ),
+            create_mon("blastoise"),
+        ),
+        create_battle(
+            create_mon("charizard", moves=["earthquake", "hydropump"], dynamaxed=True),
+            create_mon("gengar"),
+            force_switch=True,
+        ),
+    ]
+    states = battles_to_states_gen8random(battles)
+    assert all(isinstance(state, int) for state in states)
+    assert [STATE_ENCODER_GEN8RANDOM.decode(state) for state in states] == [
+        (-2, 1, 1, 0, 0, -3, 0, 1, 0),
+        (1, 0, 0, 1, 1, 2, 1, 0, 0),
+    ]
+    assert [_battle_to_state_gen8random(battle) for battle in battles] == states
+    assert battles_to_states_gen8random([]) == []
+
+
+def test_battles_to_states(create_mon, create_battle):
+    agent = SimpleRLAgent(start_listening=False, battle_format="gen8randombattle")
+    battles = [
+        create_battle(create_mon("snorlax"), create_mon("pikachu")),
+        create_battle(create_mon("pikachu"), create_mon("snorlax")),
+    ]
+    states = agent.battles_to_states(battles)
+    assert states == battles_to_states_gen8random(battles)
+    assert [STATE_ENCODER_GEN8RANDOM.decode(state)[0] for state in states] == [2, -2]
@@ -0,0 +1,83 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import numpy as np
+
+from poke_env.environment.pokemon import Pokemon
+from poke_env.environment.pokemon_type import PokemonType
+
+from agents.utils.battle_features import (
+    damage_multiplier,
+    damage_multipliers,
+    get_type_indexes,
+    sign,
+    type_index,
+    type_matchup,
+    type_matchups,
+)
+
+
+def test_type_index():
+    indexes = get_type_indexes()
+    assert type_index(None) == indexes[None] == 18
+    assert sorted(indexes[t] for t in PokemonType) == list(range(18))
+
+
+def test_damage_multipliers_match_poke_env():
+    defenders = ["charizard", "blastoise", "gengar", "snorlax", "pikachu"]
+    for species in defenders:
+        mon = Pokemon(gen=8, species=species)
+        defender_types = np.array([type_index(t) for t in mon.types])
+        attack_types = np.array([type_index(t) for t in PokemonType])
+        multipliers = damage_multipliers(attack_types, defender_types)
+        for attack_type, multiplier in zip(PokemonType, multipliers):
+            assert multiplier == mon.damage_multiplier(attack_type)
+        assert damage_multipliers(type_index(None), defender_types) == 1
+
+
+def test_type_matchups():
+    charizard = Pokemon(gen=8, species="charizard")
+    blastoise = Pokemon(gen=8, species="blastoise")
+    mon_types = np.array(
+        [
+            [
+                [type_index(t) for t in charizard.types],
+                [type_index(t) for t in blastoise.types],
+            ]
+        ]
+    )
+    multipliers = type_matchups(mon_types, mon_types[:, ::-1])
+    assert multipliers.shape == (1, 2)
+    assert multipliers[0, 0] == blastoise.damage_multiplier(PokemonType.FIRE)
+    assert multipliers[0, 1] == charizard.damage_multiplier(PokemonType.WATER)
+
+
+def test_scalar_helpers_match_arrays():
+    charizard = [type_index(t) for t in Pokemon(gen=8, species="charizard").types]
+    gengar = [type_index(t) for t in Pokemon(gen=8, species="gengar").types]
+    for attack_type in range(len(PokemonType) + 1):
+        assert damage_multiplier(attack_type, gengar) == damage_multipliers(
+            np.array(attack_type), np.array(gengar)
+        )
+    mon_types = np.array([[charizard, gengar]])
+    multipliers = type_matchups(mon_types, mon_types[:, ::-1])
+    assert type_matchup(charizard, gengar) == multipliers[0, 0]
+    assert type_matchup(gengar, charizard) == multipliers[0, 1]
+
+
+def test_sign():
+    assert [sign(-3), sign(0), sign(0.5)] == [-1, 0, 1]
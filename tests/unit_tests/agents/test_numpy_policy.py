@@ -0,0 +1,240 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import numpy as np
+import pytest
+import tensorflow as tf
+
+from gym.spaces import Box, Dict
+from unittest.mock import patch
+
+from agents.utils.numpy_policy import (
+    NumpyPolicy,
+    action_agreement,
+    flatten_layout,
+    load_numpy_policy,
+    load_observations,
+    masked_argmax,
+    quantize_kernel,
+    save_observations,
+)
+
+_LAYOUT = [
+    {"name": "available_actions", "size": 3},
+    {"name": "mon/hp", "size": 1},
+    {"name": "mon/types", "size": 4},
+]
+
+
+def get_policy(seed=0):
+    rng = np.random.default_rng(seed)
+    kernels = [
+        rng.normal(size=(8, 16)).astype(np.float32),
+        rng.normal(size=(16, 3)).astype(np.float32),
+    ]
+    biases = [
+        rng.normal(size=16).astype(np.float32),
+        rng.normal(size=3).astype(np.float32),
+    ]
+    return NumpyPolicy(kernels, biases, ["elu", "linear"], _LAYOUT)
+
+
+def get_observation(available_actions=(1, 1, 1)):
+    return {
+        "available_actions": np.array(available_actions),
+        "mon": {"hp": 0.5, "types": np.array([0, 1, 0, 0])},
+    }
+
+
+def test_flatten_observation():
+    policy = get_policy()
+    features = policy.flatten_observation(get_observation((1, 0, 1)))
+    assert features.dtype == np.float32
+    assert features.tolist() == [1, 0, 1, 0.5, 0, 1, 0, 0]
+
+
+def test_flatten_observation_wrong_size():
+    policy = get_policy()
+    observation = get_observation()
+    observation["mon"]["types"] = np.array([0, 1, 0])
+    with pytest.raises(ValueError):
+        policy.flatten_observation(observation)
+
+
+def test_q_values_match_keras():
+    policy = get_policy()
+    model = tf.keras.Sequential(
+        [
+            tf.keras.layers.Dense(16, activation=tf.keras.activations.elu),
+            tf.keras.layers.Dense(3, activation=tf.keras.activations.linear),
+        ]
+    )
+    model.build((None, 8))
+    model.set_weights(
+        [policy.kernels[0], policy.biases[0], policy.kernels[1], policy.biases[1]]
+    )
+    features = np.random.default_rng(1).normal(size=(5, 8)).astype(np.float32)
+    features[features < 0.5] = 0
+    expected = model(features).numpy()
+    assert np.allclose(policy.q_values(features), expected, atol=1e-5)
+    for i in range(len(features)):
+        assert np.allclose(policy.q_values(features[i]), expected[i], atol=1e-5)
+
+
+def test_action_is_masked_argmax():
+    policy = get_policy()
+    observation = get_observation()
+    q_values = policy.q_values(policy.flatten_observation(observation))
+    assert policy.action(observation) == int(np.argmax(q_values))
+    best_action = int(np.argmax(q_values))
+    mask = [1, 1, 1]
+    mask[best_action] = 0
+    masked_action = policy.action(observation, mask)
+    assert masked_action != best_action
+    assert mask[masked_action] == 1
+
+
+def test_save_and_load(tmp_path):
+    policy = get_policy()
+    path = str(tmp_path / "policy.npz")
+    policy.save(path)
+    loaded = NumpyPolicy.load(path)
+    assert loaded.activations == policy.activations
+    assert loaded.layout == policy.layout
+    for kernel, loaded_kernel in zip(policy.kernels, loaded.kernels):
+        assert np.array_equal(kernel, loaded_kernel)
+    for bias, loaded_bias in zip(policy.biases, loaded.biases):
+        assert np.array_equal(bias, loaded_bias)
+    assert loaded.action(get_observation()) == policy.action(get_observation())
+    assert loaded.embedding is None
+
+
+def test_save_and_load_embedding(tmp_path):
+    policy = get_policy()
+    policy.embedding = '{"name": "embed_battle"}'
+    path = str(tmp_path / "policy.npz")
+    policy.save(path)
+    assert NumpyPolicy.load(path).embedding == policy.embedding
+    assert policy.quantize().embedding == policy.embedding
+
+
+def test_flatten_layout():
+    space = Dict(
+        {
+            "mon": Dict({"types": Box(0, 1, shape=(4,)), "hp": Box(0, 1, shape=(1,))}),
+            "available_actions": Box(0, 1, shape=(3,)),
+        }
+    )
+    assert flatten_layout(space) == _LAYOUT
+    assert flatten_layout({"mon": {"hp": tf.TensorSpec((1,))}}) == [
+        {"name": "mon/hp", "size": 1}
+    ]
+
+
+def test_invalid_policies():
+    policy = get_policy()
+    with pytest.raises(ValueError):
+        NumpyPolicy(policy.kernels, policy.biases, ["elu"], _LAYOUT)
+    with pytest.raises(ValueError):
+        NumpyPolicy(policy.kernels, policy.biases, ["elu", "softmax"], _LAYOUT)
+    with pytest.raises(ValueError):
+        NumpyPolicy(policy.kernels, policy.biases, ["elu", "linear"], _LAYOUT[:2])
+
+
+def test_quantize_kernel():
+    kernel = np.array([[0.5, -2.0, 0.0], [-1.0, 1.0, 0.0]], dtype=np.float32)
+    quantized_kernel, scale = quantize_kernel(kernel)
+    assert quantized_kernel.dtype == np.int8
+    assert scale.dtype == np.float32
+    assert np.allclose(scale, [1 / 127, 2 / 127, 1])
+    assert quantized_kernel.tolist() == [[64, -127, 0], [-127, 64, 0]]
+    assert np.allclose(quantized_kernel * scale, kernel, atol=scale / 2)
+
+
+def test_quantized_policy():
+    policy = get_policy()
+    quantized_policy = policy.quantize()
+    assert not policy.quantized
+    assert quantized_policy.quantized
+    assert all(kernel.dtype == np.int8 for kernel in quantized_policy.kernels)
+    features = np.random.default_rng(2).normal(size=(20, 8)).astype(np.float32)
+    assert np.allclose(
+        quantized_policy.q_values(features), policy.q_values(features), atol=0.1
+    )
+    for i in range(len(features)):
+        assert np.allclose(
+            quantized_policy.q_values(features[i]),
+            quantized_policy.q_values(features)[i],
+            atol=1e-5,
+        )
+
+
+def test_save_and_load_quantized(tmp_path):
+    quantized_policy = get_policy().quantize()
+    path = str(tmp_path / "policy.npz")
+    quantized_policy.save(path)
+    loaded = NumpyPolicy.load(path)
+    assert loaded.quantized
+    for scale, loaded_scale in zip(quantized_policy.scales, loaded.scales):
+        assert np.array_equal(scale, loaded_scale)
+    features = get_policy().flatten_observation(get_observation())
+    assert np.array_equal(
+        loaded.q_values(features), quantized_policy.q_values(features)
+    )
+
+
+def test_masked_argmax():
+    q_values = np.array([[1.0, 3.0, 2.0], [5.0, 0.0, 1.0]])
+    assert masked_argmax(q_values).tolist() == [1, 0]
+    assert masked_argmax(q_values, [[1, 0, 1], [0, 1, 1]]).tolist() == [2, 2]
+
+
+def test_action_agreement():
+    policy = get_policy()
+    features = np.random.default_rng(3).normal(size=(10, 8)).astype(np.float32)
+    assert action_agreement(policy, policy, features) == 1
+    opposite = NumpyPolicy(
+        policy.kernels,
+        [policy.biases[0], policy.biases[1] * 0],
+        policy.activations,
+        _LAYOUT,
+    )
+    opposite.kernels = [policy.kernels[0], -policy.kernels[1]]
+    masks = np.zeros((10, 3), dtype=int)
+    masks[:, 1] = 1
+    assert action_agreement(policy, opposite, features, masks) == 1
+    with pytest.raises(ValueError):
+        action_agreement(policy, policy, features[:0])
+
+
+def test_save_and_load_observations(tmp_path):
+    path = str(tmp_path / "observations.npz")
+    features = [np.arange(8, dtype=np.float32), np.ones(8, dtype=np.float32)]
+    masks = [np.array([1, 0, 1]), np.array([0, 1, 1])]
+    save_observations(path, features, masks)
+    loaded_features, loaded_masks = load_observations(path)
+    assert loaded_features.tolist() == [f.tolist() for f in features]
+    assert loaded_masks.tolist() == [m.tolist() for m in masks]
+
+
+def test_load_numpy_policy_is_cached():
+    load_numpy_policy.cache_clear()
+    with patch("agents.utils.numpy_policy.NumpyPolicy.load") as mock_load:
+        policy = load_numpy_policy("test path")
+        assert load_numpy_policy("test path") is policy
+        mock_load.assert_called_once_with("test path")
+    load_numpy_policy.cache_clear()
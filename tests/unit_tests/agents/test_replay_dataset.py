@@ -0,0 +1,213 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import json
+import numpy as np
+import os
+import pytest
+
+from poke_env.data import _REPLAY_TEMPLATE
+
+from agents.utils.replay_dataset import (
+    ReplayedBattle,
+    TransitionShardWriter,
+    flatten_transition,
+    find_replays,
+    ingest_replays,
+    load_transition_dataset,
+    read_replay_log,
+    replay_transitions,
+    unflatten_transition,
+)
+
+_BATTLE_LOG = """|j|☆Alice
+|player|p1|Alice|1|
+|player|p2|Bob|2|
+|teamsize|p1|2
+|teamsize|p2|2
+|gametype|singles
+|gen|8
+|tier|[Gen 8] Random Battle
+|
+|t:|1660000000
+|start
+|switch|p1a: Pikachu|Pikachu, L92, M|100/100
+|switch|p2a: Snorlax|Snorlax, L84, F|100/100
+|turn|1
+|
+|t:|1660000010
+|move|p1a: Pikachu|Thunderbolt|p2a: Snorlax
+|-damage|p2a: Snorlax|80/100
+|move|p2a: Snorlax|Body Slam|p1a: Pikachu
+|-damage|p1a: Pikachu|40/100
+|
+|upkeep
+|turn|2
+|
+|switch|p1a: Charizard|Charizard, L84, F|100/100
+|move|p2a: Snorlax|Body Slam|p1a: Charizard
+|-damage|p1a: Charizard|70/100
+|
+|upkeep
+|turn|3
+|
+|move|p1a: Charizard|Air Slash|p2a: Snorlax
+|-damage|p2a: Snorlax|50/100
+|move|p2a: Snorlax|Body Slam|p1a: Charizard
+|-damage|p1a: Charizard|40/100
+|
+|upkeep
+|turn|4
+|
+|-start|p1a: Charizard|Dynamax
+|-heal|p1a: Charizard|80/200
+|move|p1a: Charizard|Max Airstream|p2a: Snorlax
+|-damage|p2a: Snorlax|0 fnt
+|faint|p2a: Snorlax
+|
+|upkeep
+|switch|p2a: Gengar|Gengar, L80, M|100/100
+|turn|5
+|
+|move|p2a: Gengar|Shadow Ball|p1a: Charizard
+|-damage|p1a: Charizard|0 fnt
+|faint|p1a: Charizard
+|
+|upkeep
+|switch|p1a: Pikachu|Pikachu, L92, M|40/100
+|turn|6
+|
+|move|p1a: Pikachu|Volt Switch|p2a: Gengar
+|-damage|p2a: Gengar|0 fnt
+|faint|p2a: Gengar
+|
+|win|Alice
+"""
+
+_LINES = [line for line in _BATTLE_LOG.split("\n") if line.startswith("|")]
+
+
+def write_replays(directory):
+    log = ">battle-gen8randombattle-1" + "\n".join(_LINES)
+    with open(os.path.join(directory, "Alice - battle.html"), "w") as file:
+        file.write(_REPLAY_TEMPLATE.replace("{REPLAY_LOG}", log))
+    with open(os.path.join(directory, "battle.json"), "w") as file:
+        json.dump({"id": "gen8randombattle-1", "log": _BATTLE_LOG}, file)
+    with open(os.path.join(directory, "battle.log"), "w") as file:
+        file.write(_BATTLE_LOG)
+
+
+def test_read_replay_log(tmp_path):
+    write_replays(tmp_path)
+    paths = find_replays([str(tmp_path)])
+    assert [os.path.basename(path) for path in paths] == [
+        "Alice - battle.html",
+        "battle.json",
+        "battle.log",
+    ]
+    for path in paths:
+        assert read_replay_log(path) == _LINES
+
+
+@pytest.mark.parametrize(
+    "side,actions,reward",
+    [
+        ("p1", [0, 16, 0, 12, None, 16, 1], 1.0),
+        ("p2", [0, 0, 0, None, 16, 0, None], -1.0),
+    ],
+)
+def test_decisions(side, actions, reward):
+    replay = ReplayedBattle(_LINES, side)
+    decisions = list(replay.decisions())
+    assert [action for _, action in decisions] == actions
+    for observation, action in decisions:
+        if action is not None:
+            assert observation["available_actions"][action] == 1
+    assert replay.reward == reward
+
+
+def test_decisions_reveal_whole_team():
+    replay = ReplayedBattle(_LINES, "p1")
+    observation, _ = next(replay.decisions())
+    # Charizard only appears on turn 2, but the player knew it from the start
+    assert observation["available_actions"][16] == 1
+    assert observation["available_actions"][:2].tolist() == [1, 1]
+    assert observation["available_actions"][12:14].tolist() == [1, 1]
+
+
+def test_unsupported_battles():
+    with pytest.raises(ValueError):
+        ReplayedBattle([line.replace("|gen|8", "|gen|9") for line in _LINES], "p1")
+    with pytest.raises(ValueError):
+        ReplayedBattle(_LINES, "p3")
+
+
+def test_replay_transitions():
+    transitions = list(replay_transitions(_LINES, "p2"))
+    assert [int(t["action"]) for t in transitions] == [0, 0, 0, 16, 0]
+    assert [float(t["reward"]) for t in transitions] == [0, 0, 0, 0, -1]
+    assert [float(t["discount"]) for t in transitions] == [1, 1, 1, 1, 0]
+    # The request answered by an unknown action is skipped by the previous transition
+    np.testing.assert_array_equal(
+        transitions[2]["next_observation"]["available_actions"],
+        transitions[3]["observation"]["available_actions"],
+    )
+
+
+def test_flatten_transition():
+    transition = {
+        "observation": {"mon": {"types": np.array([0, 1, -1])}, "hp": np.ones(1)},
+        "action": np.array(17, dtype=np.int64),
+    }
+    flat = flatten_transition(transition)
+    assert set(flat.keys()) == {"observation/mon/types", "observation/hp", "action"}
+    assert flat["observation/mon/types"].dtype == np.int8
+    assert flat["observation/hp"].dtype == np.float32
+    assert flat["action"].dtype == np.int64
+    assert unflatten_transition(flat)["observation"]["mon"]["types"].tolist() == [
+        0,
+        1,
+        -1,
+    ]
+
+
+def test_shard_writer(tmp_path):
+    with pytest.raises(ValueError):
+        TransitionShardWriter(str(tmp_path), 0)
+    with TransitionShardWriter(str(tmp_path), 2) as writer:
+        for action in range(5):
+            writer.write({"action": np.array(action), "reward": np.array(0.5)})
+    assert sorted(os.listdir(tmp_path)) == [
+        "transitions-00000.npz",
+        "transitions-00001.npz",
+        "transitions-00002.npz",
+    ]
+    with np.load(tmp_path / "transitions-00002.npz") as shard:
+        assert shard["action"].tolist() == [4]
+
+
+def test_ingest_replays(tmp_path):
+    write_replays(tmp_path)
+    paths = find_replays([str(tmp_path)]) + [str(tmp_path / "missing.log")]
+    output = str(tmp_path / "dataset")
+    transitions, skipped = ingest_replays(paths, output, shard_size=8)
+    assert transitions == 33
+    assert skipped == [str(tmp_path / "missing.log")]
+    dataset = load_transition_dataset(output)
+    actions = [int(t["action"]) for t in dataset]
+    assert actions == [0, 16, 0, 12, 16, 1, 0, 0, 0, 16, 0] * 3
+    assert dataset.element_spec["observation"]["available_actions"].shape == (22,)
@@ -35,7 +35,14 @@ from tf_agents.trajectories import TimeStep
 from typing import Iterator, Union, List
 from unittest.mock import create_autospec, patch, MagicMock, call
 
-from agents.base_classes.tf_player import TFPlayer, _Env, _SavedPolicy
+from agents.base_classes.tf_player import (
+    TFPlayer,
+    _Env,
+    _SavedPolicy,
+    clear_policy_cache,
+    load_embedding_functions,
+    load_saved_policy,
+)
 
 
 def test_env():
@@ -76,34 +83,44 @@ def test_env():
     embedding_description.assert_not_called()
 
 
+@pytest.fixture(autouse=True)
+def policy_cache():
+    clear_policy_cache()
+    yield
+    clear_policy_cache()
+
+
 def test_saved_policy_init():
-    with patch(
-        "tf_agents.policies.py_tf_eager_policy.SavedModelPyTFEagerPolicy"
-    ) as mock_saved_policy, patch("tensorflow.saved_model.load") as mock_load:
+    with patch("tf_agents.specs.tensor_spec.from_pbtxt_file") as mock_from_pbtxt, patch(
+        "tf_agents.policies.policy_saver.specs_from_collect_data_spec"
+    ) as mock_specs, patch("tensorflow.saved_model.load") as mock_load:
         test_path = "test path"
         mock_spec = MagicMock()
         mock_policy = MagicMock()
-        mock_saved_policy.return_value = mock_spec
+        mock_specs.return_value = {"time_step_spec": mock_spec.time_step_spec}
         mock_load.return_value = mock_policy
 
         policy = _SavedPolicy(model_path=test_path)
 
         assert policy.policy is mock_policy
         assert policy.time_step_spec is mock_spec.time_step_spec
-        mock_saved_policy.assert_called_once_with(test_path, load_specs_from_pbtxt=True)
+        mock_from_pbtxt.assert_called_once_with(
+            os.path.join(test_path, "policy_specs.pbtxt")
+        )
+        mock_specs.assert_called_once_with(mock_from_pbtxt.return_value)
         mock_load.assert_called_once_with(test_path)
 
 
 def test_saved_policy_action():
-    with patch(
-        "tf_agents.policies.py_tf_eager_policy.SavedModelPyTFEagerPolicy"
-    ) as mock_saved_policy, patch("tensorflow.saved_model.load") as mock_load, patch(
+    with patch("tf_agents.specs.tensor_spec.from_pbtxt_file") as mock_from_pbtxt, patch(
+        "tf_agents.policies.policy_saver.specs_from_collect_data_spec"
+    ) as mock_specs, patch("tensorflow.saved_model.load") as mock_load, patch(
         "agents.base_classes.tf_player._SavedPolicy.to_tensor"
     ) as mock_to_tensor:
         test_path = "test path"
         mock_spec = MagicMock()
         mock_policy = MagicMock()
-        mock_saved_policy.return_value = mock_spec
+        mock_specs.return_value = {"time_step_spec": mock_spec.time_step_spec}
         mock_load.return_value = mock_policy
         policy = _SavedPolicy(model_path=test_path)
         mock_to_tensor.return_value = "test"
@@ -163,13 +180,13 @@ def test_saved_policy_to_tensor():
 
 
 def test_saved_policy_getattr():
-    with patch(
-        "tf_agents.policies.py_tf_eager_policy.SavedModelPyTFEagerPolicy"
-    ) as mock_saved_policy, patch("tensorflow.saved_model.load") as mock_load:
+    with patch("tf_agents.specs.tensor_spec.from_pbtxt_file") as mock_from_pbtxt, patch(
+        "tf_agents.policies.policy_saver.specs_from_collect_data_spec"
+    ) as mock_specs, patch("tensorflow.saved_model.load") as mock_load:
         test_path = "test path"
         mock_spec = MagicMock()
         mock_policy = MagicMock()
-        mock_saved_policy.return_value = mock_spec
+        mock_specs.return_value = {"time_step_spec": mock_spec.time_step_spec}
         mock_load.return_value = mock_policy
         policy = _SavedPolicy(model_path=test_path)
 
@@ -180,6 +197,34 @@ def test_saved_policy_getattr():
         mock_policy.method_that_does_not_exist.assert_called_once()
 
 
+def test_load_saved_policy_is_cached():
+    with patch("agents.base_classes.tf_player._SavedPolicy") as mock_saved_policy:
+        policy = load_saved_policy("test path")
+        assert load_saved_policy("test path") is policy
+        load_saved_policy("other path")
+        assert mock_saved_policy.call_count == 2
+        clear_policy_cache()
+        load_saved_policy("test path")
+        assert mock_saved_policy.call_count == 3
+
+
+def test_load_embedding_functions_is_cached():
+    with patch("builtins.open") as mock_open, patch(
+        "agents.base_classes.tf_player.load_code"
+    ) as mock_load_code:
+        mock_load_code.side_effect = ["embed", "description"]
+        assert load_embedding_functions("test path") == ("embed", "description")
+        assert load_embedding_functions("test path") == ("embed", "description")
+        mock_open.assert_has_calls(
+            [
+                call(os.path.join("test path", "embed_battle_func.json")),
+                call(os.path.join("test path", "embedding_description.json")),
+            ],
+            any_order=True,
+        )
+        assert mock_load_code.call_count == 2
+
+
 class AgentMock:
     policy = create_autospec(TFPolicy)
 
@@ -284,15 +329,17 @@ def test_init_player_model_success():
     ) as mock_wrap, patch(
         "tf_agents.environments.tf_py_environment.TFPyEnvironment"
     ) as mock_tf_wrap, patch(
-        "tf_agents.policies.py_tf_eager_policy.SavedModelPyTFEagerPolicy"
-    ) as mock_saved_policy, patch(
+        "tf_agents.specs.tensor_spec.from_pbtxt_file"
+    ), patch(
+        "tf_agents.policies.policy_saver.specs_from_collect_data_spec"
+    ) as mock_specs, patch(
         "builtins.open"
     ) as mock_open, patch(
         "agents.base_classes.tf_player.load_code"
     ):
         mock_saved_model.return_value = True
         loaded_specs = MagicMock()
-        mock_saved_policy.return_value = loaded_specs
+        mock_specs.return_value = {"time_step_spec": loaded_specs.time_step_spec}
         mock_load.return_value = AgentMock.policy
         mock_isdir.return_value = True
         player = DummyTFPlayer(
@@ -33,6 +33,8 @@ from agents import (
     MIN_LEARNING_RATE_WHILE_TRAINING,
 )
 from agents.base_classes.trainable_player import TrainablePlayer
+from utils.state_encoder import StateEncoder
+from utils.tabular_model import TabularModel
 
 
 class DummyTrainablePlayer(TrainablePlayer):
@@ -76,6 +78,20 @@ def test_init_method():
     assert agent.model == {}
 
 
+def test_init_method_state_encoder():
+    encoder = StateEncoder([(0, 1), (0, 1)])
+    with patch.object(DummyTrainablePlayer, "_get_state_encoder") as mock_encoder:
+        mock_encoder.return_value = encoder
+        agent = DummyTrainablePlayer(
+            start_listening=False,
+            battle_format="gen8randombattle",
+            model={(1, 0): [[1, 2], 3, [2, 1]]},
+        )
+    assert agent.state_encoder == encoder
+    assert isinstance(agent.model, TabularModel)
+    assert agent.model == {2: [[1, 2], 3, [2, 1]]}
+
+
 def test_choose_move_not_battle():
     battle = "test"
     agent = DummyTrainablePlayer(start_listening=False)
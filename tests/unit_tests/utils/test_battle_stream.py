@@ -0,0 +1,168 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import asyncio
+import os
+import pytest
+import shutil
+
+from poke_env.player.baselines import RandomPlayer
+from poke_env.player_configuration import PlayerConfiguration
+from unittest.mock import AsyncMock, MagicMock
+
+from utils.battle_stream import (
+    BattleStreamSimulator,
+    _SimulatedBattle,
+    split_update,
+    to_simulator_command,
+)
+
+# Simulator module playing one-turn battles between two Pikachus
+FAKE_SIMULATOR = """
+const request = (side, name) => JSON.stringify({
+  active: [{moves: [{move: "Tackle", id: "tackle", pp: 35, maxpp: 35, target: "normal"}]}],
+  side: {name, id: side, pokemon: [{
+    ident: `${side}: Pikachu`, details: "Pikachu, L50, M", condition: "100/100",
+    active: true, stats: {atk: 1, def: 1, spa: 1, spd: 1, spe: 1}, moves: ["tackle"],
+    baseAbility: "static", item: "", pokeball: "pokeball", ability: "static"}]},
+  rqid: 1});
+class BattleStream {
+  constructor() { this.chunks = []; this.names = {}; this.choices = {}; }
+  write(line) {
+    const [command, side, ...rest] = line.split(" ");
+    if (command === ">player") {
+      this.names[side] = JSON.parse(rest.join(" ")).name;
+      if (side !== "p2") return;
+      const lines = ["update", `|player|p1|${this.names.p1}||`, `|player|p2|${this.names.p2}||`];
+      for (const s of ["p1", "p2"]) {
+        this.chunks.push(`sideupdate\\n${s}\\n|request|${request(s, this.names[s])}`);
+        const line = `|switch|${s}a: Pikachu|Pikachu, L50, M|100/100`;
+        lines.push(`|split|${s}`, line, line);
+      }
+      lines.push("|turn|1");
+      this.chunks.push(lines.join("\\n"));
+    } else if (command === ">p1" || command === ">p2") {
+      this.choices[command.slice(1)] = line;
+      if (!this.choices.p1 || !this.choices.p2) return;
+      this.chunks.push(`update\\n|split|p2\\n|-damage|p2a: Pikachu|0 fnt\\n` +
+        `|-damage|p2a: Pikachu|0 fnt\\n|faint|p2a: Pikachu\\n|win|${this.names.p1}`);
+      this.chunks.push("end\\n{}");
+    }
+    this.wake && this.wake();
+  }
+  async *[Symbol.asyncIterator]() {
+    while (true) {
+      while (this.chunks.length) {
+        const chunk = this.chunks.shift();
+        yield chunk;
+        if (chunk.startsWith("end")) return;
+      }
+      await new Promise((resolve) => (this.wake = resolve));
+    }
+  }
+}
+module.exports = { BattleStream };
+"""
+
+
+def test_split_update():
+    lines = [
+        "|",
+        "|split|p1",
+        "|-heal|p1a: A|90/100",
+        "|-heal|p1a: A|90/100",
+        "|turn|2",
+    ]
+    assert split_update(lines) == {
+        "p1": ["|", "|-heal|p1a: A|90/100", "|turn|2"],
+        "p2": ["|", "|-heal|p1a: A|90/100", "|turn|2"],
+    }
+    lines = ["|split|p2", "|-damage|p2a: B|30/250", "|-damage|p2a: B|12/100"]
+    assert split_update(lines) == {
+        "p1": ["|-damage|p2a: B|12/100"],
+        "p2": ["|-damage|p2a: B|30/250"],
+    }
+
+
+@pytest.mark.parametrize(
+    "message,command",
+    [
+        ("/choose move 1", ">p2 move 1"),
+        ("/choose switch 3", ">p2 switch 3"),
+        ("/choose default", ">p2 default"),
+        ("/team 123456", ">p2 team 123456"),
+        ("/forfeit", ">forcelose p2"),
+        ("/timer on", None),
+    ],
+)
+def test_to_simulator_command(message, command):
+    assert to_simulator_command(message, "p2") == command
+
+
+@pytest.mark.asyncio
+async def test_simulated_battle_delivers_side_views():
+    players = [MagicMock(_handle_message=AsyncMock()) for _ in range(2)]
+    battle = _SimulatedBattle("7", "gen8randombattle", players)
+    assert battle.side(players[1]) == "p2"
+    battle.receive('sideupdate\np1\n|request|{"rqid": 1}')
+    battle.receive("update\n|split|p1\n|-heal|p1a: A|90/100\n|-heal|p1a: A|90/100")
+    battle.receive("end\n{}")
+    await asyncio.gather(*battle.tasks)
+    assert battle.ended.done()
+    assert [c.args[0] for c in players[0]._handle_message.call_args_list] == [
+        '>battle-gen8randombattle-7\n|request|{"rqid": 1}',
+        ">battle-gen8randombattle-7\n|-heal|p1a: A|90/100",
+    ]
+    assert [c.args[0] for c in players[1]._handle_message.call_args_list] == [
+        ">battle-gen8randombattle-7\n|-heal|p1a: A|90/100",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_simulated_battle_handler_error():
+    player = MagicMock(_handle_message=AsyncMock(side_effect=KeyError("request")))
+    battle = _SimulatedBattle("0", "gen8randombattle", [player, MagicMock()])
+    battle.deliver("p1", ["|request|"])
+    with pytest.raises(KeyError):
+        await battle.ended
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+@pytest.mark.asyncio
+async def test_battle_against(tmp_path):
+    os.makedirs(tmp_path / "dist" / "sim")
+    with open(tmp_path / "dist" / "sim" / "index.js", "w") as file:
+        file.write(FAKE_SIMULATOR)
+    players = [
+        RandomPlayer(
+            PlayerConfiguration(name, None),
+            battle_format="gen8randombattle",
+            max_concurrent_battles=3,
+            start_listening=False,
+        )
+        for name in ["Stream Winner", "Stream Loser"]
+    ]
+    with BattleStreamSimulator(str(tmp_path)) as simulator:
+        for player in players:
+            simulator.attach(player)
+        await players[0].battle_against(players[1], 10)
+        assert simulator.battles == {}
+    assert players[0].n_won_battles == 10
+    assert players[1].n_lost_battles == 10
+    battle = players[1].battles["battle-gen8randombattle-0"]
+    assert battle.player_role == "p2"
+    assert battle.active_pokemon.max_hp == 100
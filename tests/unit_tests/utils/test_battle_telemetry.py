@@ -0,0 +1,139 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import asyncio
+import pytest
+
+from poke_env.player.random_player import RandomPlayer
+from poke_env.player_configuration import PlayerConfiguration
+from unittest.mock import Mock
+
+from utils.battle_telemetry import (
+    battle_result,
+    BattleTelemetry,
+    read_telemetry,
+    TelemetryLog,
+)
+from utils.decision_latency import DecisionProfiler
+
+
+def create_battle(battle_tag="battle-1", won=True):
+    return Mock(
+        battle_tag=battle_tag,
+        opponent_username="Opponent",
+        finished=True,
+        won=won,
+        turn=12,
+    )
+
+
+def create_player():
+    return RandomPlayer(
+        player_configuration=PlayerConfiguration("Telemetry Player", None),
+        start_listening=False,
+    )
+
+
+def test_battle_result():
+    assert battle_result(create_battle(won=True)) == "win"
+    assert battle_result(create_battle(won=False)) == "loss"
+    assert battle_result(create_battle(won=None)) == "tie"
+    assert battle_result(Mock(finished=False)) is None
+
+
+def test_telemetry_log_survives_incomplete_lines(tmp_path):
+    path = str(tmp_path / "logs" / "telemetry.jsonl")
+    with TelemetryLog(path) as log:
+        log.write({"battle": "battle-1"})
+    with TelemetryLog(path) as log:
+        log.write({"battle": "battle-2"})
+    with open(path, "a") as file:
+        file.write('{"battle": "batt')
+    assert read_telemetry(path) == [{"battle": "battle-1"}, {"battle": "battle-2"}]
+
+
+def test_record_battle_with_decision_latency(tmp_path):
+    player = create_player()
+    player.choose_move = Mock(return_value="order")
+    path = str(tmp_path / "telemetry.jsonl")
+    battle = create_battle()
+    player._battles[battle.battle_tag] = battle
+    profiler = DecisionProfiler()
+    profiler.instrument(player)
+    with TelemetryLog(path) as log:
+        telemetry = BattleTelemetry(player, log, "agent", profiler)
+        assert player.choose_move(battle) == "order"
+        assert player.choose_move(battle) == "order"
+        record = telemetry.record(battle, 1045)
+    assert read_telemetry(path) == [record]
+    assert record["agent"] == "agent"
+    assert record["battle"] == "battle-1"
+    assert record["opponent"] == "Opponent"
+    assert record["result"] == "win"
+    assert record["rating"] == 1045
+    assert record["turns"] == 12
+    assert record["decisions"] == 2
+    assert record["decision_latency"] >= 0
+    assert telemetry.latencies == {}
+
+
+def test_awaitable_decisions_and_finished_battles(tmp_path):
+    player = create_player()
+
+    async def choose_move(_):
+        await asyncio.sleep(0.01)
+        return "order"
+
+    player.choose_move = choose_move
+    path = str(tmp_path / "telemetry.jsonl")
+    battle = create_battle(won=False)
+    player._battles[battle.battle_tag] = battle
+    profiler = DecisionProfiler()
+    profiler.instrument(player)
+    with TelemetryLog(path) as log:
+        BattleTelemetry(player, log, "agent", profiler, record_finished=True)
+        order = asyncio.get_event_loop().run_until_complete(player.choose_move(battle))
+        assert order == "order"
+        player._battle_finished_callback(battle)
+    records = read_telemetry(path)
+    assert len(records) == 1
+    assert records[0]["result"] == "loss"
+    assert records[0]["rating"] is None
+    assert records[0]["decision_latency"] >= 0.01
+
+
+def test_decisions_are_timed_once_by_the_profiler(tmp_path):
+    player, other_player = create_player(), create_player()
+    choose_move = Mock(return_value="order")
+    player.choose_move = choose_move
+    battle = create_battle()
+    player._battles[battle.battle_tag] = battle
+    profiler = DecisionProfiler()
+    profiler.instrument(player)
+    with TelemetryLog(str(tmp_path / "telemetry.jsonl")) as log:
+        telemetry = BattleTelemetry(player, log, "agent", profiler)
+        # The player keeps the timed choose_move of the profiler
+        timed_choose_move = player.choose_move
+        other_telemetry = BattleTelemetry(other_player, log, "other", profiler)
+        assert player.choose_move is timed_choose_move
+        player.choose_move(battle)
+        choose_move.assert_called_once_with(battle)
+        assert len(telemetry.latencies["battle-1"]) == 1
+        assert other_telemetry.latencies == {}
+        assert telemetry.latencies["battle-1"][0] * 1e6 == pytest.approx(
+            profiler.histograms["total"].total, abs=1
+        )
@@ -0,0 +1,81 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import asyncio
+import pytest
+
+from poke_env.player.random_player import RandomPlayer
+from poke_env.player_configuration import PlayerConfiguration
+from unittest.mock import AsyncMock, Mock
+
+from utils.battle_watchdog import BattleWatchdog
+
+
+def create_watchdog(timeout=10):
+    player = RandomPlayer(
+        player_configuration=PlayerConfiguration("Watched Player", None),
+        start_listening=False,
+    )
+    handler = AsyncMock()
+    player._handle_battle_message = handler
+    player._handle_threaded_coroutines = AsyncMock()
+    player._send_message = Mock(return_value="forfeit")
+    for battle_tag, finished in [
+        ("battle-1", False),
+        ("battle-2", False),
+        ("battle-3", True),
+    ]:
+        player._battles[battle_tag] = Mock(finished=finished)
+    return player, handler, BattleWatchdog(player, timeout)
+
+
+def test_watchdog_arguments():
+    player = RandomPlayer(start_listening=False)
+    with pytest.raises(ValueError):
+        BattleWatchdog(player, 0)
+    with pytest.raises(ValueError):
+        BattleWatchdog(player, 10, -1)
+
+
+def test_watchdog_records_battle_activity():
+    player, handler, watchdog = create_watchdog()
+    messages = [[">battle-1"], ["", "turn", "2"]]
+    asyncio.get_event_loop().run_until_complete(player._handle_battle_message(messages))
+    handler.assert_awaited_once_with(messages)
+    assert "battle-1" in watchdog.last_activity.keys()
+
+
+def test_stuck_battles():
+    _, _, watchdog = create_watchdog()
+    watchdog.last_activity["battle-1"] = 100
+    assert watchdog.stuck_battles(105) == []
+    assert watchdog.last_activity["battle-2"] == 105
+    assert watchdog.stuck_battles(112) == ["battle-1"]
+    assert watchdog.stuck_battles(120) == ["battle-1", "battle-2"]
+
+
+def test_check_forfeits_only_stuck_battles():
+    player, _, watchdog = create_watchdog(timeout=0.01)
+    watchdog.stuck_battles()
+    watchdog.last_activity["battle-2"] += 60
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(asyncio.sleep(0.02))
+    assert loop.run_until_complete(watchdog.check()) == ["battle-1"]
+    player._send_message.assert_called_once_with("/forfeit", "battle-1")
+    player._handle_threaded_coroutines.assert_awaited_once_with("forfeit")
+    assert watchdog.forfeited == ["battle-1"]
+    assert loop.run_until_complete(watchdog.check()) == []
@@ -15,15 +15,22 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 #
+import numpy as np
 import os
 import pickle
 import pytest
+import subprocess
+import sys
 
 from io import BytesIO
+from poke_env.player_configuration import PlayerConfiguration
 from typing import List
 from unittest.mock import call, patch
 
 from agents.alpha_poke import AlphaPokeSingleBattleModelLoader
+from agents.alpha_poke_numpy import AlphaPokeNumpyPlayer
+from agents.base_classes.tf_player import clear_policy_cache
+from agents.utils.numpy_policy import NumpyPolicy
 from agents.basic_rl import SimpleRLAgent
 from agents.dad import Dad
 from agents.eight_year_old_me import EightYearOldMe
@@ -31,11 +38,31 @@ from agents.expert_rl import ExpertRLAgent
 from agents.sarsa_stark import SarsaStark, ExpertSarsaStark
 from agents.advanced_heuristics import AdvancedHeuristics
 from agents.twenty_year_old_me import TwentyYearOldMe
-from utils.create_agent import create_agent, UnsupportedAgentType, MODELS_PATH
+from utils.create_agent import (
+    clear_model_cache,
+    create_agent,
+    get_model_folder,
+    get_player_configurations,
+    register_agent_type,
+    AgentType,
+    AGENT_TYPES,
+    load_heuristic_agent,
+    UnsupportedAgentType,
+    MODELS_PATH,
+)
 
 _TEST_MODEL = {"test": 42}
 
 
+@pytest.fixture(autouse=True)
+def model_cache():
+    clear_model_cache()
+    clear_policy_cache()
+    yield
+    clear_model_cache()
+    clear_policy_cache()
+
+
 def simulate_pickled_model():
     return BytesIO(pickle.dumps(_TEST_MODEL))
 
@@ -107,6 +134,29 @@ def test_advanced_heuristics_creation():
     check_agent_configuration(agent[0])
 
 
+@pytest.mark.parametrize(
+    "cli_name", ["dad", "8-year-old-me", "20-year-old-me", "advanced-heuristics"]
+)
+def test_heuristic_agents_do_not_import_tensorflow(cli_name):
+    code = (
+        "import sys\n"
+        "from utils.create_agent import create_agent\n"
+        f"create_agent('{cli_name}', 'gen8randombattle', start_listening=False)\n"
+        "print('tensorflow' in sys.modules)\n"
+    )
+    repository_path = os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=repository_path,
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    assert output.strip().splitlines()[-1] == "False"
+
+
 def test_simple_rl_player_best_creation():
     cli_name = "simpleRL-best"
     with patch("builtins.open") as mock_file:
@@ -151,6 +201,50 @@ def test_simple_rl_player_all_creation():
                 check_training_configuration(a, False)  # noqa
 
 
+def test_tabular_agents_all_with_their_own_configurations():
+    cli_name = "simpleRL-all"
+    with patch("builtins.open") as mock_file:
+        mock_file.side_effect = [simulate_pickled_model() for _ in range(2)]
+        with patch("os.listdir") as mock_listdir:
+            mock_listdir.return_value = ["test1", "test2"]
+            configurations = get_player_configurations(
+                "A long username", cli_name, "gen8randombattle"
+            )
+            agent = create_agent(
+                cli_name, player_configuration=configurations, **get_mock_args()
+            )
+            assert [a.username for a in agent] == [
+                "A long username 1",
+                "A long username 2",
+            ]
+            with pytest.raises(ValueError):
+                create_agent(
+                    cli_name,
+                    player_configuration=configurations[:1] * 3,
+                    **get_mock_args(),
+                )
+    configuration = PlayerConfiguration("A very long username", None)
+    agent = create_agent("dad", player_configuration=[configuration], **get_mock_args())
+    assert agent[0].username == "A very long username"
+
+
+def test_tabular_agents_that_do_not_train_leave_the_cached_model():
+    with patch("builtins.open") as mock_file:
+        mock_file.return_value = simulate_pickled_model()
+        agent = create_agent("simpleRL-best", **get_mock_args())[0]
+        agent._choose_action(12345)
+        copy = create_agent("simpleRL-best", **get_mock_args())[0]
+        assert mock_file.call_count == 1
+    assert copy.model == _TEST_MODEL
+    assert agent.model == _TEST_MODEL
+    with patch("builtins.open") as mock_file:
+        mock_file.return_value = simulate_pickled_model()
+        agent = create_agent("simpleRL-best-train", **get_mock_args())[0]
+    agent._choose_action(12345)
+    assert 12345 in agent.model.keys()
+    assert 12345 not in copy.model.keys()
+
+
 def test_simple_rl_player_all_train_creation():
     cli_name = "simpleRL-all-train"
     with patch("builtins.open") as mock_file:
@@ -349,9 +443,9 @@ def test_expert_sarsa_stark_all_train_creation():
 
 def test_alpha_poke_single_battle_creation():
     cli_name = "alphaPokeSingle-test_path"
-    with patch(
-        "tf_agents.policies.py_tf_eager_policy.SavedModelPyTFEagerPolicy"
-    ) as mock_saved_policy, patch("tensorflow.saved_model.load") as mock_load, patch(
+    with patch("tf_agents.specs.tensor_spec.from_pbtxt_file") as mock_from_pbtxt, patch(
+        "tf_agents.policies.policy_saver.specs_from_collect_data_spec"
+    ), patch("tensorflow.saved_model.load") as mock_load, patch(
         "os.path.isdir"
     ) as mock_is_dir, patch(
         "tensorflow.saved_model.contains_saved_model"
@@ -372,9 +466,10 @@ def test_alpha_poke_single_battle_creation():
         assert isinstance(agent[0], AlphaPokeSingleBattleModelLoader)
         assert agent[0]._max_concurrent_battles == 1
         check_agent_configuration(agent[0])
-        mock_saved_policy.assert_called_once_with(
-            os.path.join(MODELS_PATH, "tf_models", "test_path", "model"),
-            load_specs_from_pbtxt=True,
+        mock_from_pbtxt.assert_called_once_with(
+            os.path.join(
+                MODELS_PATH, "tf_models", "test_path", "model", "policy_specs.pbtxt"
+            )
         )
         mock_load.assert_called_once_with(
             os.path.join(MODELS_PATH, "tf_models", "test_path", "model")
@@ -403,3 +498,92 @@ def test_alpha_poke_single_battle_creation():
             ],
             any_order=True,
         )
+
+
+def test_alpha_poke_policies_are_loaded_once():
+    cli_name = "alphaPokeSingle-test_path"
+    with patch("tf_agents.specs.tensor_spec.from_pbtxt_file"), patch(
+        "tf_agents.policies.policy_saver.specs_from_collect_data_spec"
+    ), patch("tensorflow.saved_model.load") as mock_load, patch(
+        "os.path.isdir"
+    ) as mock_is_dir, patch(
+        "tensorflow.saved_model.contains_saved_model"
+    ) as mock_contains, patch(
+        "builtins.open"
+    ) as mock_open, patch(
+        "agents.base_classes.tf_player.load_code"
+    ) as mock_load_code, patch(
+        "tf_agents.environments.suite_gym.wrap_env"
+    ), patch(
+        "tf_agents.environments.tf_py_environment.TFPyEnvironment"
+    ):
+        mock_is_dir.return_value = True
+        mock_contains.return_value = True
+        first = create_agent(cli_name, **get_mock_args())[0]
+        second = create_agent(cli_name, **get_mock_args())[0]
+        assert first.policy is second.policy
+        assert first.embed_battle_function is second.embed_battle_function
+        assert mock_load.call_count == 1
+        assert mock_open.call_count == 2
+        assert mock_load_code.call_count == 2
+
+
+def test_alpha_poke_numpy_creation(tmp_path):
+    os.makedirs(tmp_path / "numpy_models")
+    kernels = [np.zeros((22, 2), dtype=np.float32), np.zeros((2, 22), dtype=np.float32)]
+    biases = [np.zeros(2, dtype=np.float32), np.zeros(22, dtype=np.float32)]
+    layout = [{"name": "available_actions", "size": 22}]
+    NumpyPolicy(kernels, biases, ["elu", "linear"], layout).save(
+        str(tmp_path / "numpy_models" / "test_path.npz")
+    )
+    with patch("utils.create_agent.MODELS_PATH", str(tmp_path)):
+        agent = create_agent("alphaPokeNumpy-test_path", **get_mock_args())
+    assert isinstance(agent, List)
+    assert len(agent) == 1
+    assert isinstance(agent[0], AlphaPokeNumpyPlayer)
+    assert agent[0]._max_concurrent_battles == 45
+    assert agent[0].space_size == 22
+    assert agent[0].policy.layout == layout
+    check_agent_configuration(agent[0])
+
+
+def test_models_are_loaded_once():
+    with patch("builtins.open") as mock_file:
+        mock_file.return_value = simulate_pickled_model()
+        first = create_agent("simpleRL-best", **get_mock_args())[0]
+        second = create_agent("simpleRL-best", **get_mock_args())[0]
+        mock_file.assert_called_once_with(
+            f"{MODELS_PATH}/simpleRL/gen8randombattle/best.pokeai", "rb"
+        )
+        assert first.model is second.model
+
+
+def test_training_agents_get_their_own_model():
+    with patch("builtins.open") as mock_file:
+        mock_file.return_value = simulate_pickled_model()
+        player = create_agent("simpleRL-best", **get_mock_args())[0]
+        trainer = create_agent("simpleRL-best-train", **get_mock_args())[0]
+        assert mock_file.call_count == 1
+        assert trainer.model == player.model
+        assert trainer.model is not player.model
+
+
+def test_register_agent_type():
+    agent_type = AgentType("^my-dad$", "Dad", "agents.dad", load_heuristic_agent)
+    register_agent_type(agent_type)
+    try:
+        agent = create_agent("my-dad", **get_mock_args())
+        assert len(agent) == 1
+        assert isinstance(agent[0], Dad)
+        check_agent_configuration(agent[0])
+    finally:
+        AGENT_TYPES.remove(agent_type)
+    with pytest.raises(UnsupportedAgentType):
+        create_agent("my-dad", **get_mock_args())
+
+
+def test_get_model_folder():
+    assert get_model_folder("SimpleRLAgent") == "simpleRL"
+    assert get_model_folder("ExpertSarsaStark") == "expertSarsaStark"
+    with pytest.raises(UnsupportedAgentType):
+        get_model_folder("Dad")
@@ -0,0 +1,160 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import asyncio
+import pytest
+import time
+
+from poke_env.player.player import Player
+from unittest.mock import Mock
+
+from utils.decision_latency import (
+    DecisionProfiler,
+    export_latency_histograms,
+    LatencyHistogram,
+    load_latency_histograms,
+    prettify_latency_histograms,
+)
+
+
+class PhasedPlayer(Player):
+    def choose_move(self, battle):
+        state = self._battle_to_state(battle)
+        action = self._choose_action(state)
+        return self._action_to_move(action, battle)
+
+    def _battle_to_state(self, battle):
+        time.sleep(0.002)
+        return (1,)
+
+    def _choose_action(self, state):
+        time.sleep(0.005)
+        return 0
+
+    def _action_to_move(self, action, battle):
+        time.sleep(0.001)
+        return self.create_order(Mock())
+
+
+def test_histogram_buckets():
+    for value in [0, 1, 127, 128, 129, 255, 256, 1000, 123456]:
+        index = LatencyHistogram.bucket_index(value)
+        assert value <= LatencyHistogram.bucket_value(index)
+        assert LatencyHistogram.bucket_value(index) - value <= value / 64
+        assert LatencyHistogram.bucket_index(value + 1) >= index
+    assert LatencyHistogram.bucket_value(LatencyHistogram.bucket_index(100)) == 100
+
+
+def test_histogram_percentiles():
+    histogram = LatencyHistogram()
+    with pytest.raises(ValueError):
+        histogram.percentile(50)
+    for milliseconds in range(1, 101):
+        histogram.record(milliseconds / 1000)
+    assert histogram.count == 100
+    assert histogram.min == 1000 and histogram.max == 100000
+    assert histogram.mean == pytest.approx(0.0505)
+    assert histogram.percentile(50) == pytest.approx(0.05, rel=1 / 64)
+    assert histogram.percentile(99) == pytest.approx(0.099, rel=1 / 64)
+    assert histogram.percentile(100) == 0.1
+    assert histogram.percentile(0) == pytest.approx(0.001, rel=1 / 64)
+    with pytest.raises(ValueError):
+        histogram.percentile(101)
+
+
+def test_histogram_merge_and_serialization():
+    first, second = LatencyHistogram(), LatencyHistogram()
+    first.record(0.001)
+    second.record(0.003)
+    second.record(0.002)
+    merged = LatencyHistogram.from_dict(first.to_dict()).merge(second)
+    assert merged.count == 3
+    assert merged.min == 1000 and merged.max == 3000
+    assert merged.mean == pytest.approx(0.002)
+    assert sum(merged.buckets.values()) == 3
+
+
+def test_profiler_splits_decisions_in_phases():
+    player = PhasedPlayer(start_listening=False)
+    profiler = DecisionProfiler()
+    profiler.instrument(player)
+    for _ in range(3):
+        player.choose_move(Mock())
+    histograms = profiler.histograms
+    assert set(histograms.keys()) == {"state", "model", "order", "total"}
+    assert all(histogram.count == 3 for histogram in histograms.values())
+    assert histograms["state"].min >= 2000
+    assert histograms["model"].min >= 5000
+    assert histograms["order"].min >= 1000
+    phases = sum(histograms[phase].total for phase in ["state", "model", "order"])
+    assert phases <= histograms["total"].total
+
+
+def test_profiler_waits_for_awaitable_decisions():
+    player = PhasedPlayer(start_listening=False)
+
+    async def choose_move(_):
+        await asyncio.sleep(0.01)
+        return "order"
+
+    player.choose_move = choose_move
+    profiler = DecisionProfiler()
+    profiler.instrument(player)
+    order = asyncio.get_event_loop().run_until_complete(player.choose_move(Mock()))
+    assert order == "order"
+    assert profiler.histograms["total"].min >= 10000
+
+
+def test_profiler_keeps_concurrent_battles_apart():
+    class ConcurrentPlayer(Player):
+        async def choose_move(self, battle):
+            self._battle_to_state(battle)
+            await asyncio.sleep(0.01)
+            return "order"
+
+        def _battle_to_state(self, battle):
+            time.sleep(battle.delay)
+
+    player = ConcurrentPlayer(start_listening=False)
+    profiler = DecisionProfiler()
+    profiler.instrument(player)
+
+    async def decide():
+        battles = [
+            Mock(battle_tag="battle-1", delay=0.004),
+            Mock(battle_tag="battle-2", delay=0.001),
+        ]
+        return await asyncio.gather(*[player.choose_move(b) for b in battles])
+
+    assert asyncio.get_event_loop().run_until_complete(decide()) == ["order"] * 2
+    state = profiler.histograms["state"]
+    assert state.count == 2
+    assert 1000 <= state.min < 4000 <= state.max
+
+
+def test_export_and_load_histograms(tmp_path):
+    profiler = DecisionProfiler()
+    profiler.record("total", 0.002)
+    paths = [str(tmp_path / "first.json"), str(tmp_path / "second.json")]
+    for path in paths:
+        export_latency_histograms(path, {"agent": profiler})
+    histograms = load_latency_histograms(paths)
+    assert list(histograms.keys()) == ["agent"]
+    assert histograms["agent"]["total"].count == 2
+    table = prettify_latency_histograms(histograms)
+    assert "agent" in table
+    assert "p99.9 (ms)" in table
@@ -0,0 +1,129 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import pytest
+
+from unittest.mock import MagicMock, patch
+
+from utils.evaluation_pool import _EvaluationProcess, EvaluationPool
+
+
+def create_pool(workers):
+    with patch("utils.evaluation_pool._EvaluationProcess"):
+        return EvaluationPool(lambda *args: None, workers=workers)
+
+
+def test_invalid_workers():
+    with pytest.raises(ValueError):
+        create_pool(0)
+
+
+def test_submit_sends_only_missing_deltas():
+    pool = create_pool(2)
+    model = {(0,): [[0.0], 0, [0]]}
+    first = pool.submit(model)
+    assert first == 0
+    job, deltas = pool.tasks[0].get(timeout=5)
+    assert job == 0
+    assert deltas == [{(0,): [[0.0], 0, [0]]}]
+    model[(1,)] = [[1.0], 1, [1]]
+    pool.submit(model)
+    job, deltas = pool.tasks[1].get(timeout=5)
+    assert job == 1
+    assert deltas == [{(0,): [[0.0], 0, [0]]}, {(1,): [[1.0], 1, [1]]}]
+    model[(0,)][0][0] = 3.0
+    model[(0,)][1] = 1
+    model[(0,)][2][0] = 1
+    pool.submit(model)
+    job, deltas = pool.tasks[0].get(timeout=5)
+    assert job == 2
+    assert deltas == [{(1,): [[1.0], 1, [1]]}, {(0,): [[3.0], 1, [1]]}]
+    assert pool.history_offset == 2
+    assert pool.history == [{(0,): [[3.0], 1, [1]]}]
+
+
+def test_submit_does_not_share_model():
+    pool = create_pool(1)
+    model = {(0,): [[0.0], 0, [0]]}
+    pool.submit(model)
+    model[(0,)][0][0] = 1.0
+    _, deltas = pool.tasks[0].get(timeout=5)
+    assert deltas == [{(0,): [[0.0], 0, [0]]}]
+    assert pool.snapshot == {(0,): [[0.0], 0, [0]]}
+
+
+def test_results_out_of_order():
+    pool = create_pool(2)
+    pool.results.put((1, (2.0, (1.0, 3.0))))
+    pool.results.put((0, (1.0, (0.5, 1.5))))
+    assert pool.result(0) == (1.0, (0.5, 1.5))
+    assert pool.result(1) == (2.0, (1.0, 3.0))
+
+
+def test_result_exception():
+    pool = create_pool(1)
+    pool.results.put((0, ValueError("too extreme")))
+    with pytest.raises(ValueError):
+        pool.result(0)
+
+
+def test_close():
+    pool = create_pool(2)
+    pool.close()
+    assert pool.tasks[0].get(timeout=5) is None
+    assert pool.tasks[1].get(timeout=5) is None
+    for p in pool.processes:
+        p.join.assert_called()
+
+
+def test_server_configurations_round_robin():
+    configurations = ["server0", "server1"]
+    with patch("utils.evaluation_pool._EvaluationProcess") as process:
+        EvaluationPool(
+            lambda *args: None, workers=3, server_configurations=configurations
+        )
+    assigned = [call.args[-1] for call in process.call_args_list]
+    assert assigned == ["server0", "server1", "server0"]
+
+
+def test_result_raises_when_a_worker_dies():
+    pool = create_pool(2)
+    pool.processes[1].is_alive.return_value = False
+    with patch("utils.evaluation_pool.RESULT_POLL_INTERVAL", 0.01):
+        with pytest.raises(RuntimeError):
+            pool.result(0)
+
+
+def test_worker_sends_back_any_exception():
+    class UnpicklableError(Exception):
+        def __reduce__(self):
+            raise TypeError("not picklable")
+
+    tasks, results = MagicMock(), MagicMock()
+    tasks.get.side_effect = [(0, []), (1, []), None]
+    process = _EvaluationProcess(0, MagicMock(), tasks, results, 10, 1, 1)
+    errors = [KeyError("missing"), UnpicklableError("broken")]
+    with patch("utils.evaluation_pool.create_baselines"), patch.object(
+        process, "_evaluate", side_effect=errors
+    ):
+        process.run()
+    (job, first), (second_job, second) = [
+        call.args[0] for call in results.put.call_args_list
+    ]
+    assert job == 0 and isinstance(first, KeyError)
+    assert second_job == 1 and isinstance(second, RuntimeError)
+    assert "UnpicklableError: broken" in str(second)
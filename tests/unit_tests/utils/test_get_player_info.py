@@ -15,9 +15,12 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 #
-from unittest.mock import patch
+import pytest
+import requests
 
-from utils.get_player_info import get_ratings
+from unittest.mock import call, patch
+
+from utils.get_player_info import get_ratings, wait_for_rating_update
 
 
 class DummyContent:
@@ -38,13 +41,46 @@ def test_get_ratings():
     actual_usernames = ["Test Account", "TestAccount", "testaccount"]
     expected_usernames = ["testaccount", "testaccount", "testaccount"]
     for actual, expected in zip(actual_usernames, expected_usernames):
-        with patch("requests.get") as mock_request_get:
+        with patch("utils.get_player_info._SESSION.get") as mock_request_get:
             mock_request_get.return_value = dummy_json()
             data = get_ratings(actual, "gen8randombattle")
             mock_request_get.assert_called_once_with(
-                f"https://pokemonshowdown.com/users/{expected}.json"
+                f"https://pokemonshowdown.com/users/{expected}.json", timeout=10
             )
             assert data["elo"] == 1059
             assert data["gxe"] == 16.5
             assert data["rpr"] == 1194
             assert data["rprd"] == 33
+
+
+def test_get_ratings_backoff():
+    with patch("utils.get_player_info._SESSION.get") as mock_request_get, patch(
+        "time.sleep"
+    ) as mock_sleep:
+        mock_request_get.side_effect = [
+            requests.exceptions.ConnectionError(),
+            DummyContent(b"not json"),
+            requests.exceptions.Timeout(),
+            dummy_json(),
+        ]
+        assert get_ratings("Test Account", "ou")["elo"] == 1158
+        assert mock_sleep.call_args_list == [call(1.0), call(2.0), call(4.0)]
+        mock_request_get.side_effect = requests.exceptions.ConnectionError()
+        with pytest.raises(requests.exceptions.ConnectionError):
+            get_ratings("Test Account", "ou", max_retries=2)
+
+
+def test_wait_for_rating_update():
+    ratings = [{"elo": 1000}, {"elo": 1000}, {"elo": 1000}, {"elo": 1032}]
+    with patch(
+        "utils.get_player_info.get_ratings", side_effect=ratings
+    ) as mock_get_ratings, patch("time.sleep") as mock_sleep:
+        assert wait_for_rating_update("a", "ou", 1000, 60)["elo"] == 1032
+        assert mock_get_ratings.call_count == 4
+        assert [c.args[0] for c in mock_sleep.call_args_list] == pytest.approx(
+            [1.0, 2.0, 4.0], abs=0.1
+        )
+    with patch("utils.get_player_info.get_ratings", return_value={"elo": 1000}), patch(
+        "time.sleep"
+    ), patch("time.monotonic", side_effect=[0, 1, 2, 61, 62]):
+        assert wait_for_rating_update("a", "ou", 1000, 60)["elo"] == 1000
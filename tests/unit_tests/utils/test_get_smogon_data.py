@@ -15,21 +15,44 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 #
-from poke_env.data.gen_data import GenData
-from unittest.mock import MagicMock, patch
+import json
+import os
+import pytest
 
-import utils.get_smogon_data
+from unittest.mock import MagicMock, patch
 
 from utils.get_smogon_data import (
+    DATA_CACHE_VERSION,
     MEGA_STONES,
     Z_CRYSTALS,
     get_abilities,
+    get_ability_indexes,
+    get_item_indexes,
     get_items,
     get_random_battle_learnset,
+    load_cached_data,
+    refresh_data,
+    save_cached_data,
 )
 
 
-def test_get_random_battle_learnset_gen8():
+@pytest.fixture
+def data_cache(tmp_path):
+    cache_path = str(tmp_path / "cache")
+    bundled_path = str(tmp_path / "bundled")
+    with patch("utils.get_smogon_data.DATA_CACHE_PATH", cache_path), patch(
+        "utils.get_smogon_data.BUNDLED_DATA_PATH", bundled_path
+    ):
+        get_random_battle_learnset.cache_clear()
+        get_ability_indexes.cache_clear()
+        get_item_indexes.cache_clear()
+        yield cache_path, bundled_path
+    get_random_battle_learnset.cache_clear()
+    get_ability_indexes.cache_clear()
+    get_item_indexes.cache_clear()
+
+
+def test_get_random_battle_learnset_gen8(data_cache):
     with patch("requests.get") as mock_req_get, patch("json.loads") as mock_loads:
         data = MagicMock()
         mock_req_get.return_value = data
@@ -46,7 +69,7 @@ def test_get_random_battle_learnset_gen8():
         assert "eiscuenoice" not in learnset.keys()
 
 
-def test_get_random_battle_learnset_gen6():
+def test_get_random_battle_learnset_gen6(data_cache):
     with patch("requests.get") as mock_req_get, patch("json.loads") as mock_loads:
         data = MagicMock()
         mock_req_get.return_value = data
@@ -66,6 +89,14 @@ def test_get_random_battle_learnset_gen6():
         assert learnset["zygardecomplete"]["items"] == ["item"]
 
 
+def test_get_random_battle_learnset_cached(data_cache):
+    save_cached_data("gen8randombattle", {"Pikachu": {}}, "source")
+    with patch("requests.get") as mock_req_get:
+        learnset = get_random_battle_learnset(8)
+        mock_req_get.assert_not_called()
+        assert "pikachukalos" in learnset.keys()
+
+
 def get_fake_dict():
     return {
         6: {
@@ -81,56 +112,145 @@ def get_fake_dict():
     }
 
 
-def test_get_abilities_gen6():
-    with patch("poke_env.data.gen_data.GenData") as mock_gen_data:
-        mock_data = GenData.from_gen(6)
+def test_get_abilities_gen6(data_cache):
+    with patch("utils.get_smogon_data.GenData") as mock_gen_data:
+        mock_data = MagicMock()
         mock_data.pokedex = get_fake_dict()[6]
         mock_gen_data.from_gen.return_value = mock_data
-        vars(utils.get_smogon_data).pop("Abilities6")
-        abilities = list([v.name for v in get_abilities(6)])
-        assert len(get_abilities(6)) == 3
+        abilities = get_abilities(6)
         assert abilities == ["ability1", "ability2", "ability3"]
-        vars(utils.get_smogon_data).pop("Abilities6")
-        get_abilities(6)
+        assert get_ability_indexes(6) == {"ability1": 0, "ability2": 1, "ability3": 2}
 
 
-def test_get_abilities_gen8():
-    with patch("poke_env.data.gen_data.GenData") as mock_gen_data:
-        mock_data = GenData.from_gen(8)
+def test_get_abilities_gen8(data_cache):
+    with patch("utils.get_smogon_data.GenData") as mock_gen_data:
+        mock_data = MagicMock()
         mock_data.pokedex = get_fake_dict()[8]
         mock_gen_data.from_gen.return_value = mock_data
-        vars(utils.get_smogon_data).pop("Abilities8")
-        abilities = list([v.name for v in get_abilities(8)])
-        assert len(get_abilities(8)) == 4
+        abilities = get_abilities(8)
+        assert len(abilities) == 4
         assert abilities == ["ability2", "ability3", "ability4", "ability5"]
-        vars(utils.get_smogon_data).pop("Abilities8")
+
+
+def test_get_abilities_cached(data_cache):
+    with patch("utils.get_smogon_data.GenData") as mock_gen_data:
+        mock_data = MagicMock()
+        mock_data.pokedex = get_fake_dict()[8]
+        mock_gen_data.from_gen.return_value = mock_data
         get_abilities(8)
+        mock_gen_data.from_gen.reset_mock()
+        assert get_abilities(8) == ["ability2", "ability3", "ability4", "ability5"]
+        mock_gen_data.from_gen.assert_not_called()
+    cache_path, _ = data_cache
+    assert len(os.listdir(cache_path)) == 1
+    assert "poke-env" in os.listdir(cache_path)[0]
+
+
+def test_get_abilities_bundled():
+    with patch("utils.get_smogon_data.DATA_CACHE_PATH", "/nonexistent"), patch(
+        "utils.get_smogon_data.GenData"
+    ) as mock_gen_data:
+        abilities = get_abilities(8)
+        mock_gen_data.from_gen.assert_not_called()
+        assert "levitate" in abilities
+
+
+def test_get_ability_indexes_real_pokedex(data_cache):
+    abilities = get_ability_indexes(8)
+    assert sorted(abilities.values()) == list(range(len(abilities)))
+    assert abilities["adaptability"] == 0
+    assert "levitate" in abilities.keys()
 
 
 def get_fake_json():
     return {"item1": None, "item2": None, "Item3": None}
 
 
-def test_get_items():
-    vars(utils.get_smogon_data).pop("Items")
+def test_get_items(data_cache):
     with patch("requests.get") as mock_req_get, patch("json5.loads") as mock_loads:
         data = MagicMock()
         mock_req_get.return_value = data
         mock_loads.return_value = get_fake_json()
-        items = get_items()
-        assert len(items) == 3
-        assert [i.name for i in items] == ["item1", "item2", "item3"]
+        items = get_item_indexes()
+        assert items == {"item1": 0, "item2": 1, "item3": 2}
         mock_req_get.assert_called_once()
         mock_loads.assert_called_once_with(data.content)
-    vars(utils.get_smogon_data).pop("Items")
-    get_items()
+        assert load_cached_data("items") == ["item1", "item2", "item3"]
+
+
+def test_get_items_cached(data_cache):
+    save_cached_data("items", ["item2", "item1"], "source")
+    with patch("requests.get") as mock_req_get:
+        items = get_items()
+        mock_req_get.assert_not_called()
+        assert items == ["item2", "item1"]
+
+
+def test_get_items_cache_not_writable(data_cache):
+    with patch("requests.get"), patch("json5.loads") as mock_loads, patch(
+        "utils.get_smogon_data.save_cached_data", side_effect=OSError
+    ):
+        mock_loads.return_value = get_fake_json()
+        assert get_items() == ["item1", "item2", "item3"]
+
+
+def test_get_items_bundled():
+    with patch("utils.get_smogon_data.DATA_CACHE_PATH", "/nonexistent"), patch(
+        "requests.get"
+    ) as mock_req_get:
+        items = get_items()
+        mock_req_get.assert_not_called()
+        assert "leftovers" in items
+
+
+def test_load_cached_data_fallback(data_cache):
+    cache_path, bundled_path = data_cache
+    os.makedirs(bundled_path)
+    with open(os.path.join(bundled_path, "items.json"), "w") as f:
+        json.dump({"version": DATA_CACHE_VERSION, "data": ["bundled"]}, f)
+    assert load_cached_data("items") == ["bundled"]
+    save_cached_data("items", ["cached"], "source")
+    assert load_cached_data("items") == ["cached"]
+    with open(os.path.join(cache_path, "items.json"), "w") as f:
+        json.dump({"version": DATA_CACHE_VERSION - 1, "data": ["old"]}, f)
+    assert load_cached_data("items") == ["bundled"]
+    assert load_cached_data("missing") is None
+
+
+def test_refresh_data(data_cache):
+    with patch("requests.get") as mock_req_get, patch(
+        "json5.loads"
+    ) as mock_json5_loads, patch("json.loads") as mock_loads:
+        mock_json5_loads.return_value = get_fake_json()
+        mock_loads.return_value = {"Pikachu": {}}
+        refresh_data([7, 8])
+        assert mock_req_get.call_count == 3
+    assert load_cached_data("items") == ["item1", "item2", "item3"]
+    assert load_cached_data("gen7randombattle") == {"Pikachu": {}}
+    assert load_cached_data("gen8randombattle") == {"Pikachu": {}}
+    cache_path, _ = data_cache
+    assert len(os.listdir(cache_path)) == 5
+
+
+def test_refresh_bundled_data(data_cache):
+    cache_path, bundled_path = data_cache
+    with patch("requests.get"), patch("json5.loads") as mock_json5_loads, patch(
+        "json.loads"
+    ) as mock_loads:
+        mock_json5_loads.return_value = get_fake_json()
+        mock_loads.return_value = {"Pikachu": {}}
+        refresh_data([8], bundled_path)
+    assert not os.path.exists(cache_path)
+    assert len(os.listdir(bundled_path)) == 3
+    assert load_cached_data("gen8randombattle") == {"Pikachu": {}}
+    assert "levitate" in get_abilities(8)
 
 
 def test_mega_stones():
     for stone in MEGA_STONES:
-        assert stone in get_items().__members__, f"{stone} not in possible items"
+        assert stone in get_item_indexes(), f"{stone} not in possible items"
 
 
 def test_z_crystals():
     for crystal in Z_CRYSTALS:
-        assert crystal in get_items().__members__, f"{crystal} not in possible items"
+        assert crystal in get_item_indexes(), f"{crystal} not in possible items"
@@ -0,0 +1,105 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import pytest
+import time
+
+from benchmarks.hot_paths import (
+    compare_benchmarks,
+    measure,
+    prettify_benchmarks,
+    run_benchmarks,
+)
+
+
+def create_results(**p50s):
+    return {
+        "benchmarks": {
+            name: {"skipped": p50} if isinstance(p50, str) else create_result(p50)
+            for name, p50 in p50s.items()
+        }
+    }
+
+
+def create_result(p50):
+    return {"calls": 10, "throughput": 1 / p50, "mean": p50, "p50": p50, "p99": p50 * 2}
+
+
+def test_measure_skips_the_warm_up_pass():
+    calls = []
+
+    def function(i):
+        calls.append(i)
+        time.sleep(0.001)
+
+    result = measure(function, 3, 2)
+    assert calls == [0, 1, 2] * 3
+    assert result["calls"] == 6
+    assert result["p50"] >= 0.001
+    assert result["p50"] <= result["p99"] <= result["max"]
+    assert result["throughput"] == pytest.approx(1 / result["mean"], rel=0.05)
+
+
+def test_compare_benchmarks_threshold():
+    baseline = create_results(a=0.5, b=0.5, c=0.5)
+    current = create_results(a=0.625, b=0.626, c=0.25)
+    # Exactly at the threshold is not a regression
+    assert compare_benchmarks(baseline, current, 0.25) == ["b"]
+    assert compare_benchmarks(baseline, current, 0) == ["a", "b"]
+    assert compare_benchmarks(current, current, 0) == []
+
+
+def test_compare_benchmarks_ignores_skipped_and_missing_baselines():
+    baseline = create_results(a="No model", c=0.5)
+    current = create_results(a=1.0, b=1.0, c="No model")
+    assert compare_benchmarks(baseline, current) == []
+
+
+def test_prettify_benchmarks():
+    baseline = create_results(a=0.5, c=0.5)
+    current = create_results(a=0.625, b=0.001, c="No model")
+    table = prettify_benchmarks(current)
+    assert "change" not in table
+    assert "c skipped: No model" in table
+    table = prettify_benchmarks(current, baseline)
+    lines = table.splitlines()
+    assert "p50 change" in lines[0]
+    row = next(line for line in lines if line.startswith("a "))
+    assert "+25.0%" in row and "+25.0%" in row.split("+25.0%", 1)[1]
+    # Without a baseline the benchmark has no change to show
+    row = next(line for line in lines if line.startswith("b "))
+    assert "%" not in row
+    assert lines[-1] == "c skipped: No model"
+
+
+def test_run_benchmarks_skips_unavailable_benchmarks():
+    def unavailable(_):
+        raise ImportError("No module named 'tensorflow'")
+
+    results = run_benchmarks(
+        2,
+        repetitions=1,
+        benchmarks={
+            "turn": lambda battles: lambda i: battles[i].turn,
+            "unavailable": unavailable,
+        },
+    )
+    assert results["corpus"]["synthesized"] == 2
+    assert results["benchmarks"]["turn"]["calls"] == 2
+    assert results["benchmarks"]["unavailable"] == {
+        "skipped": "No module named 'tensorflow'"
+    }
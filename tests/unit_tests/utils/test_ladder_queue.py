@@ -0,0 +1,128 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import asyncio
+import pytest
+
+from poke_env.player.random_player import RandomPlayer
+from poke_env.player_configuration import PlayerConfiguration
+from unittest.mock import AsyncMock, Mock
+
+from utils.battle_watchdog import BattleWatchdog
+from utils.ladder_queue import LadderQueue
+
+
+async def run(coroutine):
+    return await coroutine
+
+
+def create_queue(concurrent_battles=3, timeout=10, interval=10, search_timeout=10):
+    player = RandomPlayer(
+        player_configuration=PlayerConfiguration("Ladder Player", None),
+        start_listening=False,
+    )
+    player._logged_in = asyncio.Event()
+    player._logged_in.set()
+    player._battle_start_condition = asyncio.Condition()
+    player._battle_end_condition = asyncio.Condition()
+    player._battle_semaphore = asyncio.Semaphore(0)
+    player._handle_threaded_coroutines = run
+    player._send_message = AsyncMock()
+
+    async def start_battle():
+        async with player._battle_start_condition:
+            player._battles[f"battle-{len(player._battles) + 1}"] = Mock(finished=False)
+            player._battle_semaphore.release()
+            player._battle_start_condition.notify_all()
+
+    player._search_ladder_game = AsyncMock(
+        side_effect=lambda _: asyncio.ensure_future(start_battle())
+    )
+    watchdog = BattleWatchdog(player, timeout, interval)
+    return player, LadderQueue(player, concurrent_battles, watchdog, search_timeout)
+
+
+async def end_battle(player, battle_tag, delay=0.01):
+    await asyncio.sleep(delay)
+    async with player._battle_end_condition:
+        player._battles[battle_tag].finished = True
+        player._battle_end_condition.notify_all()
+
+
+def test_ladder_queue_arguments():
+    player = RandomPlayer(start_listening=False)
+    with pytest.raises(ValueError):
+        LadderQueue(player, 0, BattleWatchdog(player, 10))
+    with pytest.raises(ValueError):
+        LadderQueue(player, 1, BattleWatchdog(player, 10), 0)
+
+
+def test_play_keeps_the_slots_full():
+    player, queue = create_queue()
+    loop = asyncio.get_event_loop()
+
+    async def play():
+        asyncio.ensure_future(end_battle(player, "battle-2"))
+        await queue.play()
+
+    loop.run_until_complete(play())
+    assert player._search_ladder_game.await_count == 3
+    assert queue.active_battles() == {"battle-1", "battle-3"}
+    asyncio.ensure_future(end_battle(player, "battle-1"))
+    loop.run_until_complete(queue.play())
+    # Only the slot of the ended battle is searched again
+    assert player._search_ladder_game.await_count == 4
+    assert queue.active_battles() == {"battle-3", "battle-4"}
+
+
+def test_play_does_not_start_more_battles_than_remaining():
+    player, queue = create_queue()
+    loop = asyncio.get_event_loop()
+    asyncio.ensure_future(end_battle(player, "battle-1"))
+    loop.run_until_complete(queue.play(1))
+    assert player._search_ladder_game.await_count == 1
+    loop.run_until_complete(queue.play(0))
+    assert player._search_ladder_game.await_count == 1
+
+
+def test_play_replaces_the_forfeited_battles():
+    player, queue = create_queue(concurrent_battles=1, timeout=0.01, interval=0.02)
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(queue.play())
+    player._send_message.assert_awaited_once_with("/forfeit", "battle-1")
+    assert queue.watchdog.forfeited == ["battle-1"]
+    assert queue.active_battles() == set()
+    asyncio.ensure_future(end_battle(player, "battle-2"))
+    loop.run_until_complete(queue.play())
+    assert player._search_ladder_game.await_count == 2
+
+
+def test_start_battle_searches_again_after_the_timeout():
+    player, queue = create_queue(concurrent_battles=1, search_timeout=0.01)
+    start_battle = player._search_ladder_game.side_effect
+
+    # The server drops the first search
+    def search(battle_format):
+        if player._search_ladder_game.await_count > 1:
+            return start_battle(battle_format)
+
+    player._search_ladder_game.side_effect = search
+    asyncio.ensure_future(end_battle(player, "battle-1", 0.05))
+    asyncio.get_event_loop().run_until_complete(queue.play())
+    player._send_message.assert_awaited_once_with("/cancelsearch")
+    assert player._search_ladder_game.await_count == 2
+    assert "battle-1" in player.battles
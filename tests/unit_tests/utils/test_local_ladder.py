@@ -0,0 +1,67 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import pytest
+
+from utils.local_ladder import (
+    elo_update,
+    glicko_update,
+    gxe,
+    LocalLadder,
+    LocalLadderManager,
+)
+
+
+def test_elo_update():
+    assert elo_update(1000, 1, 1000) == 1045
+    assert elo_update(1000, 0, 1000) == 1000
+    assert elo_update(1100, 0, 1100) == pytest.approx(1100 - 30 * 0.5)
+    assert elo_update(1500, 1, 1500) == 1520
+    assert elo_update(1700, 0, 1700) == 1684
+    assert elo_update(1300, 0.5, 1300) == 1300
+
+
+def test_glicko_update():
+    rating, deviation = glicko_update(1500, 200, 1, 1400, 30)
+    assert rating == pytest.approx(1563.4, abs=0.1)
+    assert deviation == pytest.approx(175.2, abs=0.1)
+    assert glicko_update(1500, 25, 0, 1500, 25)[1] == 25
+
+
+def test_gxe():
+    assert gxe(1500, 350) == 50.0
+    assert gxe(1700, 50) > gxe(1700, 300) > 50
+    assert gxe(1300, 50) < 50
+
+
+def test_local_ladder_updates_once_per_battle():
+    ladder = LocalLadder()
+    assert ladder.get_ratings("a")["elo"] == 1000
+    ratings = ladder.report("battle-1", "a", "b", 1.0)
+    assert ratings["elo"] == 1045
+    assert ladder.report("battle-1", "b", "a", 0.0)["elo"] == 1000
+    assert ladder.get_ratings("a")["elo"] == 1045
+    assert ladder.get_ratings("a")["rpr"] > 1500 > ladder.get_ratings("b")["rpr"]
+    ladder.report("battle-2", "b", "a", None)
+    assert ladder.get_ratings("b")["rprd"] < ladder.get_ratings("c")["rprd"]
+
+
+def test_local_ladder_manager():
+    with LocalLadderManager() as manager:
+        ladder = manager.LocalLadder()
+        ladder.report("battle-1", "a", "b", 0.0)
+        assert ladder.get_ratings("b")["elo"] == 1045
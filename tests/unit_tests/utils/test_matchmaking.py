@@ -0,0 +1,178 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import asyncio
+import math
+import numpy as np
+import pytest
+
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from utils import matchmaking
+from utils.matchmaking import (
+    _play_pair,  # noqa
+    adaptive_cross_evaluate,
+    get_players,
+    MatchmakingScheduler,
+)
+from utils.ratings import RatingEngine
+from utils.result_store import ResultStore
+
+
+def create_thread_pool(workers, mp_context, initializer, initargs):
+    return ThreadPoolExecutor(workers, initializer=initializer, initargs=initargs)
+
+
+def test_invalid_batch_size():
+    with pytest.raises(ValueError):
+        MatchmakingScheduler(RatingEngine(), batch_size=0)
+
+
+def test_scheduler_prefers_uncertain_close_pairs():
+    engine = RatingEngine()
+    engine.add_results("strong", "weak", 200, 0)
+    engine.add_results("strong", "close", 100, 100)
+    engine.add_player("new")
+    scheduler = MatchmakingScheduler(engine.fit(), batch_size=50)
+    gains = scheduler.information_gains()
+    assert gains.shape == (4, 4)
+    pair = scheduler.next_pair()
+    assert "new" in pair and "weak" not in pair
+    weak, close = engine.players.index("weak"), engine.players.index("close")
+    strong = engine.players.index("strong")
+    assert gains[weak, close] > gains[strong, close]
+
+
+def test_scheduler_avoids_lopsided_pairs():
+    strengths = {f"p{i}": 2.0 * i for i in range(5)}
+    engine = RatingEngine()
+    for player in strengths.keys():
+        engine.add_player(player)
+    scheduler = MatchmakingScheduler(engine.fit(), batch_size=100)
+    battles = {}
+    for _ in range(30):
+        player, opponent = scheduler.next_pair()
+        p = 1 / (1 + math.exp(strengths[opponent] - strengths[player]))
+        engine.add_results(player, opponent, round(100 * p), 100 - round(100 * p))
+        engine.fit()
+        gap = abs(strengths[player] - strengths[opponent])
+        battles[gap] = battles.get(gap, 0) + 100
+    assert battles.get(8.0, 0) < battles[2.0]
+    assert sum(battles.get(gap, 0) for gap in (6.0, 8.0)) < battles[2.0] / 2
+
+
+def test_scheduler_exclusions():
+    engine = RatingEngine()
+    for player in ["a", "b", "c"]:
+        engine.add_player(player)
+    scheduler = MatchmakingScheduler(engine.fit(), max_battles_per_pair=10)
+    assert scheduler.next_pair(candidates=["c", "a"]) == ("a", "c")
+    assert scheduler.next_pair([("a", "b"), ("c", "a")]) == ("b", "c")
+    engine.add_results("b", "c", 5, 5)
+    engine.fit()
+    assert scheduler.next_pair([("a", "b"), ("c", "a")]) is None
+    assert scheduler.next_pair(candidates=["a"]) is None
+
+
+def test_play_pair_reuses_players():
+    def create_fake_agents(agent_name, battle_format, player_configurations, *args):
+        agents = []
+        for i, player_configuration in enumerate(player_configurations):
+            agent = MagicMock()
+            agent.username = player_configuration.username
+            agent.n_won_battles = i + 1
+            agent.n_finished_battles = 4
+            agent.send_challenges = AsyncMock()
+            agent.accept_challenges = AsyncMock()
+            agents.append(agent)
+        return agents
+
+    with patch.dict(matchmaking._PLAYERS, clear=True), patch(  # noqa
+        "utils.matchmaking.create_agent", side_effect=create_fake_agents
+    ) as mock_create, patch("utils.create_agent.count_agents", return_value=2):
+        loop = asyncio.get_event_loop()
+        result = loop.run_until_complete(
+            _play_pair((3, "simpleRL-all", 0), (3, "simpleRL-all", 1), "gen8ou", 4, 5)
+        )
+        assert result == (1, 2, 4)
+        loop.run_until_complete(
+            _play_pair((3, "simpleRL-all", 1), (3, "simpleRL-all", 0), "gen8ou", 4, 5)
+        )
+        assert mock_create.call_count == 1
+        usernames = [c.username for c in mock_create.call_args.args[2]]
+        assert usernames == ["Match0-3 1", "Match0-3 2"]
+        players = matchmaking._PLAYERS[3]  # noqa
+        assert players[0].send_challenges.call_args.args == ("match032", 4)
+
+
+def test_adaptive_cross_evaluate(tmp_path):
+    strengths = {"dad": 0.0, "dad (2)": 0.1, "8-year-old-me": -3.0}
+    rng = np.random.default_rng(0)
+    lock = Lock()
+    pairs = []
+
+    def play_fake_pair(player, opponent, battle_format, battles, *args):
+        names = []
+        for entry, agent_name, _ in (player, opponent):
+            names.append(agent_name if entry != 1 else f"{agent_name} (2)")
+        p = 1 / (1 + math.exp(strengths[names[1]] - strengths[names[0]]))
+        with lock:
+            pairs.append((tuple(names), battles))
+            wins = rng.binomial(battles, p)
+        return wins, battles - wins, battles
+
+    store = ResultStore(str(tmp_path / "results.sqlite"))
+    store.record_matchups("gen8ou", [("old", "dad", 1, 2), ("dad", "old", 1, 2)])
+    with patch(
+        "utils.matchmaking.ProcessPoolExecutor", side_effect=create_thread_pool
+    ), patch("utils.matchmaking.play_pair", side_effect=play_fake_pair):
+        engine = adaptive_cross_evaluate(
+            ["dad", "dad", "8-year-old-me"],
+            "gen8ou",
+            1050,
+            batch_size=100,
+            workers=2,
+            store=store,
+        )
+    assert sum(battles for _, battles in pairs) == 1050
+    assert all(battles == 100 for _, battles in pairs[:-1])
+    assert all("old" not in names for names, _ in pairs)
+    played = store.played_battles("gen8ou")
+    assert sum(played.values()) == 2 * 1050 + 4
+    assert played[("dad", "dad (2)")] == played[("dad (2)", "dad")] > 0
+    ratings = engine.ratings()
+    assert ratings["8-year-old-me"][0] < ratings["dad"][0]
+    assert set(engine.players) == {"old", "dad", "dad (2)", "8-year-old-me"}
+    store.close()
+
+
+def test_invalid_workers():
+    with pytest.raises(ValueError):
+        adaptive_cross_evaluate(["dad", "dad"], "gen8ou", 100, workers=0)
+
+
+def test_get_players():
+    with patch("os.listdir", return_value=["a.pokeai", "b.pokeai"]):
+        players = get_players(["dad", "expertRL-all", "dad"], "gen8ou")
+    assert players == {
+        "dad": (0, "dad", 0),
+        "expertRL-all/1": (1, "expertRL-all", 0),
+        "expertRL-all/2": (1, "expertRL-all", 1),
+        "dad (2)": (2, "dad", 0),
+    }
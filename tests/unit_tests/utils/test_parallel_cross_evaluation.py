@@ -0,0 +1,362 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import asyncio
+import os
+import pytest
+
+from concurrent.futures import ThreadPoolExecutor
+from poke_env.server_configuration import ServerConfiguration
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from utils.decision_latency import (
+    DecisionProfiler,
+    export_latency_histograms,
+    load_latency_histograms,
+)
+from utils.result_store import ResultStore
+from utils.parallel_cross_evaluation import (
+    _play_matchup,  # noqa
+    get_matchups,
+    merge_matchup_results,
+    parallel_cross_evaluate,
+)
+
+
+class FakeAgent(MagicMock):
+    pass
+
+
+# The -all agents of the tests load two models without reading the model folders
+@pytest.fixture(autouse=True)
+def count_agents():
+    with patch(
+        "utils.create_agent.count_agents",
+        side_effect=lambda agent_name, _: 2 if agent_name.endswith("-all") else 1,
+    ):
+        yield
+
+
+def create_fake_agents(agent_name, battle_format, player_configurations, *args):
+    agents = []
+    for player_configuration in player_configurations:
+        agent = FakeAgent()
+        agent.username = player_configuration.username
+        agent.n_won_battles = 1 if "-a" in player_configuration.username else 3
+        agent.n_finished_battles = 4
+        agent.send_challenges = AsyncMock()
+        agent.accept_challenges = AsyncMock()
+        agents.append(agent)
+    return agents
+
+
+def test_get_matchups():
+    assert get_matchups(["dad", "simpleRL-all", "dad"]) == [
+        (0, 1),
+        (0, 2),
+        (1, 1),
+        (1, 2),
+    ]
+    assert get_matchups(["dad"]) == []
+
+
+def test_merge_matchup_results():
+    classes = {(0, 0): "Dad", (1, 0): "SimpleRLAgent", (1, 1): "SimpleRLAgent"}
+    results = {
+        ((0, 0), (1, 0)): (6, 10),
+        ((1, 0), (0, 0)): (4, 10),
+        ((1, 0), (1, 1)): (3, 10),
+        ((1, 1), (1, 0)): (7, 10),
+        ((0, 0), (1, 1)): (0, 0),
+    }
+    assert merge_matchup_results(classes, results) == {
+        "Dad 1": {"Dad 1": None, "SimpleRLAgent 1": 0.6, "SimpleRLAgent 2": None},
+        "SimpleRLAgent 1": {
+            "Dad 1": 0.4,
+            "SimpleRLAgent 1": None,
+            "SimpleRLAgent 2": 0.3,
+        },
+        "SimpleRLAgent 2": {
+            "Dad 1": None,
+            "SimpleRLAgent 1": 0.7,
+            "SimpleRLAgent 2": None,
+        },
+    }
+
+
+def test_play_matchup_between_entries():
+    with patch(
+        "utils.parallel_cross_evaluation.create_agent", side_effect=create_fake_agents
+    ) as mock_create, patch(
+        "utils.parallel_cross_evaluation.close_player"
+    ) as mock_close:
+        classes, results = asyncio.get_event_loop().run_until_complete(
+            _play_matchup(3, [(0, "dad", 1), (2, "simpleRL-all", 1)], "gen8ou", 10, 5)
+        )
+    usernames = [
+        [configuration.username for configuration in c.args[2]]
+        for c in mock_create.call_args_list
+    ]
+    assert usernames == [["Cross3-a"], ["Cross3-b 1", "Cross3-b 2"]]
+    assert classes == {(0, 0): "FakeAgent", (2, 0): "FakeAgent", (2, 1): "FakeAgent"}
+    assert results == {
+        ((0, 0), (2, 0)): (1, 4),
+        ((2, 0), (0, 0)): (3, 4),
+        ((0, 0), (2, 1)): (1, 4),
+        ((2, 1), (0, 0)): (3, 4),
+    }
+    assert mock_close.call_count == 3
+
+
+def test_play_matchup_within_entry():
+    with patch(
+        "utils.parallel_cross_evaluation.create_agent", side_effect=create_fake_agents
+    ), patch("utils.parallel_cross_evaluation.close_player"):
+        classes, results = asyncio.get_event_loop().run_until_complete(
+            _play_matchup(0, [(1, "simpleRL-all", 1)], "gen8ou", 10, 5)
+        )
+    assert list(classes.keys()) == [(1, 0), (1, 1)]
+    assert list(results.keys()) == [((1, 0), (1, 1)), ((1, 1), (1, 0))]
+
+
+def test_play_matchup_closes_players_on_failure():
+    def create_failing_agents(*args):
+        agents = create_fake_agents(*args)
+        for agent in agents:
+            agent.send_challenges.side_effect = ConnectionError()
+        return agents
+
+    with patch(
+        "utils.parallel_cross_evaluation.create_agent",
+        side_effect=create_failing_agents,
+    ), patch("utils.parallel_cross_evaluation.close_player") as mock_close:
+        with pytest.raises(ConnectionError):
+            asyncio.get_event_loop().run_until_complete(
+                _play_matchup(0, [(0, "dad", 1), (1, "dad", 2)], "gen8ou", 10, 5)
+            )
+    assert mock_close.call_count == 2
+
+
+def test_invalid_workers():
+    with pytest.raises(ValueError):
+        parallel_cross_evaluate(["dad", "dad"], "gen8ou", 10, workers=0)
+
+
+def test_parallel_cross_evaluate():
+    servers = [ServerConfiguration(f"localhost:{port}", "") for port in (1, 2)]
+    used_servers = set()
+
+    def play_fake_matchup(job, entries, battle_format, challenges, *args):
+        from utils import parallel_cross_evaluation
+
+        used_servers.add(parallel_cross_evaluation._SERVER_CONFIGURATION)  # noqa
+        (i, _, _), (j, _, _) = entries
+        return {(i, 0): "Dad", (j, 0): "Dad"}, {
+            ((i, 0), (j, 0)): (i, 10),
+            ((j, 0), (i, 0)): (j, 10),
+        }
+
+    def create_thread_pool(workers, mp_context, initializer, initargs):
+        return ThreadPoolExecutor(workers, initializer=initializer, initargs=initargs)
+
+    with patch(
+        "utils.parallel_cross_evaluation.ProcessPoolExecutor",
+        side_effect=create_thread_pool,
+    ), patch(
+        "utils.parallel_cross_evaluation.play_matchup", side_effect=play_fake_matchup
+    ):
+        evaluation = parallel_cross_evaluate(
+            ["dad", "dad", "dad"],
+            "gen8ou",
+            10,
+            workers=1,
+            server_configurations=servers,
+        )
+    assert evaluation == {
+        "Dad 1": {"Dad 1": None, "Dad 2": 0.0, "Dad 3": 0.0},
+        "Dad 2": {"Dad 1": 0.1, "Dad 2": None, "Dad 3": 0.1},
+        "Dad 3": {"Dad 1": 0.2, "Dad 2": 0.2, "Dad 3": None},
+    }
+    assert used_servers == {servers[0]}
+
+
+def test_play_matchup_plays_missing_battles():
+    played = {("dad", "dad (2)"): 4, ("simpleRL-all/1", "simpleRL-all/2"): 10}
+    agents = []
+
+    def create_recorded_agents(*args):
+        agents.extend(create_fake_agents(*args))
+        return agents[-1:] if not args[0].endswith("-all") else agents[-2:]
+
+    with patch(
+        "utils.parallel_cross_evaluation.create_agent",
+        side_effect=create_recorded_agents,
+    ), patch("utils.parallel_cross_evaluation.close_player"):
+        loop = asyncio.get_event_loop()
+        _, results = loop.run_until_complete(
+            _play_matchup(0, [(0, "dad", 1), (1, "dad", 2)], "gen8ou", 10, 5, played)
+        )
+        assert len(results) == 2
+        assert agents[0].send_challenges.call_args.args[1] == 6
+        assert agents[1].accept_challenges.call_args.args[1] == 6
+        _, results = loop.run_until_complete(
+            _play_matchup(1, [(2, "simpleRL-all", 1)], "gen8ou", 10, 5, played)
+        )
+        assert results == {}
+
+
+def test_parallel_cross_evaluate_resumes_from_store(tmp_path):
+    store = ResultStore(str(tmp_path / "results.sqlite"))
+    store.record_matchups(
+        "gen8ou", [("dad", "dad (2)", 3, 10), ("dad (2)", "dad", 7, 10)]
+    )
+    jobs = []
+
+    def play_fake_matchup(job, entries, battle_format, challenges, *args):
+        jobs.append([agent_name for _, agent_name, _ in entries])
+        (i, _, _), (j, _, _) = entries
+        return {(i, 0): "Dad", (j, 0): "EightYearOldMe"}, {
+            ((i, 0), (j, 0)): (6, 10),
+            ((j, 0), (i, 0)): (4, 10),
+        }
+
+    def create_thread_pool(workers, mp_context, initializer, initargs):
+        return ThreadPoolExecutor(workers, initializer=initializer, initargs=initargs)
+
+    with patch(
+        "utils.parallel_cross_evaluation.ProcessPoolExecutor",
+        side_effect=create_thread_pool,
+    ), patch(
+        "utils.parallel_cross_evaluation.play_matchup", side_effect=play_fake_matchup
+    ):
+        evaluation = parallel_cross_evaluate(
+            ["dad", "dad", "8-year-old-me"], "gen8ou", 10, workers=1, store=store
+        )
+    assert jobs == [["dad", "8-year-old-me"], ["dad", "8-year-old-me"]]
+    assert evaluation == {
+        "dad": {"dad": None, "dad (2)": 0.3, "8-year-old-me": 0.6},
+        "dad (2)": {"dad": 0.7, "dad (2)": None, "8-year-old-me": 0.6},
+        "8-year-old-me": {"dad": 0.4, "dad (2)": 0.4, "8-year-old-me": None},
+    }
+    assert store.played_battles("gen8ou")[("8-year-old-me", "dad (2)")] == 10
+    store.close()
+
+
+def test_parallel_cross_evaluate_merges_latency_histograms(tmp_path):
+    directories = []
+
+    def play_fake_matchup(job, entries, battle_format, challenges, *args):
+        from utils import parallel_cross_evaluation
+
+        directory = parallel_cross_evaluation._LATENCY_DIRECTORY  # noqa
+        directories.append(directory)
+        profiler = DecisionProfiler()
+        profiler.record("total", 0.001)
+        export_latency_histograms(
+            os.path.join(directory, f"{job}.json"), {"dad": profiler}
+        )
+        (i, _, _), (j, _, _) = entries
+        return {(i, 0): "Dad", (j, 0): "Dad"}, {
+            ((i, 0), (j, 0)): (5, 10),
+            ((j, 0), (i, 0)): (5, 10),
+        }
+
+    def create_thread_pool(workers, mp_context, initializer, initargs):
+        return ThreadPoolExecutor(workers, initializer=initializer, initargs=initargs)
+
+    path = str(tmp_path / "latency.json")
+    with patch(
+        "utils.parallel_cross_evaluation.ProcessPoolExecutor",
+        side_effect=create_thread_pool,
+    ), patch(
+        "utils.parallel_cross_evaluation.play_matchup", side_effect=play_fake_matchup
+    ):
+        parallel_cross_evaluate(
+            ["dad", "dad", "dad"], "gen8ou", 10, workers=2, latency_histograms=path
+        )
+    assert len(directories) == 3
+    assert not os.path.exists(directories[0])
+    assert load_latency_histograms([path])["dad"]["total"].count == 3
+
+
+def test_play_matchup_until_settled():
+    agents = []
+
+    def create_recorded_agents(*args):
+        agents.extend(create_fake_agents(*args))
+        return agents[-1:]
+
+    with patch(
+        "utils.parallel_cross_evaluation.create_agent",
+        side_effect=create_recorded_agents,
+    ), patch("utils.parallel_cross_evaluation.close_player"), patch(
+        "utils.parallel_cross_evaluation.sequential_compare_players",
+        new_callable=AsyncMock,
+    ) as mock_compare:
+        _, results = asyncio.get_event_loop().run_until_complete(
+            _play_matchup(
+                0, [(0, "dad", 1), (1, "dad", 2)], "gen8ou", 10, 5, {}, settle_batch=2
+            )
+        )
+    mock_compare.assert_awaited_once_with(agents[0], agents[1], 10, 2)
+    agents[0].send_challenges.assert_not_called()
+    assert results == {((0, 0), (1, 0)): (1, 4), ((1, 0), (0, 0)): (3, 4)}
+
+
+def test_parallel_cross_evaluate_skips_settled_pairs(tmp_path):
+    store = ResultStore(str(tmp_path / "results.sqlite"))
+    store.record_matchups(
+        "gen8ou",
+        [
+            ("dad", "dad (2)", 90, 100),
+            ("dad (2)", "dad", 10, 100),
+            ("dad", "dad (3)", 50, 100),
+            ("dad (3)", "dad", 50, 100),
+        ],
+    )
+    jobs = []
+
+    def play_fake_matchup(job, entries, *args):
+        jobs.append([copy for _, _, copy in entries])
+        return {}, {}
+
+    def create_thread_pool(workers, mp_context, initializer, initargs):
+        return ThreadPoolExecutor(workers, initializer=initializer, initargs=initargs)
+
+    with patch(
+        "utils.parallel_cross_evaluation.ProcessPoolExecutor",
+        side_effect=create_thread_pool,
+    ), patch(
+        "utils.parallel_cross_evaluation.play_matchup", side_effect=play_fake_matchup
+    ):
+        parallel_cross_evaluate(
+            ["dad", "dad", "dad"], "gen8ou", 1000, workers=1, store=store
+        )
+        assert len(jobs) == 3
+        jobs.clear()
+        parallel_cross_evaluate(
+            ["dad", "dad", "dad"],
+            "gen8ou",
+            1000,
+            workers=1,
+            store=store,
+            settle_batch=100,
+        )
+    assert sorted(jobs) == [[1, 3], [2, 3]]
+    with pytest.raises(ValueError):
+        parallel_cross_evaluate(["dad", "dad"], "gen8ou", 10, settle_batch=0)
+    store.close()
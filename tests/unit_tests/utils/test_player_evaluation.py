@@ -0,0 +1,192 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import pytest
+
+from poke_env.player.baselines import MaxBasePowerPlayer, SimpleHeuristicsPlayer
+from poke_env.player.player import Player
+from poke_env.player.random_player import RandomPlayer
+from unittest.mock import AsyncMock, PropertyMock, patch
+
+from utils.player_evaluation import (
+    create_baselines,
+    evaluate_against_baselines,
+    is_settled,
+    relative_interval_width,
+    sequential_compare_players,
+    sequential_evaluate_against_baselines,
+    win_rate_interval,
+)
+
+
+def test_create_baselines():
+    with patch("poke_env.player.player.Player.__init__") as mock_init:
+        mock_init.return_value = None
+        baselines = create_baselines(42, "Eval0 ")
+        assert [type(b) for b in baselines] == [
+            RandomPlayer,
+            MaxBasePowerPlayer,
+            SimpleHeuristicsPlayer,
+        ]
+        usernames = [
+            c.kwargs["player_configuration"].username for c in mock_init.call_args_list
+        ]
+        assert usernames == [
+            "Eval0 RandomPlayer",
+            "Eval0 MaxBasePower",
+            "Eval0 SimpleHeuris",
+        ]
+        for c in mock_init.call_args_list:
+            assert c.kwargs["max_concurrent_battles"] == 42
+
+
+@pytest.mark.asyncio
+async def test_evaluate_against_baselines():
+    baselines = [
+        RandomPlayer(start_listening=False),
+        MaxBasePowerPlayer(start_listening=False),
+        SimpleHeuristicsPlayer(start_listening=False),
+    ]
+    player = RandomPlayer(start_listening=False)
+    win_rates = {
+        RandomPlayer: 0.1,
+        MaxBasePowerPlayer: 0.45,
+        SimpleHeuristicsPlayer: 0.9,
+    }
+    with patch(
+        "poke_env.player.player.Player.battle_against", new_callable=AsyncMock
+    ) as mock_battle, patch.object(
+        Player, "win_rate", property(lambda self: win_rates[type(self)])
+    ), patch(
+        "poke_env.player.player.Player.n_finished_battles", new_callable=PropertyMock
+    ) as mock_finished, patch(
+        "poke_env.player.player.Player.n_lost_battles", new_callable=PropertyMock
+    ) as mock_lost:
+        mock_finished.return_value = 100
+        mock_lost.return_value = 50
+        evaluation = await evaluate_against_baselines(player, baselines, 100, 10)
+        assert mock_battle.await_count == 4
+        assert mock_battle.await_args_list[-1].args == (player, 70)
+        assert evaluation[0] == pytest.approx(7.665994)
+
+
+@pytest.mark.asyncio
+async def test_evaluate_against_baselines_not_enough_battles():
+    with pytest.raises(ValueError):
+        await evaluate_against_baselines(None, [None, None, None], 3, 10)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "finished,lost,expected_battles,last_batch",
+    [(10000, 5000, 4, 100), (100, 50, 13, 70)],
+)
+async def test_sequential_evaluate_against_baselines(
+    finished, lost, expected_battles, last_batch
+):
+    baselines = [
+        RandomPlayer(start_listening=False),
+        MaxBasePowerPlayer(start_listening=False),
+        SimpleHeuristicsPlayer(start_listening=False),
+    ]
+    player = RandomPlayer(start_listening=False)
+    win_rates = {
+        RandomPlayer: 0.1,
+        MaxBasePowerPlayer: 0.45,
+        SimpleHeuristicsPlayer: 0.9,
+    }
+    with patch(
+        "poke_env.player.player.Player.battle_against", new_callable=AsyncMock
+    ) as mock_battle, patch.object(
+        Player, "win_rate", property(lambda self: win_rates[type(self)])
+    ), patch(
+        "poke_env.player.player.Player.n_finished_battles", new_callable=PropertyMock
+    ) as mock_finished, patch(
+        "poke_env.player.player.Player.n_lost_battles", new_callable=PropertyMock
+    ) as mock_lost:
+        mock_finished.return_value = finished
+        mock_lost.return_value = lost
+        evaluation = await sequential_evaluate_against_baselines(
+            player, baselines, 1000, 10, 100, 0.25
+        )
+        assert mock_battle.await_count == expected_battles
+        assert mock_battle.await_args_list[-1].args == (player, last_batch)
+        assert evaluation[0] == pytest.approx(7.665994)
+
+
+@pytest.mark.asyncio
+async def test_sequential_evaluate_against_baselines_invalid_arguments():
+    with pytest.raises(ValueError):
+        await sequential_evaluate_against_baselines(None, [None, None, None], 3, 10)
+    with pytest.raises(ValueError):
+        await sequential_evaluate_against_baselines(
+            None, [None, None, None], 1000, 10, 0
+        )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("won,expected_battles", [(80, 1), (50, 10)])
+async def test_sequential_compare_players(won, expected_battles):
+    player_1 = RandomPlayer(start_listening=False)
+    player_2 = RandomPlayer(start_listening=False)
+    with patch(
+        "poke_env.player.player.Player.battle_against", new_callable=AsyncMock
+    ) as mock_battle, patch(
+        "poke_env.player.player.Player.n_finished_battles", new_callable=PropertyMock
+    ) as mock_finished, patch(
+        "poke_env.player.player.Player.n_won_battles", new_callable=PropertyMock
+    ) as mock_won:
+        mock_finished.return_value = 100
+        mock_won.return_value = won
+        win_rate, interval, battles = await sequential_compare_players(
+            player_1, player_2, 1000, 100
+        )
+        assert mock_battle.await_count == expected_battles
+        assert win_rate == won / 100
+        assert interval[0] <= win_rate <= interval[1]
+        assert battles == 100
+
+
+def test_win_rate_interval():
+    assert win_rate_interval(0, 0) == (0.5, (0.0, 1.0))
+    win_rate, (lower_bound, upper_bound) = win_rate_interval(50, 100)
+    assert win_rate == 0.5
+    assert lower_bound == pytest.approx(0.4038, abs=1e-4)
+    assert upper_bound == pytest.approx(0.5962, abs=1e-4)
+    win_rate, (lower_bound, upper_bound) = win_rate_interval(100, 100)
+    assert win_rate == 1.0
+    assert lower_bound == pytest.approx(0.9630, abs=1e-4)
+    assert upper_bound == 1.0
+    _, (wider_lower_bound, _) = win_rate_interval(100, 100, 0.99)
+    assert wider_lower_bound < lower_bound
+
+
+def test_relative_interval_width():
+    assert relative_interval_width((2, (1, 3))) == 1
+    assert relative_interval_width((2, (1, float("inf")))) == float("inf")
+    assert relative_interval_width((0, (0, 1))) == float("inf")
+
+
+def test_is_settled():
+    assert not is_settled(0, 0)
+    assert not is_settled(55, 100)
+    assert is_settled(65, 100)
+    assert is_settled(35, 100)
+    assert is_settled(62, 100)
+    assert not is_settled(62, 100, 10)
+    assert is_settled(65, 100, 10)
+    assert not is_settled(0, 1)
@@ -149,3 +149,17 @@ def test_plot_eval_save():
             "./plots/evaluation" in args[0] or "./plots\\evaluation" in args[0]
         ) and ".png" in args[0]
         assert kwargs["backend"] == "agg"
+
+
+def test_plot_eval_custom_baselines():
+    with patch("matplotlib.pyplot.errorbar"), patch("matplotlib.pyplot.scatter"), patch(
+        "matplotlib.pyplot.show"
+    ), patch("matplotlib.pyplot.ylim") as mock_ylim, patch(
+        "matplotlib.pyplot.axhline"
+    ) as mock_axhline:
+        evaluations = [("players", "evaluations"), ("p1", (1.0, (0.5, 1.5)))]
+        plot_eval(evaluations, baselines={"dad": 3.0})
+        assert mock_axhline.call_count == 1
+        assert mock_axhline.call_args.args == (3.0,)
+        assert mock_axhline.call_args.kwargs["label"] == "dad"
+        mock_ylim.assert_has_calls([call(0, 1.5 * 1.025), call(0, 3.0 * 1.025)])
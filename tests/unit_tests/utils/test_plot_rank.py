@@ -0,0 +1,66 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import os
+
+from unittest.mock import patch
+
+from utils.battle_telemetry import TelemetryLog
+from utils.plot_rank import aggregate_rank_telemetry, elo_stats, rank_telemetry_logs
+
+
+def write_log(path, agent, ratings):
+    with TelemetryLog(path) as log:
+        for rating in ratings:
+            log.write({"agent": agent, "rating": rating})
+
+
+def test_elo_stats():
+    records = [{"rating": 1045}, {"rating": None}, {"rating": 1020}]
+    assert elo_stats(records) == ([0, 1, 2, 3], [1000, 1045, 1045, 1020])
+    assert elo_stats([]) == ([0], [1000])
+
+
+def test_rank_telemetry_logs(tmp_path):
+    for file in ["rank A run1.jsonl", "rank B run2.jsonl", "data.csv", "B.jsonl"]:
+        (tmp_path / file).touch()
+    assert rank_telemetry_logs(str(tmp_path)) == [
+        os.path.join(str(tmp_path), "rank A run1.jsonl"),
+        os.path.join(str(tmp_path), "rank B run2.jsonl"),
+    ]
+    assert rank_telemetry_logs(str(tmp_path), "run2") == [
+        os.path.join(str(tmp_path), "rank B run2.jsonl")
+    ]
+
+
+def test_aggregate_rank_telemetry(tmp_path):
+    write_log(str(tmp_path / "rank A run.jsonl"), "A", [1045, 1080])
+    write_log(str(tmp_path / "rank B run.jsonl"), "B", [1000])
+    (tmp_path / "rank C run.jsonl").touch()
+    with patch("utils.plot_rank.plot_rank") as mock_plot_rank:
+        telemetry = aggregate_rank_telemetry(str(tmp_path), "run")
+    assert list(telemetry.keys()) == ["A", "B"]
+    assert mock_plot_rank.call_count == 2
+    mock_plot_rank.assert_any_call(
+        "A", telemetry["A"], os.path.join(str(tmp_path), "rank A run.png")
+    )
+    with open(tmp_path / "data.csv") as data_file:
+        assert data_file.read() == (
+            "agent;index_of_battle;elo\n"
+            "A;0;1000\nA;1;1045\nA;2;1080\n"
+            "B;0;1000\nB;1;1000\n"
+        )
@@ -0,0 +1,80 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import asyncio
+import threading
+
+from poke_env.player.random_player import RandomPlayer
+from poke_env.player_configuration import PlayerConfiguration
+from unittest.mock import AsyncMock
+
+from utils.rating_listener import parse_rating_update, RatingListener
+
+RATING_MESSAGE = (
+    "Test Account's rating: 1000 &rarr; <strong>1045</strong><br />(+45 for winning)"
+)
+
+
+def create_listener():
+    player = RandomPlayer(
+        player_configuration=PlayerConfiguration("Test Account", None),
+        start_listening=False,
+    )
+    handler = AsyncMock()
+    player._handle_battle_message = handler
+    return player, handler, RatingListener(player)
+
+
+def test_parse_rating_update():
+    assert parse_rating_update(RATING_MESSAGE) == ("testaccount", 1000, 1045)
+    assert parse_rating_update(
+        "O&#39;Neil's rating: 1200 &rarr; <strong>1184</strong><br />(-16 for losing)"
+    ) == ("oneil", 1200, 1184)
+    assert parse_rating_update("<div>Something else</div>") is None
+
+
+def test_listener_reads_rating_messages():
+    player, handler, listener = create_listener()
+    messages = [
+        [">battle-gen8randombattle-1"],
+        ["", "raw", "Opponent's rating: 1000 &rarr; <strong>1000</strong>"],
+        ["", "raw", RATING_MESSAGE],
+    ]
+    asyncio.get_event_loop().run_until_complete(player._handle_battle_message(messages))
+    handler.assert_awaited_once_with(messages)
+    assert listener.updates == 1
+    assert listener.battle_ratings == {"battle-gen8randombattle-1": 1045}
+    assert listener.wait_for_update(0, 0) == 1045
+    assert listener.wait_for_update(1, 0.01) is None
+
+
+def test_wait_for_update_from_another_thread():
+    _, _, listener = create_listener()
+    timer = threading.Timer(0.05, listener.receive, args=(RATING_MESSAGE,))
+    timer.start()
+    assert listener.wait_for_update(0, 5) == 1045
+    timer.join()
+
+
+def test_wait_for_updates_of_concurrent_battles():
+    _, _, listener = create_listener()
+    listener.receive(RATING_MESSAGE)
+    listener.receive(RATING_MESSAGE.replace("1000", "1045").replace("1045<", "1080<"))
+    assert listener.history == [1045, 1080]
+    assert listener.wait_for_updates(0, 2, 0) == [1045, 1080]
+    assert listener.wait_for_updates(1, 2, 0.01) == [1080]
+    assert listener.wait_for_updates(2, 1, 0.01) == []
@@ -0,0 +1,119 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import math
+import numpy as np
+import pytest
+
+from utils.ratings import RatingEngine
+from utils.result_store import ResultStore
+
+
+def test_invalid_prior_games():
+    with pytest.raises(ValueError):
+        RatingEngine(prior_games=0)
+
+
+def test_self_results():
+    with pytest.raises(ValueError):
+        RatingEngine().add_results("a", "a", 1)
+
+
+def test_two_players_without_prior_bias():
+    engine = RatingEngine(prior_games=1e-6, anchor="b")
+    engine.add_results("a", "b", 75, 25)
+    ratings = engine.fit().ratings()
+    assert ratings["a"][0] == pytest.approx(3, rel=1e-3)
+    strength, (lower_bound, upper_bound) = ratings["a"]
+    assert lower_bound < strength < upper_bound
+
+
+def test_undefeated_player_has_finite_rating():
+    engine = RatingEngine()
+    engine.add_results("a", "b", 10)
+    ratings = engine.fit().ratings()
+    assert math.isfinite(ratings["a"][0])
+    assert ratings["a"][0] > 1 > ratings["b"][0]
+
+
+def test_recovers_strengths_from_sparse_pairings():
+    rng = np.random.default_rng(42)
+    strengths = rng.normal(0, 1, 20)
+    engine = RatingEngine(prior_games=0.1)
+    for i in range(20):
+        for j in rng.choice(20, 4, replace=False):
+            if i != j:
+                p = 1 / (1 + math.exp(strengths[j] - strengths[i]))
+                wins = rng.binomial(200, p)
+                engine.add_results(f"p{i}", f"p{j}", wins, 200 - wins)
+    engine.fit()
+    estimates = engine.log_strengths[[engine.players.index(f"p{i}") for i in range(20)]]
+    assert np.corrcoef(estimates, strengths)[0, 1] > 0.99
+
+
+def test_incremental_updates_match_full_fit():
+    results = [("a", "b", 6, 4), ("b", "c", 7, 3), ("a", "c", 8, 2)]
+    incremental = RatingEngine()
+    for result in results:
+        incremental.add_results(*result)
+        incremental.fit()
+    full = RatingEngine()
+    for result in results:
+        full.add_results(*result)
+    full.fit()
+    assert incremental.players == full.players
+    np.testing.assert_allclose(incremental.log_strengths, full.log_strengths)
+
+
+def test_anchor_and_elo():
+    engine = RatingEngine(anchor="b", prior_games=1e-6)
+    engine.add_results("a", "b", 10, 90)
+    engine.add_results("c", "b", 50, 50)
+    engine.fit()
+    ratings = engine.ratings()
+    assert ratings["b"] == (1.0, (1.0, 1.0))
+    assert ratings["a"][0] == pytest.approx(1 / 9, rel=1e-3)
+    elo_ratings = engine.elo_ratings()
+    assert elo_ratings["b"][0] == pytest.approx(1000)
+    assert elo_ratings["a"][0] == pytest.approx(1000 - 400 * math.log10(9), rel=1e-3)
+    assert engine.evaluations(["c", "missing"]) == [
+        ["Player", "Evaluation"],
+        ["c", ratings["c"]],
+    ]
+    assert engine.strengths(["a", "missing"]) == {"a": ratings["a"][0]}
+
+
+def test_from_store(tmp_path):
+    with ResultStore(str(tmp_path / "results.sqlite")) as store:
+        store.record_matchups("gen8ou", [("a", "b", 3, 10), ("b", "a", 7, 10)])
+        store.record_matchups("gen8ou", [("a", "b", 1, 10), ("b", "a", 9, 10)])
+        engine = RatingEngine.from_store(store, "gen8ou", prior_games=1e-6, anchor="a")
+    assert engine.players == ["a", "b"]
+    assert engine.wins.tolist() == [[0, 4], [16, 0]]
+    ratings = engine.ratings()
+    assert ratings["b"][0] == pytest.approx(4, rel=1e-3)
+
+
+def test_win_rates():
+    engine = RatingEngine()
+    engine.add_results("a", "b", 3, 1)
+    engine.add_player("c")
+    assert engine.win_rates(["b", "a", "c"]) == {
+        "b": {"b": None, "a": 0.25, "c": None},
+        "a": {"b": 0.75, "a": None, "c": None},
+        "c": {"b": None, "a": None, "c": None},
+    }
@@ -0,0 +1,143 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import math
+import os
+import sqlite3
+
+from unittest.mock import patch
+
+from utils.prettify_cross_evaluation import prettify_evaluation
+from utils.result_store import get_player_key, ResultStore
+
+
+def test_matchups_are_accumulated(tmp_path):
+    path = str(tmp_path / "logs" / "results.sqlite")
+    with ResultStore(path) as store:
+        store.record_matchups("gen8ou", [("a", "b", 3, 10), ("b", "a", 7, 10)])
+    assert os.path.isfile(path)
+    with ResultStore(path) as store:
+        store.record_matchups("gen8ou", [("a", "b", 5, 10), ("b", "a", 5, 10)])
+        store.record_matchups("gen8randombattle", [("a", "c", 1, 1)])
+        assert store.played_battles("gen8ou") == {("a", "b"): 20, ("b", "a"): 20}
+        assert store.matchup_results("gen8ou") == {
+            ("a", "b"): (8, 20),
+            ("b", "a"): (12, 20),
+        }
+        assert store.cross_evaluation("gen8ou") == {
+            "a": {"a": None, "b": 0.4},
+            "b": {"a": 0.6, "b": None},
+        }
+
+
+def test_cross_evaluation_of_selected_players(tmp_path):
+    with ResultStore(str(tmp_path / "results.sqlite")) as store:
+        store.record_matchups(
+            "gen8ou",
+            [("a", "b", 3, 10), ("b", "a", 7, 10), ("a", "c", 0, 0)],
+        )
+        evaluation = store.cross_evaluation("gen8ou", ["c", "a"])
+        assert evaluation == {"c": {"c": None, "a": None}, "a": {"c": None, "a": None}}
+        assert "a" in prettify_evaluation(store.cross_evaluation("gen8ou"))
+
+
+def test_evaluations(tmp_path):
+    with ResultStore(str(tmp_path / "results.sqlite")) as store:
+        assert store.evaluation("gen8randombattle", "dad") is None
+        store.record_evaluation("gen8randombattle", "dad", 1000, (10.0, (8.0, 12.0)))
+        store.record_evaluation("gen8randombattle", "dad", 2000, (11.0, (10.0, 12.0)))
+        store.record_evaluation(
+            "gen8randombattle", "expertRL-best", 1000, (1.0, (0.5, math.inf))
+        )
+        assert store.evaluation("gen8randombattle", "dad") == (11.0, (10.0, 12.0))
+        assert store.evaluation("gen8randombattle", "dad", 1000) == (10.0, (8.0, 12.0))
+        assert store.evaluation("gen8randombattle", "dad", 500) is None
+        assert store.evaluations("gen8randombattle") == [
+            ["Player", "Evaluation"],
+            ["dad", (11.0, (10.0, 12.0))],
+            ["expertRL-best", (1.0, (0.5, math.inf))],
+        ]
+        assert store.evaluations("gen8randombattle", ["missing", "dad"]) == [
+            ["Player", "Evaluation"],
+            ["dad", (11.0, (10.0, 12.0))],
+        ]
+
+
+def test_get_player_key():
+    assert get_player_key("dad") == "dad"
+    assert get_player_key("dad", 3) == "dad (3)"
+    assert get_player_key("expertRL-best", 1, 0) == "expertRL-best"
+    assert get_player_key("expertRL-all", 2, 4) == "expertRL-all (2)/5"
+
+    assert get_player_key("dad", 1, 0, "gen8randombattle") == "dad"
+
+
+def test_evaluations_with_interval_width(tmp_path):
+    with ResultStore(str(tmp_path / "results.sqlite")) as store:
+        store.record_evaluation("gen8ou", "dad", 1000, (10.0, (8.0, 12.0)))
+        store.record_evaluation("gen8ou", "dad", 1000, (11.0, (10.0, 12.0)), 0.2)
+        assert store.evaluation("gen8ou", "dad", 1000) == (10.0, (8.0, 12.0))
+        assert store.evaluation("gen8ou", "dad", 1000, 0.2) == (11.0, (10.0, 12.0))
+        assert store.evaluation("gen8ou", "dad", 1000, 0.1) is None
+        assert store.evaluation("gen8ou", "dad") == (11.0, (10.0, 12.0))
+
+
+def test_store_created_without_interval_width(tmp_path):
+    path = str(tmp_path / "results.sqlite")
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE evaluations (battle_format TEXT NOT NULL, player TEXT NOT NULL, "
+        "challenges INTEGER NOT NULL, estimate REAL NOT NULL, lower_bound REAL NOT "
+        "NULL, upper_bound REAL NOT NULL, recorded_at REAL NOT NULL)"
+    )
+    connection.execute(
+        "INSERT INTO evaluations VALUES ('gen8ou', 'dad', 1000, 10, 8, 12, 0)"
+    )
+    connection.commit()
+    connection.close()
+    with ResultStore(path) as store:
+        assert store.evaluation("gen8ou", "dad", 1000) == (10.0, (8.0, 12.0))
+        store.record_evaluation("gen8ou", "dad", 1000, (11.0, (10.0, 12.0)), 0.2)
+        assert store.evaluation("gen8ou", "dad", 1000, 0.2) == (11.0, (10.0, 12.0))
+
+
+def test_get_player_key_with_model_fingerprint(tmp_path):
+    folder = tmp_path / "expertRL" / "gen8ou"
+    os.makedirs(folder)
+    (folder / "a.pokeai").write_bytes(b"first")
+    (folder / "b.pokeai").write_bytes(b"second")
+    (tmp_path / "expertRL" / "gen8ou" / "best.pokeai").write_bytes(b"best")
+    with patch("utils.create_agent.MODELS_PATH", str(tmp_path)):
+        first, second, third = [
+            get_player_key("expertRL-all", 1, member, "gen8ou") for member in range(3)
+        ]
+        assert first.startswith("expertRL-all/1 #")
+        assert len({first, second, third}) == 3
+        best = get_player_key("expertRL-best", 1, 0, "gen8ou")
+        assert best.startswith("expertRL-best #")
+        assert best == get_player_key("expertRL-best", 1, 0, "gen8ou")
+        # Retrained models and members in another order get new keys
+        (folder / "best.pokeai").write_bytes(b"retrained")
+        assert get_player_key("expertRL-best", 1, 0, "gen8ou") != best
+        os.rename(folder / "a.pokeai", folder / "c.pokeai")
+        assert get_player_key("expertRL-all", 1, 0, "gen8ou") != first
+        assert get_player_key("expertRL-all", 1, 2, "gen8ou").startswith(
+            "expertRL-all/3 #"
+        )
+        assert get_player_key("expertRL-best", 1, 0, "gen8randombattle") == (
+            "expertRL-best"
+        )
@@ -22,12 +22,19 @@ import pytest
 from io import BytesIO
 from unittest.mock import patch
 
-from utils.create_agent import create_agent
+from utils.create_agent import clear_model_cache, create_agent
 from utils.save_updated_model import update_model
 
 _TEST_MODEL = {"test": 42}
 
 
+@pytest.fixture(autouse=True)
+def model_cache():
+    clear_model_cache()
+    yield
+    clear_model_cache()
+
+
 def simulate_pickled_model():
     return BytesIO(pickle.dumps(_TEST_MODEL))
 
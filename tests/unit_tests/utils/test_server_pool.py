@@ -0,0 +1,103 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import pytest
+import socket
+import subprocess
+
+from unittest.mock import MagicMock, patch
+
+from utils.server_pool import ShowdownServerPool, get_server_configuration
+
+
+def test_get_server_configuration():
+    configuration = get_server_configuration(8001)
+    assert configuration.server_url == "localhost:8001"
+    assert configuration.authentication_url.startswith("https://")
+
+
+def test_attach_to_running_server():
+    with socket.socket() as server:
+        server.bind(("localhost", 0))
+        server.listen()
+        port = server.getsockname()[1]
+        pool = ShowdownServerPool(1, first_port=port, launch=False)
+        assert pool.unhealthy_servers() == []
+        assert pool.server_configurations == [get_server_configuration(port)]
+    assert pool.unhealthy_servers() == [0]
+
+
+def test_attach_timeout():
+    with socket.socket() as unused:
+        unused.bind(("localhost", 0))
+        port = unused.getsockname()[1]
+    with pytest.raises(TimeoutError):
+        ShowdownServerPool(1, first_port=port, launch=False, startup_timeout=0)
+
+
+def test_invalid_servers():
+    with pytest.raises(ValueError):
+        ShowdownServerPool(0, launch=False)
+
+
+@patch("socket.create_connection")
+@patch("subprocess.Popen")
+def test_launch_and_round_robin(mock_popen, _):
+    mock_popen.return_value.poll.return_value = None
+    with ShowdownServerPool(3, first_port=9000, showdown_path="showdown") as pool:
+        assert mock_popen.call_count == 3
+        args, kwargs = mock_popen.call_args_list[1]
+        assert args[0] == ["node", "pokemon-showdown", "start", "--no-security", "9001"]
+        assert kwargs["cwd"] == "showdown"
+        urls = [pool.next_server_configuration().server_url for _ in range(4)]
+        assert urls == [
+            "localhost:9000",
+            "localhost:9001",
+            "localhost:9002",
+            "localhost:9000",
+        ]
+    assert mock_popen.return_value.terminate.call_count == 3
+    assert pool.processes == [None, None, None]
+
+
+@patch("socket.create_connection")
+@patch("subprocess.Popen")
+def test_launch_failure(mock_popen, mock_connection):
+    mock_connection.side_effect = OSError()
+    mock_popen.return_value.poll.return_value = 1
+    mock_popen.return_value.returncode = 1
+    with pytest.raises(RuntimeError):
+        ShowdownServerPool(2, first_port=9000)
+    assert mock_popen.return_value.terminate.call_count == 2
+
+
+@patch("socket.create_connection")
+@patch("subprocess.Popen")
+def test_restart_and_kill(mock_popen, _):
+    first, second, replacement = MagicMock(), MagicMock(), MagicMock()
+    for process in [first, second, replacement]:
+        process.poll.return_value = None
+    first.wait.side_effect = [subprocess.TimeoutExpired("node", 10), 0]
+    mock_popen.side_effect = [first, second, replacement]
+    pool = ShowdownServerPool(2, first_port=9000)
+    pool.restart(0)
+    first.terminate.assert_called_once()
+    first.kill.assert_called_once()
+    assert pool.processes == [replacement, second]
+    pool.close()
+    second.kill.assert_not_called()
+    replacement.terminate.assert_called_once()
@@ -0,0 +1,82 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import pickle
+import pytest
+
+from utils.state_encoder import StateEncoder
+
+
+def test_encode_decode():
+    encoder = StateEncoder([(-1, 1), (0, 2), (-5, 3)])
+    assert encoder.radices == (3, 3, 9)
+    assert encoder.size == 81
+    codes = set()
+    for a in range(-1, 2):
+        for b in range(0, 3):
+            for c in range(-5, 4):
+                code = encoder.encode((a, b, c))
+                assert 0 <= code < encoder.size
+                assert encoder.decode(code) == (a, b, c)
+                codes.add(code)
+    assert len(codes) == encoder.size
+    assert encoder.encode([-1, 0, -5]) == 0
+    assert encoder.encode([1, 2, 3]) == 80
+
+
+def test_encode_invalid_state():
+    encoder = StateEncoder([(-1, 1), (0, 2)])
+    with pytest.raises(ValueError):
+        encoder.encode((0,))
+    with pytest.raises(ValueError):
+        encoder.encode((2, 0))
+    with pytest.raises(ValueError):
+        encoder.decode(9)
+
+
+def test_invalid_ranges():
+    with pytest.raises(ValueError):
+        StateEncoder([(1, 0)])
+
+
+def test_equality_and_pickle():
+    encoder = StateEncoder([(-1, 1), (0, 2)])
+    assert encoder == StateEncoder([(-1, 1), (0, 2)])
+    assert encoder != StateEncoder([(-1, 1), (0, 3)])
+    assert hash(encoder) == hash(StateEncoder([(-1, 1), (0, 2)]))
+    assert pickle.loads(pickle.dumps(encoder)) == encoder
+
+
+def test_encode_array():
+    encoder = StateEncoder([(-1, 1), (0, 2), (-5, 3)])
+    states = [(-1, 0, -5), (0, 1, 2), (1, 2, 3)]
+    codes = encoder.encode_array(states)
+    assert codes.tolist() == [encoder.encode(state) for state in states]
+    with pytest.raises(ValueError):
+        encoder.encode_array([(2, 0, 0)])
+    with pytest.raises(ValueError):
+        encoder.encode_array([(0, 0)])
+
+
+def test_encode_clamp():
+    encoder = StateEncoder([(-1, 1), (0, 2)])
+    assert encoder.encode((2, -3), clamp=True) == encoder.encode((1, 0))
+    assert encoder.encode((0, 1), clamp=True) == encoder.encode((0, 1))
+    codes = encoder.encode_array([(-4, 5), (0, 1)], clamp=True)
+    assert codes.tolist() == [encoder.encode((-1, 2)), encoder.encode((0, 1))]
+    with pytest.raises(ValueError):
+        encoder.encode((0,), clamp=True)
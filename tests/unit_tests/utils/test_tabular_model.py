@@ -0,0 +1,134 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import copy
+import pickle
+
+from utils.state_encoder import StateEncoder
+from utils.tabular_model import (
+    TabularModel,
+    apply_model_delta,
+    encode_model_states,
+    get_model_delta,
+    merge_model_deltas,
+)
+
+
+def get_base_model():
+    return {
+        (0, 1): [[1.0, 2.0], 3, [1, 2]],
+        (1, 1): [[0.0, 0.0], 0, [0, 0]],
+    }
+
+
+def test_get_model_delta_unchanged():
+    base = get_base_model()
+    model = copy.deepcopy(base)
+    assert get_model_delta(base, model) == {}
+
+
+def test_get_model_delta_changed_and_new_states():
+    base = get_base_model()
+    model = copy.deepcopy(base)
+    model[(0, 1)][0][0] = 5.0
+    model[(0, 1)][1] += 1
+    model[(0, 1)][2][0] += 1
+    model[(2, 2)] = [[0.0, 0.0], 0, [0, 0]]
+    delta = get_model_delta(base, model)
+    assert list(delta.keys()) == [(0, 1), (2, 2)]
+    assert delta[(0, 1)] == [[5.0, 2.0], 4, [2, 2]]
+    assert delta[(0, 1)] is not model[(0, 1)]
+
+
+def test_apply_model_delta():
+    model = get_base_model()
+    delta = {(0, 1): [[5.0, 2.0], 4, [2, 2]], (2, 2): [[1.0, 0.0], 1, [1, 0]]}
+    result = apply_model_delta(model, delta)
+    assert result is model
+    assert model[(0, 1)] == [[5.0, 2.0], 4, [2, 2]]
+    assert model[(2, 2)] == [[1.0, 0.0], 1, [1, 0]]
+    assert model[(1, 1)] == [[0.0, 0.0], 0, [0, 0]]
+    assert model[(2, 2)] is not delta[(2, 2)]
+
+
+def test_merge_model_deltas_weighted_by_samples():
+    base = get_base_model()
+    delta_1 = {(0, 1): [[4.0, 2.0], 5, [3, 2]]}
+    delta_2 = {(0, 1): [[2.0, 8.0], 5, [1, 4]]}
+    merged = merge_model_deltas(base, [delta_1, delta_2])
+    assert merged is base
+    assert merged[(0, 1)][1] == 7
+    assert merged[(0, 1)][2] == [3, 4]
+    assert merged[(0, 1)][0][0] == (1 * 1.0 + 2 * 4.0) / 3
+    assert merged[(0, 1)][0][1] == (2 * 2.0 + 2 * 8.0) / 4
+
+
+def test_merge_model_deltas_new_states():
+    base = get_base_model()
+    delta_1 = {(3, 3): [[3.0, 0.0], 1, [1, 0]]}
+    delta_2 = {(3, 3): [[1.0, 0.0], 3, [3, 0]], (4, 4): [[0.0, 0.0], 0, [0, 0]]}
+    merged = merge_model_deltas(base, [delta_1, delta_2])
+    assert merged[(3, 3)] == [[1.5, 0.0], 4, [4, 0]]
+    assert merged[(4, 4)] == [[0.0, 0.0], 0, [0, 0]]
+    assert merged[(1, 1)] == [[0.0, 0.0], 0, [0, 0]]
+
+
+def test_merge_model_deltas_values_without_samples():
+    base = get_base_model()
+    delta_1 = {(1, 1): [[0.0, 4.0], 0, [0, 0]]}
+    delta_2 = {(1, 1): [[0.0, 2.0], 0, [0, 0]]}
+    merged = merge_model_deltas(base, [delta_1, delta_2])
+    assert merged[(1, 1)] == [[0.0, 3.0], 0, [0, 0]]
+
+
+def test_merge_model_deltas_empty():
+    base = get_base_model()
+    assert merge_model_deltas(base, []) == get_base_model()
+
+
+def test_encode_model_states_from_tuples():
+    encoder = StateEncoder([(0, 1), (0, 1)])
+    model = encode_model_states(get_base_model(), encoder)
+    assert isinstance(model, TabularModel)
+    assert model.state_encoder == encoder
+    assert model == {
+        1: [[1.0, 2.0], 3, [1, 2]],
+        3: [[0.0, 0.0], 0, [0, 0]],
+    }
+    assert encode_model_states(model, encoder) is model
+
+
+def test_encode_model_states_new_encoder():
+    old_encoder = StateEncoder([(0, 1), (0, 1)])
+    new_encoder = StateEncoder([(0, 2), (0, 1)])
+    model = encode_model_states(get_base_model(), old_encoder)
+    model = encode_model_states(model, new_encoder)
+    assert model.state_encoder == new_encoder
+    assert model == {
+        new_encoder.encode((0, 1)): [[1.0, 2.0], 3, [1, 2]],
+        new_encoder.encode((1, 1)): [[0.0, 0.0], 0, [0, 0]],
+    }
+
+
+def test_tabular_model_pickle():
+    encoder = StateEncoder([(0, 1), (0, 1)])
+    model = encode_model_states(get_base_model(), encoder)
+    loaded = pickle.loads(pickle.dumps(model))
+    assert isinstance(loaded, TabularModel)
+    assert loaded.state_encoder == encoder
+    assert loaded == model
+    assert copy.deepcopy(model).state_encoder == encoder
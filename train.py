@@ -17,16 +17,23 @@
 #
 # Manages the training cycle for RL agents
 ##########################################################################################
-# Usage: python train.py NUM_CHALLENGES BATTLE_FORMAT [AGENT_TYPE]                       #
+# Usage: python train.py NUM_CHALLENGES BATTLE_FORMAT NUM_WORKERS(optional) [AGENT_TYPE] #
 #                                                                                        #
 # Example: python train.py 1000 gen8randombattle expertSarsaStark simpleRL expertRL      #
+# Example: python train.py 1000 gen8randombattle 4 expertSarsaStark                      #
 #                                                                                        #
 # Note: Only works with subclasses of TrainablePlayer                                    #
+# Note: With NUM_WORKERS > 1 the battles are played by worker processes with their own   #
+#       copy of the model and the learned updates are merged after each group            #
+# Note: With SHOWDOWN_SERVERS > 1 the workers are spread over that many local servers    #
+#       launched on the ports following 8000, instead of the server started by           #
+#       run_server.sh                                                                    #
+# Note: With SIMULATED_BATTLES the training battles are played through the simulator     #
+#       battle stream of pokemon-showdown/ instead of a server                           #
 ##########################################################################################
 import asyncio
 import copy
 import datetime
-import gc
 import math
 import matplotlib.pyplot as plt
 import pickle
@@ -42,41 +49,59 @@ from poke_env.player.baselines import (
     MaxBasePowerPlayer,
     RandomPlayer,
 )
-from poke_env.player_configuration import (
-    _CONFIGURATION_FROM_PLAYER_COUNTER,  # noqa used for parallelism
+from poke_env.player_configuration import PlayerConfiguration
+from poke_env.server_configuration import (
+    LocalhostServerConfiguration,
+    ServerConfiguration,
 )
-from poke_env.server_configuration import LocalhostServerConfiguration
-from poke_env.player.utils import evaluate_player
 from poke_env.player.utils import _EVALUATION_RATINGS  # noqa used for axhlines in plot
 from progress.bar import IncrementalBar
+from typing import List
 
 from agents.basic_rl import SimpleRLAgent
 from agents.expert_rl import ExpertRLAgent
 from agents.sarsa_stark import SarsaStark, ExpertSarsaStark
 from utils import InvalidArgument
+from utils.battle_stream import BattleStreamSimulator
+from utils.close_player import close_player
+from utils.evaluation_pool import EvaluationPool
+from utils.server_pool import ShowdownServerPool
+from utils.tabular_model import get_model_delta, merge_model_deltas
 
 AGENT_NAME_COUNTER = Counter()
 TRAINING_DATA = []
+SHARD_CONCURRENT_PLAYERS = 4
+EVALUATION_WORKERS = 2
+EVALUATION_MAX_RELATIVE_WIDTH = 0.25
+EVALUATION_BATCH_SIZE = 200
+SHOWDOWN_SERVERS = 1
+SIMULATED_BATTLES = False
 
 
-async def main(index):
+async def main(index, server_configurations: List[ServerConfiguration]):
     current_time = datetime.datetime.now()
     current_time_string = current_time.strftime("%d-%m-%Y %H-%M-%S")
     os.makedirs("./logs", exist_ok=True)
     eval_challenges = 6000
     placement = 40
-    agent_type = sys.argv[3 + index].strip()
+    workers, first_agent = get_training_workers()
+    agent_type = sys.argv[first_agent + index].strip()
     if not sys.argv[1].isnumeric():
         raise InvalidArgument(
             f"{sys.argv[1]} should be an integer containing the number of battles for the training"
         )
     challenges = int(sys.argv[1])
+    # With the workers playing the training battles the players of the main process
+    # only hold the model, so they stay off the server
+    sequential = workers == 1
+    start_listening = sequential and not SIMULATED_BATTLES
     if agent_type == "simpleRL":
         path = f"./models/simpleRL/{sys.argv[2]}"
         agent = SimpleRLAgent(
             training=True,
             battle_format=sys.argv[2],
-            server_configuration=LocalhostServerConfiguration,
+            server_configuration=server_configurations[0],
+            start_listening=start_listening,
         )
         update_agent = get_simple_rl
     elif agent_type == "expertRL":
@@ -84,7 +109,8 @@ async def main(index):
         agent = ExpertRLAgent(
             training=True,
             battle_format=sys.argv[2],
-            server_configuration=LocalhostServerConfiguration,
+            server_configuration=server_configurations[0],
+            start_listening=start_listening,
         )
         update_agent = get_expert_rl
     elif agent_type == "SarsaStark":
@@ -92,7 +118,8 @@ async def main(index):
         agent = SarsaStark(
             training=True,
             battle_format=sys.argv[2],
-            server_configuration=LocalhostServerConfiguration,
+            server_configuration=server_configurations[0],
+            start_listening=start_listening,
         )
         update_agent = get_sarsa_stark
     elif agent_type == "expertSarsaStark":
@@ -100,7 +127,8 @@ async def main(index):
         agent = ExpertSarsaStark(
             training=True,
             battle_format=sys.argv[2],
-            server_configuration=LocalhostServerConfiguration,
+            server_configuration=server_configurations[0],
+            start_listening=start_listening,
         )
         update_agent = get_expert_sarsa_stark
     else:
@@ -111,10 +139,22 @@ async def main(index):
     AGENT_NAME_COUNTER.update([agent_name])
     agent_name += f" {AGENT_NAME_COUNTER[agent_name]}"
     opponent1 = SimpleHeuristicsPlayer(
-        server_configuration=LocalhostServerConfiguration
+        server_configuration=server_configurations[0],
+        start_listening=start_listening,
     )
-    opponent2 = MaxBasePowerPlayer(server_configuration=LocalhostServerConfiguration)
-    opponent3 = RandomPlayer(server_configuration=LocalhostServerConfiguration)
+    opponent2 = MaxBasePowerPlayer(
+        server_configuration=server_configurations[0],
+        start_listening=start_listening,
+    )
+    opponent3 = RandomPlayer(
+        server_configuration=server_configurations[0],
+        start_listening=start_listening,
+    )
+    simulator = None
+    if SIMULATED_BATTLES and sequential:
+        simulator = BattleStreamSimulator()
+        for player in [agent, opponent1, opponent2, opponent3]:
+            simulator.attach(player)
     evaluations = []
     cycles = []
     states = []
@@ -125,51 +165,55 @@ async def main(index):
         if challenges % j == 0:
             group = j
             break
+    shard_pool = None
+    if not sequential:
+        shard_pool = ProcessPoolExecutor(max_workers=workers)
+    evaluation_pool = EvaluationPool(
+        update_agent,
+        EVALUATION_WORKERS,
+        eval_challenges,
+        placement,
+        max_relative_width=EVALUATION_MAX_RELATIVE_WIDTH,
+        batch_size=EVALUATION_BATCH_SIZE,
+        server_configurations=server_configurations,
+    )
+    evaluation_jobs = []
     for _ in range(challenges // group):
-        pool = ProcessPoolExecutor()
-        res = pool.submit(
-            evaluate,
-            update_agent,
-            agent.get_model(),
-            eval_challenges,
-            placement,
-            _CONFIGURATION_FROM_PLAYER_COUNTER.copy(),
-        )
+        evaluation_jobs.append(evaluation_pool.submit(agent.get_model()))
         cycles.append(bar.index)
         states.append(len(agent.get_model()))
-        for _ in range(group):
-            await agent.battle_against(opponent3, 1)
-            bar.next()
-            await agent.battle_against(opponent2, 1)
-            bar.next()
-            await agent.battle_against(opponent1, 1)
-            bar.next()
+        if shard_pool is not None:
+            await train_sharded(
+                shard_pool,
+                workers,
+                update_agent,
+                agent.get_model(),
+                group,
+                server_configurations,
+            )
+            bar.next(group * 3)
+        else:
+            for _ in range(group):
+                await agent.battle_against(opponent3, 1)
+                bar.next()
+                await agent.battle_against(opponent2, 1)
+                bar.next()
+                await agent.battle_against(opponent1, 1)
+                bar.next()
         opponent1.reset_battles()
         opponent2.reset_battles()
         opponent3.reset_battles()
         agent.reset_battles()
-        evaluation, counter = res.result()
-        _CONFIGURATION_FROM_PLAYER_COUNTER.clear()
-        _CONFIGURATION_FROM_PLAYER_COUNTER.update(counter)
-        evaluations.append(evaluation)
-        pool.shutdown(wait=True, cancel_futures=True)
-        gc.collect()
-    pool = ProcessPoolExecutor()
-    res = pool.submit(
-        evaluate,
-        update_agent,
-        agent.get_model(),
-        eval_challenges,
-        placement,
-        _CONFIGURATION_FROM_PLAYER_COUNTER.copy(),
-    )
+    evaluation_jobs.append(evaluation_pool.submit(agent.get_model()))
     cycles.append(bar.index)
     states.append(len(agent.get_model()))
-    evaluation, counter = res.result()
-    _CONFIGURATION_FROM_PLAYER_COUNTER.clear()
-    _CONFIGURATION_FROM_PLAYER_COUNTER.update(counter)
-    evaluations.append(evaluation)
-    pool.shutdown(wait=True, cancel_futures=True)
+    for job in evaluation_jobs:
+        evaluations.append(evaluation_pool.result(job))
+    evaluation_pool.close()
+    if shard_pool is not None:
+        shard_pool.shutdown(wait=True, cancel_futures=True)
+    if simulator is not None:
+        simulator.close()
     bar.finish()
     sns.set_theme()
     sns.set_palette("colorblind")
@@ -258,70 +302,209 @@ async def main(index):
         TRAINING_DATA.append((name, steps, value, lower_bound, upper_bound))
 
 
-def get_simple_rl(model, training=False, keep_training=False, max_concurrent_battles=1):
+def get_simple_rl(
+    model,
+    training=False,
+    keep_training=False,
+    max_concurrent_battles=1,
+    player_configuration=None,
+    server_configuration=LocalhostServerConfiguration,
+    start_listening=True,
+):
     model_copy = copy.deepcopy(model)
     return SimpleRLAgent(
         training=training,
         battle_format=sys.argv[2],
-        server_configuration=LocalhostServerConfiguration,
+        player_configuration=player_configuration,
+        server_configuration=server_configuration,
         model=model_copy,
         keep_training=keep_training,
         max_concurrent_battles=max_concurrent_battles,
+        start_listening=start_listening,
     )
 
 
-def get_expert_rl(model, training=False, keep_training=False, max_concurrent_battles=1):
+def get_expert_rl(
+    model,
+    training=False,
+    keep_training=False,
+    max_concurrent_battles=1,
+    player_configuration=None,
+    server_configuration=LocalhostServerConfiguration,
+    start_listening=True,
+):
     model_copy = copy.deepcopy(model)
     return ExpertRLAgent(
         training=training,
         battle_format=sys.argv[2],
-        server_configuration=LocalhostServerConfiguration,
+        player_configuration=player_configuration,
+        server_configuration=server_configuration,
         model=model_copy,
         keep_training=keep_training,
         max_concurrent_battles=max_concurrent_battles,
+        start_listening=start_listening,
     )
 
 
 def get_sarsa_stark(
-    model, training=False, keep_training=False, max_concurrent_battles=1
+    model,
+    training=False,
+    keep_training=False,
+    max_concurrent_battles=1,
+    player_configuration=None,
+    server_configuration=LocalhostServerConfiguration,
+    start_listening=True,
 ):
     model_copy = copy.deepcopy(model)
     return SarsaStark(
         training=training,
         battle_format=sys.argv[2],
-        server_configuration=LocalhostServerConfiguration,
+        player_configuration=player_configuration,
+        server_configuration=server_configuration,
         model=model_copy,
         keep_training=keep_training,
         max_concurrent_battles=max_concurrent_battles,
+        start_listening=start_listening,
     )
 
 
 def get_expert_sarsa_stark(
-    model, training=False, keep_training=False, max_concurrent_battles=1
+    model,
+    training=False,
+    keep_training=False,
+    max_concurrent_battles=1,
+    player_configuration=None,
+    server_configuration=LocalhostServerConfiguration,
+    start_listening=True,
 ):
     model_copy = copy.deepcopy(model)
     return ExpertSarsaStark(
         training=training,
         battle_format=sys.argv[2],
-        server_configuration=LocalhostServerConfiguration,
+        player_configuration=player_configuration,
+        server_configuration=server_configuration,
         model=model_copy,
         keep_training=keep_training,
         max_concurrent_battles=max_concurrent_battles,
+        start_listening=start_listening,
     )
 
 
-def evaluate(update_agent_func, model, challenges, placement, counter):
-    from poke_env.player_configuration import (
-        _CONFIGURATION_FROM_PLAYER_COUNTER,  # noqa used for parallelism
-    )
+def get_training_workers():
+    if len(sys.argv) > 3 and sys.argv[3].isnumeric():
+        workers = int(sys.argv[3])
+        if workers < 1:
+            raise InvalidArgument(f"{sys.argv[3]} is not a valid number of workers")
+        return workers, 4
+    return 1, 3
 
-    _CONFIGURATION_FROM_PLAYER_COUNTER.clear()
-    _CONFIGURATION_FROM_PLAYER_COUNTER.update(counter)
-    agent = update_agent_func(model, False, False, 10)
-    evaluation = asyncio.get_event_loop().run_until_complete(
-        evaluate_player(agent, challenges, placement)
-    )
-    return evaluation, _CONFIGURATION_FROM_PLAYER_COUNTER
+
+async def train_sharded(
+    pool,
+    workers,
+    update_agent_func,
+    model,
+    rounds,
+    server_configurations=(LocalhostServerConfiguration,),
+):
+    shard_rounds = [rounds // workers for _ in range(workers)]
+    for i in range(rounds % workers):
+        shard_rounds[i] += 1
+    futures = []
+    for shard, shard_round in enumerate(shard_rounds):
+        if shard_round == 0:
+            continue
+        futures.append(
+            pool.submit(
+                train_shard,
+                update_agent_func,
+                model,
+                shard,
+                shard_round,
+                server_configurations[shard % len(server_configurations)],
+                SIMULATED_BATTLES,
+            )
+        )
+    deltas = await asyncio.gather(*[asyncio.wrap_future(future) for future in futures])
+    return merge_model_deltas(model, deltas)
+
+
+def train_shard(
+    update_agent_func,
+    model,
+    shard,
+    rounds,
+    server_configuration=LocalhostServerConfiguration,
+    simulated=False,
+):
+    players = min(SHARD_CONCURRENT_PLAYERS, rounds)
+    player_rounds = [rounds // players for _ in range(players)]
+    for i in range(rounds % players):
+        player_rounds[i] += 1
+    agents = []
+    opponents = []
+    shared_model = None
+    for i in range(players):
+        agent = update_agent_func(
+            model,
+            True,
+            False,
+            1,
+            PlayerConfiguration(f"Shard{shard} Agent{i}", None),
+            server_configuration,
+            start_listening=not simulated,
+        )
+        if shared_model is None:
+            shared_model = agent.get_model()
+        agent.model = shared_model
+        agents.append(agent)
+        opponents.append(
+            [
+                opponent_class(
+                    player_configuration=PlayerConfiguration(
+                        f"Shard{shard} Opp{i}-{j}", None
+                    ),
+                    battle_format=sys.argv[2],
+                    server_configuration=server_configuration,
+                    start_listening=not simulated,
+                )
+                for j, opponent_class in enumerate(
+                    [RandomPlayer, MaxBasePowerPlayer, SimpleHeuristicsPlayer]
+                )
+            ]
+        )
+    simulator = None
+    if simulated:
+        simulator = BattleStreamSimulator()
+        for agent, agent_opponents in zip(agents, opponents):
+            for player in [agent] + agent_opponents:
+                simulator.attach(player)
+    try:
+        asyncio.get_event_loop().run_until_complete(
+            asyncio.gather(
+                *[
+                    _play_shard_rounds(agent, agent_opponents, agent_rounds)
+                    for agent, agent_opponents, agent_rounds in zip(
+                        agents, opponents, player_rounds
+                    )
+                ]
+            )
+        )
+    finally:
+        if simulator is not None:
+            simulator.close()
+        else:
+            for agent, agent_opponents in zip(agents, opponents):
+                close_player(agent)
+                for opponent in agent_opponents:
+                    close_player(opponent)
+    return get_model_delta(model, shared_model)
+
+
+async def _play_shard_rounds(agent, opponents, rounds):
+    for _ in range(rounds):
+        for opponent in opponents:
+            await agent.battle_against(opponent, 1)
 
 
 class ProgressBar(IncrementalBar):
@@ -369,8 +552,18 @@ class ProgressBar(IncrementalBar):
 
 if __name__ == "__main__":  # pragma: no cover
     set_start_method("spawn")
-    for i in range(len(sys.argv) - 3):
-        asyncio.get_event_loop().run_until_complete(main(i))
+    _, first_agent_index = get_training_workers()
+    server_pool = None
+    configurations = [LocalhostServerConfiguration]
+    if SHOWDOWN_SERVERS > 1:
+        server_pool = ShowdownServerPool(SHOWDOWN_SERVERS, first_port=8001)
+        configurations = server_pool.server_configurations
+    try:
+        for i in range(len(sys.argv) - first_agent_index):
+            asyncio.get_event_loop().run_until_complete(main(i, configurations))
+    finally:
+        if server_pool is not None:
+            server_pool.close()
     with open("./logs/training_data.csv", "w") as file:
         file.write("Agent type;Training steps;Value;Lower bound;Upper bound\n")
         for (
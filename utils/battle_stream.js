@@ -0,0 +1,43 @@
+//
+// A pokémon showdown battle-bot project based on reinforcement learning techniques.
+// Copyright (C) 2022 Matteo Dell'Acqua
+//
+// This program is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// This program is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with this program.  If not, see <https://www.gnu.org/licenses/>.
+//
+// Runs many Showdown simulator battle streams in a single process.
+// Reads "<battle id> <command>" lines and writes [battle id, output chunk] JSON lines.
+const path = require("path");
+const readline = require("readline");
+
+const { BattleStream } = require(path.resolve(process.argv[2], "dist", "sim"));
+
+const battles = new Map();
+
+async function forward(id, stream) {
+  for await (const chunk of stream) {
+    process.stdout.write(JSON.stringify([id, chunk]) + "\n");
+  }
+  battles.delete(id);
+}
+
+readline.createInterface({ input: process.stdin }).on("line", (line) => {
+  const separator = line.indexOf(" ");
+  const id = line.slice(0, separator);
+  if (!battles.has(id)) {
+    const stream = new BattleStream();
+    battles.set(id, stream);
+    forward(id, stream);
+  }
+  battles.get(id).write(line.slice(separator + 1));
+});
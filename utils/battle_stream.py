@@ -0,0 +1,233 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Battles played through the Showdown simulator battle stream instead of a server.
+# The players receive the same protocol messages a server would send them.
+import asyncio
+import functools
+import json
+import os
+
+from poke_env.player.internals import POKE_LOOP
+from poke_env.player.player import Player
+from typing import Dict, List, Optional
+
+from .server_pool import SHOWDOWN_PATH
+
+BATTLE_STREAM_SCRIPT = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), "battle_stream.js"
+)
+SIDES = ("p1", "p2")
+STREAM_LIMIT = 2**24
+
+
+def split_update(lines: List[str]) -> Dict[str, List[str]]:
+    # |split|pN is followed by the private line for pN and the public one for the others
+    views = {side: [] for side in SIDES}
+    i = 0
+    while i < len(lines):
+        if lines[i].startswith("|split|"):
+            secret_side = lines[i][len("|split|") :]
+            for side, view in views.items():
+                view.append(lines[i + 1] if side == secret_side else lines[i + 2])
+            i += 3
+        else:
+            for view in views.values():
+                view.append(lines[i])
+            i += 1
+    return views
+
+
+def to_simulator_command(message: str, side: str) -> Optional[str]:
+    if message.startswith("/choose "):
+        return f">{side} {message[len('/choose '):]}"
+    if message.startswith("/team "):
+        return f">{side} team {message[len('/team '):]}"
+    if message == "/forfeit":
+        return f">forcelose {side}"
+    return None
+
+
+class _SimulatedBattle:
+    def __init__(self, battle_id: str, battle_format: str, players: List[Player]):
+        self.battle_id = battle_id
+        self.tag = f">battle-{battle_format}-{battle_id}"
+        self.players = dict(zip(SIDES, players))
+        self.ended = asyncio.get_running_loop().create_future()
+        self.tasks = []
+
+    def side(self, player: Player) -> Optional[str]:
+        for side, side_player in self.players.items():
+            if side_player is player:
+                return side
+        return None
+
+    def receive(self, chunk: str):
+        message_type, _, body = chunk.partition("\n")
+        if message_type == "update":
+            for side, lines in split_update(body.split("\n")).items():
+                self.deliver(side, lines)
+        elif message_type == "sideupdate":
+            side, _, lines = body.partition("\n")
+            self.deliver(side, lines.split("\n"))
+        elif message_type == "end" and not self.ended.done():
+            self.ended.set_result(None)
+
+    def deliver(self, side: str, lines: List[str]):
+        # Like poke_env's websocket listener, every message is handled in its own task
+        message = "\n".join([self.tag] + lines)
+        task = asyncio.create_task(self.players[side]._handle_message(message))
+        task.add_done_callback(self._task_done)
+        self.tasks.append(task)
+
+    def _task_done(self, task: asyncio.Task):
+        if task.cancelled() or task.exception() is None or self.ended.done():
+            return
+        self.ended.set_exception(task.exception())
+
+
+class BattleStreamSimulator:
+    def __init__(self, showdown_path: str = SHOWDOWN_PATH):
+        self.showdown_path = showdown_path
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.battles: Dict[str, _SimulatedBattle] = {}
+        self.next_battle = 0
+        self._starting: Optional[asyncio.Future] = None
+        self._reader: Optional[asyncio.Task] = None
+
+    def attach(self, player: Player):
+        # Players should be created with start_listening=False
+        player = _get_player(player)
+        player.battle_against = functools.partial(self.battle_against, player)
+        player._send_message = functools.partial(self._send_message, player)
+
+    async def battle_against(
+        self, player: Player, opponent: Player, n_battles: int = 1
+    ) -> None:
+        await player._handle_threaded_coroutines(
+            self._battle_against(player, _get_player(opponent), n_battles)
+        )
+
+    async def _battle_against(self, player: Player, opponent: Player, n_battles: int):
+        await self._start()
+        limits = [
+            p._max_concurrent_battles
+            for p in [player, opponent]
+            if p._max_concurrent_battles > 0
+        ]
+        concurrent_battles = asyncio.Semaphore(min(limits, default=n_battles))
+
+        async def play():
+            async with concurrent_battles:
+                await self._play(player, opponent)
+
+        await asyncio.gather(*[play() for _ in range(n_battles)])
+
+    async def _play(self, player: Player, opponent: Player):
+        battle_id = str(self.next_battle)
+        self.next_battle += 1
+        battle = _SimulatedBattle(battle_id, player.format, [player, opponent])
+        self.battles[battle_id] = battle
+        try:
+            for side_player in battle.players.values():
+                await side_player._handle_message(f"{battle.tag}\n|init|battle")
+            self._write(battle_id, f">start {json.dumps({'formatid': player.format})}")
+            for side, side_player in battle.players.items():
+                options = {"name": side_player.username}
+                if side_player._team is not None:
+                    options["team"] = side_player._team.yield_team()
+                self._write(battle_id, f">player {side} {json.dumps(options)}")
+            await battle.ended
+            await asyncio.gather(*battle.tasks)
+        except Exception:
+            if self._starting is not None and not self.process.stdin.is_closing():
+                self._write(battle_id, ">forcetie")
+            raise
+        finally:
+            del self.battles[battle_id]
+
+    async def _send_message(
+        self,
+        player: Player,
+        message: str,
+        room: str = "",
+        message_2: Optional[str] = None,
+    ):
+        battle = self.battles.get(room.rsplit("-", 1)[-1])
+        side = battle.side(player) if battle is not None else None
+        command = to_simulator_command(message, side) if side is not None else None
+        if command is None:
+            player.logger.info("Message ignored by the simulator: %s", message)
+            return
+        self._write(battle.battle_id, command)
+
+    def _write(self, battle_id: str, command: str):
+        self.process.stdin.write(f"{battle_id} {command}\n".encode())
+
+    async def _start(self):
+        if self._starting is None:
+            self._starting = asyncio.ensure_future(self._launch())
+        await self._starting
+
+    async def _launch(self):
+        self.process = await asyncio.create_subprocess_exec(
+            "node",
+            BATTLE_STREAM_SCRIPT,
+            self.showdown_path,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            limit=STREAM_LIMIT,
+        )
+        self._reader = asyncio.create_task(self._read())
+
+    async def _read(self):
+        async for line in self.process.stdout:
+            battle_id, chunk = json.loads(line)
+            battle = self.battles.get(battle_id)
+            if battle is not None:
+                battle.receive(chunk)
+        return_code = await self.process.wait()
+        self._starting = None
+        for battle in self.battles.values():
+            if not battle.ended.done():
+                battle.ended.set_exception(
+                    RuntimeError(f"Showdown simulator exited with code {return_code}")
+                )
+
+    def close(self):
+        if self._starting is not None:
+            asyncio.run_coroutine_threadsafe(self._close(), POKE_LOOP).result()
+
+    async def _close(self):
+        await self._starting
+        self.process.stdin.close()
+        try:
+            await asyncio.wait_for(self.process.wait(), 10)
+        except asyncio.TimeoutError:
+            self.process.kill()
+        await self._reader
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def _get_player(player: Player) -> Player:
+    # TFPlayer battles through the player of its environment
+    return getattr(player, "internal_agent", None) or player
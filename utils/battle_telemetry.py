@@ -0,0 +1,127 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Streams one record per finished battle to an append-only JSON lines log, so that
+# the results of long runs survive crashes and can be aggregated while they run
+import json
+import os
+import threading
+import time
+
+from poke_env.environment.abstract_battle import AbstractBattle
+from poke_env.player.player import Player
+from typing import Dict, List, Optional
+
+from .decision_latency import DecisionProfiler
+
+
+class TelemetryLog:
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a")
+        self._lock = threading.Lock()
+
+    def write(self, record: dict):
+        with self._lock:
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+# A crash can leave the last line incomplete, so lines that are not valid records
+# are skipped
+def read_telemetry(path: str) -> List[dict]:
+    records = []
+    with open(path) as log:
+        for line in log:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def battle_result(battle: AbstractBattle) -> Optional[str]:
+    if not battle.finished:
+        return None
+    if battle.won is None:
+        return "tie"
+    return "win" if battle.won else "loss"
+
+
+class BattleTelemetry:
+    def __init__(
+        self,
+        player: Player,
+        log: TelemetryLog,
+        agent: str,
+        profiler: DecisionProfiler,
+        record_finished: bool = False,
+    ):
+        self.log = log
+        self.agent = agent
+        self.latencies: Dict[str, List[float]] = {}
+        # TFPlayer battles through the player of its environment
+        self.player = getattr(player, "internal_agent", None) or player
+        # The decisions are timed once, by the profiler of the player
+        profiler.decision_listeners.append(self._add_latency)
+        # Without ratings to wait for, battles are recorded as soon as they end
+        if record_finished:
+            battle_finished_callback = self.player._battle_finished_callback
+
+            def recorded_battle_finished_callback(battle):
+                battle_finished_callback(battle)
+                self.record(battle)
+
+            self.player._battle_finished_callback = recorded_battle_finished_callback
+
+    # A profiler shared by several players also times the battles of the others
+    def _add_latency(self, battle: AbstractBattle, latency: float):
+        if self.player.battles.get(battle.battle_tag) is not battle:
+            return
+        self.latencies.setdefault(battle.battle_tag, []).append(latency)
+
+    def record(self, battle: AbstractBattle, rating: Optional[float] = None) -> dict:
+        latencies = self.latencies.pop(battle.battle_tag, [])
+        record = {
+            "time": time.time(),
+            "agent": self.agent,
+            "battle": battle.battle_tag,
+            "opponent": battle.opponent_username,
+            "result": battle_result(battle),
+            "rating": rating,
+            "turns": battle.turn,
+            "decisions": len(latencies),
+            "decision_latency": (
+                sum(latencies) / len(latencies) if len(latencies) > 0 else None
+            ),
+        }
+        self.log.write(record)
+        return record
@@ -0,0 +1,72 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Forfeits the battles of a player that stop receiving messages, so that one stuck
+# battle does not block the others
+import asyncio
+import time
+
+from poke_env.player.player import Player
+from typing import Dict, List, Optional
+
+
+class BattleWatchdog:
+    def __init__(self, player: Player, timeout: float, interval: float = 10.0):
+        if timeout <= 0:
+            raise ValueError(f"Expected a positive timeout. Got {timeout}")
+        if interval <= 0:
+            raise ValueError(f"Expected a positive interval. Got {interval}")
+        # TFPlayer battles through the player of its environment
+        self.player = getattr(player, "internal_agent", None) or player
+        self.timeout = timeout
+        self.interval = interval
+        self.last_activity: Dict[str, float] = {}
+        self.forfeited: List[str] = []
+        handle_battle_message = self.player._handle_battle_message
+
+        async def handle_watched_battle_message(split_messages):
+            self.last_activity[split_messages[0][0][1:]] = time.monotonic()
+            await handle_battle_message(split_messages)
+
+        self.player._handle_battle_message = handle_watched_battle_message
+
+    # Battles without messages for longer than the timeout, not yet forfeited
+    def stuck_battles(self, now: Optional[float] = None) -> List[str]:
+        if now is None:
+            now = time.monotonic()
+        stuck = []
+        for battle_tag, battle in list(self.player.battles.items()):
+            if battle.finished or battle_tag in self.forfeited:
+                continue
+            last_activity = self.last_activity.setdefault(battle_tag, now)
+            if now - last_activity > self.timeout:
+                stuck.append(battle_tag)
+        return stuck
+
+    async def check(self) -> List[str]:
+        stuck = self.stuck_battles()
+        for battle_tag in stuck:
+            self.forfeited.append(battle_tag)
+            await self.player._handle_threaded_coroutines(
+                self.player._send_message("/forfeit", battle_tag)
+            )
+        return stuck
+
+    async def watch(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.check()
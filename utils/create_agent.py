@@ -16,23 +16,17 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 #
 # Function to parse cli strings into agents
+import copy
+import importlib
 import os
 import pickle
+import re
 import sys
 
 from poke_env.player.player import Player
+from poke_env.player_configuration import PlayerConfiguration
 from poke_env.server_configuration import LocalhostServerConfiguration
-from typing import List
-
-from agents.alpha_poke import AlphaPokeSingleBattleModelLoader
-from agents.basic_rl import SimpleRLAgent
-from agents.dad import Dad
-from agents.eight_year_old_me import EightYearOldMe
-from agents.expert_rl import ExpertRLAgent
-from agents.sarsa_stark import SarsaStark, ExpertSarsaStark
-from agents.advanced_heuristics import AdvancedHeuristics
-from agents.twenty_year_old_me import TwentyYearOldMe
-
+from typing import Callable, Dict, List, Optional
 
 MODELS_PATH = os.path.join(
     os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "models"
@@ -40,7 +34,291 @@ MODELS_PATH = os.path.join(
 if getattr(sys, "frozen", False) and hasattr(sys, "_MEIPASS"):  # pragma: no cover
     MODELS_PATH = os.path.join(sys._MEIPASS, "models")
 
+# Models already read by this process, shared by agents that do not train
+_MODEL_CACHE: Dict[str, dict] = {}
+
+
+class AgentType:
+    def __init__(
+        self,
+        name_pattern: str,
+        class_name: str,
+        module: str,
+        loader: Callable,
+        model_folder: Optional[str] = None,
+    ):
+        self.name_pattern = re.compile(name_pattern)
+        self.class_name = class_name
+        self.module = module
+        self.loader = loader
+        self.model_folder = model_folder
+        self._agent_class = None
+
+    def matches(self, agent_name: str) -> bool:
+        return self.name_pattern.search(agent_name) is not None
+
+    # Agent modules are imported only when requested, so that heuristic and
+    # tabular agents do not pay for the TensorFlow import
+    @property
+    def agent_class(self) -> type:
+        if self._agent_class is None:
+            module = importlib.import_module(self.module)
+            self._agent_class = getattr(module, self.class_name)
+        return self._agent_class
+
+    def create(self, agent_name: str, battle_format: str, **kwargs) -> List[Player]:
+        return self.loader(self, agent_name, battle_format, **kwargs)
+
+
+def load_model(model_path: str) -> dict:
+    if model_path not in _MODEL_CACHE.keys():
+        with open(model_path, "rb") as model_file:
+            _MODEL_CACHE[model_path] = pickle.load(model_file)
+    return _MODEL_CACHE[model_path]
+
+
+def clear_model_cache():
+    _MODEL_CACHE.clear()
+
+
+def load_heuristic_agent(
+    agent_type: AgentType, agent_name: str, battle_format: str, **kwargs
+) -> List[Player]:
+    return [agent_type.agent_class(battle_format=battle_format, **kwargs)]
+
+
+def _load_tabular_agents(
+    agent_type: AgentType,
+    agent_name: str,
+    battle_format: str,
+    model_paths: List[str],
+    **kwargs,
+) -> List[Player]:
+    keep_training = "train" in agent_name
+    learns = keep_training or kwargs.get("training", False)
+    configurations = kwargs.pop("player_configuration", None)
+    if not isinstance(configurations, list):
+        configurations = [configurations] * len(model_paths)
+    if len(configurations) != len(model_paths):
+        raise ValueError(
+            f"Expected {len(model_paths)} player configurations for {agent_name}. "
+            f"Got {len(configurations)}"
+        )
+    agents = []
+    for model_path, configuration in zip(model_paths, configurations):
+        model = load_model(model_path)
+        if learns:
+            model = copy.deepcopy(model)
+        agent = agent_type.agent_class(
+            battle_format=battle_format,
+            player_configuration=configuration,
+            **kwargs,
+            keep_training=keep_training,
+            model=model,
+        )
+        if not learns:
+            # Keep the model with encoded states to skip the encoding next time
+            _MODEL_CACHE[model_path] = agent.model
+        agents.append(agent)
+    return agents
+
+
+def load_best_tabular_agent(
+    agent_type: AgentType, agent_name: str, battle_format: str, **kwargs
+) -> List[Player]:
+    model_paths = _get_model_paths(agent_type, agent_name, battle_format)
+    return _load_tabular_agents(
+        agent_type, agent_name, battle_format, model_paths, **kwargs
+    )
+
+
+def load_all_tabular_agents(
+    agent_type: AgentType, agent_name: str, battle_format: str, **kwargs
+) -> List[Player]:
+    model_paths = _get_model_paths(agent_type, agent_name, battle_format)
+    return _load_tabular_agents(
+        agent_type, agent_name, battle_format, model_paths, **kwargs
+    )
+
 
+def load_tf_agent(
+    agent_type: AgentType, agent_name: str, battle_format: str, **kwargs
+) -> List[Player]:
+    model_path = _get_model_paths(agent_type, agent_name, battle_format)[0]
+    return [
+        agent_type.agent_class(model=model_path, battle_format=battle_format, **kwargs)
+    ]
+
+
+def load_numpy_agent(
+    agent_type: AgentType, agent_name: str, battle_format: str, **kwargs
+) -> List[Player]:
+    model_path = _get_model_paths(agent_type, agent_name, battle_format)[0]
+    return [
+        agent_type.agent_class(model=model_path, battle_format=battle_format, **kwargs)
+    ]
+
+
+def _get_model_paths(
+    agent_type: AgentType, agent_name: str, battle_format: str
+) -> List[str]:
+    if agent_type.loader is load_best_tabular_agent:
+        return [f"{MODELS_PATH}/{agent_type.model_folder}/{battle_format}/best.pokeai"]
+    if agent_type.loader is load_all_tabular_agents:
+        folder = f"{MODELS_PATH}/{agent_type.model_folder}/{battle_format}"
+        # Sorted so that the agents keep their positions across runs
+        return [f"{folder}/" + file for file in sorted(os.listdir(folder))]
+    if agent_type.loader is load_tf_agent:
+        model_path = agent_name.split("-", 1)[1]
+        return [os.path.join(MODELS_PATH, agent_type.model_folder, model_path)]
+    if agent_type.loader is load_numpy_agent:
+        model_path = agent_name.split("-", 1)[1] + ".npz"
+        return [os.path.join(MODELS_PATH, agent_type.model_folder, model_path)]
+    return []
+
+
+# Agent types in matching order: the first whose pattern matches the cli name is used
+AGENT_TYPES: List[AgentType] = [
+    AgentType("^dad$", "Dad", "agents.dad", load_heuristic_agent),
+    AgentType(
+        "^8-year-old-me$",
+        "EightYearOldMe",
+        "agents.eight_year_old_me",
+        load_heuristic_agent,
+    ),
+    AgentType(
+        "^20-year-old-me$",
+        "TwentyYearOldMe",
+        "agents.twenty_year_old_me",
+        load_heuristic_agent,
+    ),
+    AgentType(
+        "^advanced-heuristics$",
+        "AdvancedHeuristics",
+        "agents.advanced_heuristics",
+        load_heuristic_agent,
+    ),
+    AgentType(
+        "simpleRL-best",
+        "SimpleRLAgent",
+        "agents.basic_rl",
+        load_best_tabular_agent,
+        "simpleRL",
+    ),
+    AgentType(
+        "simpleRL-all",
+        "SimpleRLAgent",
+        "agents.basic_rl",
+        load_all_tabular_agents,
+        "simpleRL",
+    ),
+    AgentType(
+        "expertRL-best",
+        "ExpertRLAgent",
+        "agents.expert_rl",
+        load_best_tabular_agent,
+        "expertRL",
+    ),
+    AgentType(
+        "expertRL-all",
+        "ExpertRLAgent",
+        "agents.expert_rl",
+        load_all_tabular_agents,
+        "expertRL",
+    ),
+    AgentType(
+        "simpleSarsaStark-best",
+        "SarsaStark",
+        "agents.sarsa_stark",
+        load_best_tabular_agent,
+        "SarsaStark",
+    ),
+    AgentType(
+        "simpleSarsaStark-all",
+        "SarsaStark",
+        "agents.sarsa_stark",
+        load_all_tabular_agents,
+        "SarsaStark",
+    ),
+    AgentType(
+        "expertSarsaStark-best",
+        "ExpertSarsaStark",
+        "agents.sarsa_stark",
+        load_best_tabular_agent,
+        "expertSarsaStark",
+    ),
+    AgentType(
+        "expertSarsaStark-all",
+        "ExpertSarsaStark",
+        "agents.sarsa_stark",
+        load_all_tabular_agents,
+        "expertSarsaStark",
+    ),
+    AgentType(
+        "alphaPokeSingle-",
+        "AlphaPokeSingleBattleModelLoader",
+        "agents.alpha_poke",
+        load_tf_agent,
+        "tf_models",
+    ),
+    AgentType(
+        "alphaPokeNumpy-",
+        "AlphaPokeNumpyPlayer",
+        "agents.alpha_poke_numpy",
+        load_numpy_agent,
+        "numpy_models",
+    ),
+]
+
+
+def register_agent_type(agent_type: AgentType):
+    AGENT_TYPES.append(agent_type)
+
+
+def get_agent_type(agent_name: str) -> AgentType:
+    for agent_type in AGENT_TYPES:
+        if agent_type.matches(agent_name):
+            return agent_type
+    raise UnsupportedAgentType(f"{agent_name} is not a valid agent type")
+
+
+def loads_several_agents(agent_name: str) -> bool:
+    return get_agent_type(agent_name.strip()).loader is load_all_tabular_agents
+
+
+# Files or folders the agents of a cli name are loaded from, one per agent
+def get_model_paths(agent_name: str, battle_format: str) -> List[str]:
+    agent_name = agent_name.strip()
+    return _get_model_paths(get_agent_type(agent_name), agent_name, battle_format)
+
+
+def count_agents(agent_name: str, battle_format: str) -> int:
+    agent_type = get_agent_type(agent_name.strip())
+    if agent_type.loader is not load_all_tabular_agents:
+        return 1
+    return len(os.listdir(f"{MODELS_PATH}/{agent_type.model_folder}/{battle_format}"))
+
+
+# Configurations with distinct usernames for the agents created for the name, since
+# they log in at the same time
+def get_player_configurations(
+    username: str, agent_name: str, battle_format: str
+) -> List[PlayerConfiguration]:
+    count = count_agents(agent_name, battle_format)
+    if count == 1:
+        return [PlayerConfiguration(username, None)]
+    return [PlayerConfiguration(f"{username} {i + 1}", None) for i in range(count)]
+
+
+def get_model_folder(class_name: str) -> str:
+    for agent_type in AGENT_TYPES:
+        if agent_type.class_name == class_name and agent_type.model_folder is not None:
+            return agent_type.model_folder
+    raise UnsupportedAgentType(f"{class_name} has no model folder")
+
+
+# A list of player configurations gives each of the agents created for the name its
+# own configuration, as the agents of a model folder log in at the same time
 def create_agent(
     cli_name,
     battle_format,
@@ -52,9 +330,10 @@ def create_agent(
     **others,
 ) -> List[Player]:
     agent_name = cli_name.strip()
+    if isinstance(player_configuration, list) and len(player_configuration) == 1:
+        player_configuration = player_configuration[0]
     kwargs = dict(
         player_configuration=player_configuration,
-        battle_format=battle_format,
         max_concurrent_battles=max_concurrent_battles,
         save_replays=save_replay,
         start_timer_on_battle_start=start_timer,
@@ -62,119 +341,7 @@ def create_agent(
     )
     for key, value in others.items():
         kwargs[key] = value
-    if agent_name == "dad":
-        agent = [Dad(**kwargs)]
-    elif agent_name == "8-year-old-me":
-        agent = [EightYearOldMe(**kwargs)]
-    elif agent_name == "20-year-old-me":
-        agent = [TwentyYearOldMe(**kwargs)]
-    elif agent_name == "advanced-heuristics":
-        agent = [AdvancedHeuristics(**kwargs)]
-    elif "simpleRL-best" in agent_name:
-        with open(
-            f"{MODELS_PATH}/simpleRL/{battle_format}/best.pokeai", "rb"
-        ) as model_file:
-            model = pickle.load(model_file)
-        keep_training = False
-        if "train" in agent_name:
-            keep_training = True
-        agent = [SimpleRLAgent(**kwargs, keep_training=keep_training, model=model)]
-    elif "simpleRL-all" in agent_name:
-        models = []
-        files = os.listdir(f"{MODELS_PATH}/simpleRL/{battle_format}")
-        for file in files:
-            with open(
-                f"{MODELS_PATH}/simpleRL/{battle_format}/" + file, "rb"
-            ) as model_file:
-                models.append(pickle.load(model_file))
-        agent = []
-        keep_training = False
-        if "train" in agent_name:
-            keep_training = True
-        for model in models:
-            agent.append(
-                SimpleRLAgent(**kwargs, keep_training=keep_training, model=model)
-            )
-    elif "expertRL-best" in agent_name:
-        with open(
-            f"{MODELS_PATH}/expertRL/{battle_format}/best.pokeai", "rb"
-        ) as model_file:
-            model = pickle.load(model_file)
-        keep_training = False
-        if "train" in agent_name:
-            keep_training = True
-        agent = [ExpertRLAgent(**kwargs, keep_training=keep_training, model=model)]
-    elif "expertRL-all" in agent_name:
-        models = []
-        files = os.listdir(f"{MODELS_PATH}/expertRL/{battle_format}")
-        for file in files:
-            with open(
-                f"{MODELS_PATH}/expertRL/{battle_format}/" + file, "rb"
-            ) as model_file:
-                models.append(pickle.load(model_file))
-        agent = []
-        keep_training = False
-        if "train" in agent_name:
-            keep_training = True
-        for model in models:
-            agent.append(
-                ExpertRLAgent(**kwargs, keep_training=keep_training, model=model)
-            )
-    elif "simpleSarsaStark-best" in agent_name:
-        with open(
-            f"{MODELS_PATH}/SarsaStark/{battle_format}/best.pokeai", "rb"
-        ) as model_file:
-            model = pickle.load(model_file)
-        keep_training = False
-        if "train" in agent_name:
-            keep_training = True
-        agent = [SarsaStark(**kwargs, keep_training=keep_training, model=model)]
-    elif "simpleSarsaStark-all" in agent_name:
-        models = []
-        files = os.listdir(f"{MODELS_PATH}/SarsaStark/{battle_format}")
-        for file in files:
-            with open(
-                f"{MODELS_PATH}/SarsaStark/{battle_format}/" + file, "rb"
-            ) as model_file:
-                models.append(pickle.load(model_file))
-        agent = []
-        keep_training = False
-        if "train" in agent_name:
-            keep_training = True
-        for model in models:
-            agent.append(SarsaStark(**kwargs, keep_training=keep_training, model=model))
-    elif "expertSarsaStark-best" in agent_name:
-        with open(
-            f"{MODELS_PATH}/expertSarsaStark/{battle_format}/best.pokeai", "rb"
-        ) as model_file:
-            model = pickle.load(model_file)
-        keep_training = False
-        if "train" in agent_name:
-            keep_training = True
-        agent = [ExpertSarsaStark(**kwargs, keep_training=keep_training, model=model)]
-    elif "expertSarsaStark-all" in agent_name:
-        models = []
-        files = os.listdir(f"{MODELS_PATH}/expertSarsaStark/{battle_format}")
-        for file in files:
-            with open(
-                f"{MODELS_PATH}/expertSarsaStark/{battle_format}/" + file, "rb"
-            ) as model_file:
-                models.append(pickle.load(model_file))
-        agent = []
-        keep_training = False
-        if "train" in agent_name:
-            keep_training = True
-        for model in models:
-            agent.append(
-                ExpertSarsaStark(**kwargs, keep_training=keep_training, model=model)
-            )
-    elif "alphaPokeSingle-" in agent_name:
-        model_path = agent_name.split("-", 1)[1]
-        model_path = os.path.join(MODELS_PATH, "tf_models", model_path)
-        agent = [AlphaPokeSingleBattleModelLoader(model=model_path, **kwargs)]
-    else:
-        raise UnsupportedAgentType(f"{cli_name} is not a valid agent type")
-    return agent
+    return get_agent_type(agent_name).create(agent_name, battle_format, **kwargs)
 
 
 class UnsupportedAgentType(Exception):
@@ -0,0 +1,337 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Measures how long the agents take to choose their moves, split in the time spent
+# building the state, querying the model and creating the order, and aggregates the
+# measures in histograms with buckets of bounded relative width like HdrHistogram
+import json
+import os
+import shutil
+import threading
+import time
+
+from contextvars import ContextVar
+from inspect import isawaitable
+from poke_env.environment.abstract_battle import AbstractBattle
+from poke_env.player.player import Player
+from tabulate import tabulate
+from typing import Callable, Dict, Iterable, List, Optional
+
+# Values below 2^SIGNIFICANT_BITS microseconds are exact, larger ones are rounded to
+# SIGNIFICANT_BITS bits, so buckets are at most 1/64 of their values wide
+SIGNIFICANT_BITS = 7
+PERCENTILES = [50, 90, 99, 99.9]
+
+# Methods timed as each phase of a decision. Undotted names are looked up on the
+# player that chooses the moves, dotted ones starting from the agent, for example
+# on the environment and on the policy of TFPlayer
+PHASE_METHODS = {
+    "state": [
+        "_battle_to_state",
+        "embed_battle",
+        "init_battle",
+        "wrapped_env.embed_battle",
+        "policy.flatten_observation",
+    ],
+    "model": [
+        "_choose_action",
+        "get_next_order",
+        "policy.q_values",
+        "policy.action",
+    ],
+    "order": [
+        "_action_to_move",
+        "action_to_move_func",
+        "create_order",
+        "wrapped_env.action_to_move",
+    ],
+}
+TOTAL = "total"
+
+# Battle of the decision being timed, set in the task that handles the battle so
+# that the phases of concurrent battles are kept apart
+_DECISION_BATTLE: ContextVar[Optional[str]] = ContextVar(
+    "decision_battle", default=None
+)
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.min: Optional[int] = None
+        self.max: Optional[int] = None
+
+    @staticmethod
+    def bucket_index(value: int) -> int:
+        shift = max(value.bit_length() - SIGNIFICANT_BITS, 0)
+        return shift * 2 ** (SIGNIFICANT_BITS - 1) + (value >> shift)
+
+    # Highest value counted in the bucket, as HdrHistogram reports percentiles
+    @staticmethod
+    def bucket_value(index: int) -> int:
+        half = 2 ** (SIGNIFICANT_BITS - 1)
+        shift = max(index // half - 1, 0)
+        mantissa = index - shift * half
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, seconds: float):
+        value = max(round(seconds * 1e6), 0)
+        index = self.bucket_index(value)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        for value in [other.min, other.max]:
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+        return self
+
+    # Percentiles and mean are in seconds
+    def percentile(self, percentile: float) -> float:
+        if self.count == 0:
+            raise ValueError("The histogram is empty")
+        if not 0 <= percentile <= 100:
+            raise ValueError(
+                f"Expected a percentile between 0 and 100. Got {percentile}"
+            )
+        rank = max(percentile / 100 * self.count, 1)
+        seen = 0
+        for index in sorted(self.buckets.keys()):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(self.bucket_value(index), self.max) / 1e6
+        return self.max / 1e6
+
+    @property
+    def mean(self) -> float:
+        if self.count == 0:
+            raise ValueError("The histogram is empty")
+        return self.total / self.count / 1e6
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+            "buckets": {str(index): count for index, count in self.buckets.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LatencyHistogram":
+        histogram = cls()
+        histogram.count = data["count"]
+        histogram.total = data["total"]
+        histogram.min = data["min"]
+        histogram.max = data["max"]
+        histogram.buckets = {int(i): count for i, count in data["buckets"].items()}
+        return histogram
+
+
+class DecisionProfiler:
+    def __init__(self):
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        # Called with the battle and the total time of each decision
+        self.decision_listeners: List[Callable[[AbstractBattle, float], None]] = []
+        self._phases: Dict[Optional[str], Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def instrument(self, player: Player):
+        # TFPlayer chooses its moves through the player of its environment
+        internal_player = getattr(player, "internal_agent", None) or player
+        for phase, methods in PHASE_METHODS.items():
+            for method in methods:
+                owner = player if "." in method else internal_player
+                *path, name = method.split(".")
+                for attribute in path:
+                    owner = getattr(owner, attribute, None)
+                function = getattr(owner, name, None)
+                if owner is None or not callable(function):
+                    continue
+                try:
+                    setattr(owner, name, self._timed_phase(phase, function))
+                except AttributeError:
+                    continue
+        internal_player.choose_move = self._timed_decision(internal_player.choose_move)
+
+    def record(self, phase: str, seconds: float):
+        with self._lock:
+            self.histograms.setdefault(phase, LatencyHistogram()).record(seconds)
+
+    # Nested phases are not counted twice, as the outer ones exclude them
+    def _timed_phase(self, phase: str, function: Callable) -> Callable:
+        def timed_phase(*args, **kwargs):
+            stack = self._local.__dict__.setdefault("stack", [])
+            stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                nested = stack.pop()
+                if len(stack) > 0:
+                    stack[-1] += elapsed
+                with self._lock:
+                    phases = self._phases.setdefault(_DECISION_BATTLE.get(), {})
+                    phases[phase] = phases.get(phase, 0) + elapsed - nested
+
+        return timed_phase
+
+    # The phases are recorded once per decision, summing the time of every call.
+    # Those timed outside of any decision, like the ones TFPlayer runs in the thread
+    # of its environment, go to the next decision that ends
+    def _timed_decision(self, choose_move: Callable) -> Callable:
+        def end_decision(battle, start):
+            total = time.perf_counter() - start
+            self.record(TOTAL, total)
+            with self._lock:
+                phases = self._phases.pop(battle.battle_tag, {})
+                for phase, seconds in self._phases.pop(None, {}).items():
+                    phases[phase] = phases.get(phase, 0) + seconds
+            for phase, seconds in phases.items():
+                self.record(phase, seconds)
+            for listener in self.decision_listeners:
+                listener(battle, total)
+
+        def timed_decision(battle):
+            start = time.perf_counter()
+            token = _DECISION_BATTLE.set(battle.battle_tag)
+            try:
+                order = choose_move(battle)
+            finally:
+                _DECISION_BATTLE.reset(token)
+            if not isawaitable(order):
+                end_decision(battle, start)
+                return order
+
+            async def timed_order():
+                token = _DECISION_BATTLE.set(battle.battle_tag)
+                try:
+                    awaited_order = await order
+                finally:
+                    _DECISION_BATTLE.reset(token)
+                end_decision(battle, start)
+                return awaited_order
+
+            return timed_order()
+
+        return timed_decision
+
+
+# Profilers of the agents measured in this process
+_PROFILERS: Dict[str, DecisionProfiler] = {}
+
+
+def instrument_player(player: Player, agent: str) -> DecisionProfiler:
+    profiler = _PROFILERS.setdefault(agent, DecisionProfiler())
+    profiler.instrument(player)
+    return profiler
+
+
+def export_latency_histograms(
+    path: str, profilers: Optional[Dict[str, DecisionProfiler]] = None
+):
+    if profilers is None:
+        profilers = _PROFILERS
+    histograms = {}
+    for agent, profiler in profilers.items():
+        with profiler._lock:
+            histograms[agent] = {
+                phase: LatencyHistogram().merge(histogram)
+                for phase, histogram in profiler.histograms.items()
+            }
+    save_latency_histograms(histograms, path)
+
+
+def save_latency_histograms(
+    histograms: Dict[str, Dict[str, LatencyHistogram]], path: str
+):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    data = {
+        agent: {phase: histogram.to_dict() for phase, histogram in phases.items()}
+        for agent, phases in histograms.items()
+    }
+    with open(path, "w") as file:
+        json.dump(data, file)
+
+
+def load_latency_histograms(
+    paths: Iterable[str],
+) -> Dict[str, Dict[str, LatencyHistogram]]:
+    histograms = {}
+    for path in paths:
+        with open(path) as file:
+            data = json.load(file)
+        for agent, phases in data.items():
+            agent_histograms = histograms.setdefault(agent, {})
+            for phase, histogram in phases.items():
+                agent_histograms.setdefault(phase, LatencyHistogram()).merge(
+                    LatencyHistogram.from_dict(histogram)
+                )
+    return histograms
+
+
+# Merges the histograms exported by the processes of a pool in a single file
+def merge_latency_histograms(
+    directory: str, path: str
+) -> Dict[str, Dict[str, LatencyHistogram]]:
+    files = [
+        os.path.join(directory, file)
+        for file in sorted(os.listdir(directory))
+        if file.endswith(".json")
+    ]
+    histograms = load_latency_histograms(files)
+    save_latency_histograms(histograms, path)
+    shutil.rmtree(directory)
+    return histograms
+
+
+def prettify_latency_histograms(
+    histograms: Dict[str, Dict[str, LatencyHistogram]],
+) -> str:
+    table = [
+        ["Agent", "Phase", "Decisions", "Mean (ms)"]
+        + [f"p{percentile:g} (ms)" for percentile in PERCENTILES]
+        + ["Max (ms)"]
+    ]
+    for agent, phases in histograms.items():
+        for phase in [*PHASE_METHODS.keys(), TOTAL]:
+            histogram = phases.get(phase)
+            if histogram is None or histogram.count == 0:
+                continue
+            table.append(
+                [agent, phase, histogram.count, f"{histogram.mean * 1e3:.3f}"]
+                + [
+                    f"{histogram.percentile(percentile) * 1e3:.3f}"
+                    for percentile in PERCENTILES
+                ]
+                + [f"{histogram.max / 1e3:.3f}"]
+            )
+    return tabulate(table)
@@ -0,0 +1,211 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Long-lived pool of processes evaluating successive versions of a tabular model
+import asyncio
+import multiprocessing
+import pickle
+import queue
+
+from poke_env.player_configuration import PlayerConfiguration
+from poke_env.server_configuration import (
+    LocalhostServerConfiguration,
+    ServerConfiguration,
+)
+from typing import Callable, List, Optional
+
+from .player_evaluation import (
+    create_baselines,
+    evaluate_against_baselines,
+    sequential_evaluate_against_baselines,
+)
+from .tabular_model import apply_model_delta, get_model_delta
+
+# Seconds between the checks that the workers are still alive while waiting
+RESULT_POLL_INTERVAL = 5.0
+
+
+class EvaluationPool:
+    def __init__(
+        self,
+        create_agent_func: Callable,
+        workers: int = 2,
+        challenges: int = 6000,
+        placement: int = 40,
+        max_concurrent_battles: int = 10,
+        max_relative_width: Optional[float] = None,
+        batch_size: int = 200,
+        server_configurations: Optional[List[ServerConfiguration]] = None,
+    ):
+        if workers < 1:
+            raise ValueError(f"Expected at least one worker. Got {workers}")
+        if not server_configurations:
+            server_configurations = [LocalhostServerConfiguration]
+        self.results = multiprocessing.Queue()
+        self.tasks = [multiprocessing.Queue() for _ in range(workers)]
+        self.processes = [
+            _EvaluationProcess(
+                i,
+                create_agent_func,
+                self.tasks[i],
+                self.results,
+                challenges,
+                placement,
+                max_concurrent_battles,
+                max_relative_width,
+                batch_size,
+                server_configurations[i % len(server_configurations)],
+            )
+            for i in range(workers)
+        ]
+        self.snapshot = {}
+        self.history = []
+        self.history_offset = 0
+        self.worker_versions = [0 for _ in range(workers)]
+        self.next_worker = 0
+        self.next_job = 0
+        self.completed = {}
+        for p in self.processes:
+            p.start()
+
+    def submit(self, model: dict) -> int:
+        delta = get_model_delta(self.snapshot, model)
+        apply_model_delta(self.snapshot, delta)
+        self.history.append(delta)
+        worker = self.next_worker
+        self.next_worker = (self.next_worker + 1) % len(self.processes)
+        deltas = self.history[self.worker_versions[worker] - self.history_offset :]
+        self.worker_versions[worker] = self.history_offset + len(self.history)
+        job = self.next_job
+        self.next_job += 1
+        self.tasks[worker].put((job, deltas))
+        self._compact_history()
+        return job
+
+    def result(self, job: int):
+        while job not in self.completed.keys():
+            try:
+                completed_job, evaluation = self.results.get(
+                    timeout=RESULT_POLL_INTERVAL
+                )
+            except queue.Empty:
+                # A worker killed by the system never sends its result
+                dead = [i for i, p in enumerate(self.processes) if not p.is_alive()]
+                if dead:
+                    raise RuntimeError(
+                        f"Evaluation workers {dead} stopped before job {job} ended"
+                    )
+                continue
+            self.completed[completed_job] = evaluation
+        evaluation = self.completed.pop(job)
+        if isinstance(evaluation, Exception):
+            raise evaluation
+        return evaluation
+
+    def close(self):
+        for tasks in self.tasks:
+            tasks.put(None)
+        for p in self.processes:
+            p.join()
+
+    def _compact_history(self):
+        min_version = min(self.worker_versions)
+        if min_version > self.history_offset:
+            del self.history[: min_version - self.history_offset]
+            self.history_offset = min_version
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class _EvaluationProcess(multiprocessing.Process):
+    def __init__(
+        self,
+        index,
+        create_agent_func,
+        tasks,
+        results,
+        challenges,
+        placement,
+        max_concurrent_battles,
+        max_relative_width=None,
+        batch_size=200,
+        server_configuration=LocalhostServerConfiguration,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.index = index
+        self.create_agent_func = create_agent_func
+        self.tasks = tasks
+        self.results = results
+        self.challenges = challenges
+        self.placement = placement
+        self.max_concurrent_battles = max_concurrent_battles
+        self.max_relative_width = max_relative_width
+        self.batch_size = batch_size
+        self.server_configuration = server_configuration
+
+    def run(self) -> None:
+        agent = self.create_agent_func(
+            {},
+            False,
+            False,
+            self.max_concurrent_battles,
+            PlayerConfiguration(f"Eval{self.index} Agent", None),
+            server_configuration=self.server_configuration,
+        )
+        baselines = create_baselines(
+            self.challenges, f"Eval{self.index} ", self.server_configuration
+        )
+        loop = asyncio.get_event_loop()
+        task = self.tasks.get()
+        while task is not None:
+            job, deltas = task
+            for delta in deltas:
+                apply_model_delta(agent.model, delta)
+            try:
+                evaluation = loop.run_until_complete(self._evaluate(agent, baselines))
+            except Exception as e:
+                evaluation = _picklable_exception(e)
+            self.results.put((job, evaluation))
+            task = self.tasks.get()
+
+    async def _evaluate(self, agent, baselines):
+        if self.max_relative_width is None:
+            return await evaluate_against_baselines(
+                agent, baselines, self.challenges, self.placement
+            )
+        return await sequential_evaluate_against_baselines(
+            agent,
+            baselines,
+            self.challenges,
+            self.placement,
+            self.batch_size,
+            self.max_relative_width,
+        )
+
+
+# Exceptions that cannot cross the queue would leave the pool waiting for the job
+def _picklable_exception(exception: Exception) -> Exception:
+    try:
+        pickle.loads(pickle.dumps(exception))
+        return exception
+    except Exception:
+        return RuntimeError(f"{type(exception).__name__}: {exception}")
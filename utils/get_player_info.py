@@ -20,33 +20,41 @@ import time
 import requests
 
 from poke_env.data.normalize import to_id_str
+from typing import Optional
 
+USER_URL = "https://pokemonshowdown.com/users/{}.json"
+REQUEST_TIMEOUT = 10
+FIRST_RETRY_DELAY = 1.0
+MAX_RETRY_DELAY = 60.0
 
-def get_ratings(username, battle_format):
-    done = False
+# Keeps the connection to the website open between requests
+_SESSION = requests.Session()
+
+
+def get_ratings(username, battle_format, max_retries: Optional[int] = None):
     data = None
-    while not done:
+    delay = FIRST_RETRY_DELAY
+    retries = 0
+    while data is None:
         try:
-            json_data = requests.get(
-                f"https://pokemonshowdown.com/users/{to_id_str(username)}.json"
+            json_data = _SESSION.get(
+                USER_URL.format(to_id_str(username)), timeout=REQUEST_TIMEOUT
             )
             assert json_data is not None
             data = json.loads(json_data.content)
             assert data is not None
-            done = True
-        except requests.exceptions.SSLError:
-            print("SSL Error...")
-            time.sleep(10)
-            print("Retrying...")
-        except requests.exceptions.ConnectionError:
-            print("Connection Error...")
-            time.sleep(10)
-            print("Retrying...")
-        except json.JSONDecodeError:
-            print("JSONDecodeError...")
-            time.sleep(10)
-            print("Retrying...")
-    assert data is not None
+        except (
+            requests.exceptions.SSLError,
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
+            json.JSONDecodeError,
+        ) as e:
+            retries += 1
+            if max_retries is not None and retries > max_retries:
+                raise e
+            print(f"{e.__class__.__name__}... Retrying in {delay:.0f}s...")
+            time.sleep(delay)
+            delay = min(delay * 2, MAX_RETRY_DELAY)
     rating_data = data["ratings"][battle_format]
     for key, value in rating_data.items():
         if key == "gxe":
@@ -54,3 +62,17 @@ def get_ratings(username, battle_format):
         else:
             rating_data[key] = round(float(value))
     return rating_data
+
+
+# Polls the ratings with increasing delays until the elo differs from last_elo
+def wait_for_rating_update(
+    username, battle_format, last_elo, timeout: float, max_delay: float = 30.0
+):
+    deadline = time.monotonic() + timeout
+    delay = FIRST_RETRY_DELAY
+    ratings = get_ratings(username, battle_format)
+    while ratings["elo"] == last_elo and time.monotonic() < deadline:
+        time.sleep(min(delay, max(deadline - time.monotonic(), 0)))
+        delay = min(delay * 2, max_delay)
+        ratings = get_ratings(username, battle_format)
+    return ratings
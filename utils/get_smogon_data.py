@@ -15,17 +15,33 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 #
+import importlib.metadata
 import json
 import json5
+import os
 import requests
+import sys
 
-from enum import Enum
 from functools import lru_cache
 from poke_env.data.gen_data import GenData
 from poke_env.data.normalize import to_id_str
+from typing import Dict, Iterable, List, Optional, Union
 
 GENERATIONS = 8
 
+DATA_CACHE_VERSION = 1
+DATA_CACHE_PATH = os.environ.get(
+    "POKEAI_DATA_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "pokeai")
+)
+BUNDLED_DATA_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "resources", "data"
+)
+if getattr(sys, "frozen", False) and hasattr(sys, "_MEIPASS"):  # pragma: no cover
+    BUNDLED_DATA_PATH = os.path.join(sys._MEIPASS, "resources", "data")
+
+ITEMS_URL = "https://play.pokemonshowdown.com/data/text/items.json5"
+RANDOM_BATTLE_LEARNSET_URL = "https://raw.githubusercontent.com/pkmn/randbats/main/data/gen{gen}randombattle.json"
+
 MEGA_STONES = [
     "abomasite",
     "absolite",
@@ -115,12 +131,100 @@ Z_CRYSTALS = [
 ]
 
 
+def load_cached_data(name: str) -> Optional[Union[dict, list]]:
+    for folder in [DATA_CACHE_PATH, BUNDLED_DATA_PATH]:
+        try:
+            with open(os.path.join(folder, f"{name}.json"), "r") as data_file:
+                cached = json.load(data_file)
+        except (OSError, ValueError):
+            continue
+        if cached.get("version") == DATA_CACHE_VERSION:
+            return cached["data"]
+    return None
+
+
+def save_cached_data(name: str, data, source: str, folder: Optional[str] = None):
+    if folder is None:
+        folder = DATA_CACHE_PATH
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"{name}.json")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as data_file:
+        json.dump(
+            {"version": DATA_CACHE_VERSION, "source": source, "data": data},
+            data_file,
+            indent=0,
+        )
+    os.replace(tmp_path, path)
+
+
+# A cache folder that cannot be written only costs computing or fetching the data again
+def _cache_data(name: str, data, source: str):
+    try:
+        save_cached_data(name, data, source)
+    except OSError:
+        pass
+
+
+def fetch_items() -> list:
+    data = requests.get(ITEMS_URL)
+    data = json5.loads(data.content)
+    items = []
+    for item in data.keys():
+        items.append(to_id_str(item))
+    items.sort()
+    return items
+
+
+def fetch_random_battle_learnset(gen: int) -> dict:
+    data = requests.get(RANDOM_BATTLE_LEARNSET_URL.format(gen=gen))
+    return json.loads(data.content)
+
+
+def compute_abilities(gen: int) -> List[str]:
+    pokedex = GenData.from_gen(max(gen, 4)).pokedex
+    abilities = set()
+    for pokemon in pokedex.values():
+        for ability in pokemon["abilities"].values():
+            if len(ability) > 0:
+                abilities.add(to_id_str(ability))
+    return sorted(abilities)
+
+
+# The abilities come from the pokedex of poke_env, so they are kept per version
+def _abilities_name(gen: int) -> str:
+    return f"gen{gen}abilities-poke-env{importlib.metadata.version('poke-env')}"
+
+
+# With the bundled data folder the data are the offline fallbacks shipped with the project
+def refresh_data(
+    generations: Iterable[int] = range(1, GENERATIONS + 1),
+    folder: Optional[str] = None,
+):
+    save_cached_data("items", fetch_items(), ITEMS_URL, folder)
+    for gen in generations:
+        save_cached_data(
+            f"gen{gen}randombattle",
+            fetch_random_battle_learnset(gen),
+            RANDOM_BATTLE_LEARNSET_URL.format(gen=gen),
+            folder,
+        )
+        save_cached_data(
+            _abilities_name(gen), compute_abilities(gen), "poke_env", folder
+        )
+    get_random_battle_learnset.cache_clear()
+    get_ability_indexes.cache_clear()
+    get_item_indexes.cache_clear()
+
+
 @lru_cache(8)
 def get_random_battle_learnset(gen: int):
-    data = requests.get(
-        f"https://raw.githubusercontent.com/pkmn/randbats/main/data/gen{gen}randombattle.json"
-    )
-    data = json.loads(data.content)
+    data = load_cached_data(f"gen{gen}randombattle")
+    if data is None:
+        data = fetch_random_battle_learnset(gen)
+        _cache_data(
+            f"gen{gen}randombattle", data, RANDOM_BATTLE_LEARNSET_URL.format(gen=gen)
+        )
     to_return = {}
     for key, value in data.items():
         new_key = (
@@ -164,36 +268,37 @@ def get_random_battle_learnset(gen: int):
     return to_return
 
 
-def get_abilities(gen: int):
-    if f"Abilities{gen}" in globals().keys():
-        return globals()[f"Abilities{gen}"]
-    pokedex = GenData.from_gen(max(gen, 4)).pokedex
-    abilities = []
-    for pokemon in pokedex.values():
-        for ability in pokemon["abilities"].values():
-            if len(ability) > 0 and to_id_str(ability) not in abilities:
-                abilities.append(to_id_str(ability))
-    abilities.sort()
-    to_return = Enum(f"Abilities{gen}", abilities, module=__name__)
-    globals()[f"Abilities{gen}"] = to_return
-    return to_return
+def get_abilities(gen: int) -> List[str]:
+    name = _abilities_name(gen)
+    abilities = load_cached_data(name)
+    if abilities is None:
+        abilities = compute_abilities(gen)
+        _cache_data(name, abilities, "poke_env")
+    return abilities
 
 
-def get_items():
-    if "Items" in globals().keys():
-        return globals()["Items"]
-    data = requests.get("https://play.pokemonshowdown.com/data/text/items.json5")
-    data = json5.loads(data.content)
-    json_items = list(data.keys())
-    items = []
-    for item in json_items:
-        items.append(to_id_str(item))
-    items.sort()
-    to_return = Enum("Items", items, module=__name__)
-    globals()["Items"] = to_return
-    return to_return
+def get_items() -> List[str]:
+    items = load_cached_data("items")
+    if items is None:
+        items = fetch_items()
+        _cache_data("items", items, ITEMS_URL)
+    return items
+
+
+@lru_cache(None)
+def get_ability_indexes(gen: int) -> Dict[str, int]:
+    return {ability: i for i, ability in enumerate(get_abilities(gen))}
+
+
+@lru_cache(None)
+def get_item_indexes() -> Dict[str, int]:
+    return {item: i for i, item in enumerate(get_items())}
 
 
-get_items()
-for i in range(1, GENERATIONS, 1):
-    get_abilities(i)
+if __name__ == "__main__":  # pragma: no cover
+    if "--bundle" in sys.argv[1:]:
+        refresh_data(folder=BUNDLED_DATA_PATH)
+        print(f"Bundled data updated in {BUNDLED_DATA_PATH}")
+    else:
+        refresh_data()
+        print(f"Data cache updated in {DATA_CACHE_PATH}")
@@ -0,0 +1,101 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Keeps a player searching ladder battles, so that a new battle starts as soon as
+# one of the others ends or is forfeited instead of after the slowest of a batch
+import asyncio
+
+from poke_env.player.player import Player
+from typing import Optional, Set
+
+from utils.battle_watchdog import BattleWatchdog
+
+
+class LadderQueue:
+    def __init__(
+        self,
+        player: Player,
+        concurrent_battles: int,
+        watchdog: BattleWatchdog,
+        search_timeout: float = 300,
+    ):
+        if concurrent_battles <= 0:
+            raise ValueError(
+                f"Expected a positive number of concurrent battles. Got {concurrent_battles}"
+            )
+        if search_timeout <= 0:
+            raise ValueError(
+                f"Expected a positive search timeout. Got {search_timeout}"
+            )
+        self.player = getattr(player, "internal_agent", None) or player
+        self.concurrent_battles = concurrent_battles
+        self.watchdog = watchdog
+        self.search_timeout = search_timeout
+
+    # Battles still being played, without the forfeited ones that never ended
+    def active_battles(self) -> Set[str]:
+        return {
+            battle_tag
+            for battle_tag, battle in list(self.player.battles.items())
+            if not battle.finished and battle_tag not in self.watchdog.forfeited
+        }
+
+    # Fills the free slots, without starting more battles than the ones still to
+    # play, and returns as soon as one of the battles ends or is forfeited
+    async def play(self, remaining: Optional[int] = None):
+        await self.player._handle_threaded_coroutines(self._play(remaining))
+
+    async def _play(self, remaining: Optional[int]):
+        await self.player._logged_in.wait()
+        slots = self.concurrent_battles
+        if remaining is not None:
+            slots = min(slots, remaining)
+        while len(self.active_battles()) < slots:
+            await self._start_battle()
+        playing = self.active_battles()
+        while playing and playing <= self.active_battles():
+            await self._wait_for_battle_end()
+
+    # A search that finds no battle in time is cancelled and started again, since the
+    # server may have dropped it
+    async def _start_battle(self):
+        async with self.player._battle_start_condition:
+            while True:
+                battles = set(self.player.battles)
+                await self.player._search_ladder_game(self.player._format)
+                try:
+                    await asyncio.wait_for(
+                        self.player._battle_start_condition.wait(), self.search_timeout
+                    )
+                    break
+                except asyncio.TimeoutError:
+                    await self.player._send_message("/cancelsearch")
+                    # The battle may have started just before the search was cancelled
+                    if set(self.player.battles) - battles:
+                        break
+        await self.player._battle_semaphore.acquire()
+
+    # Stuck battles are forfeited while waiting, which frees their slots
+    async def _wait_for_battle_end(self):
+        try:
+            async with self.player._battle_end_condition:
+                await asyncio.wait_for(
+                    self.player._battle_end_condition.wait(), self.watchdog.interval
+                )
+        except asyncio.TimeoutError:
+            pass
+        await self.watchdog.check()
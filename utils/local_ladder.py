@@ -0,0 +1,142 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Ladder ratings computed locally with the formulas of Pokémon Showdown, used to
+# simulate the ladder on local servers without querying the official website
+import math
+import threading
+
+from multiprocessing.managers import BaseManager
+from typing import Dict, Optional, Tuple
+
+ELO_START = 1000
+GLICKO_START = 1500
+DEVIATION_START = 350
+DEVIATION_MIN = 25
+_Q = math.log(10) / 400
+
+
+# Elo update with the K factor used by the Showdown ladder
+def elo_update(elo: float, score: float, foe_elo: float) -> float:
+    k = 50
+    if elo < 1200:
+        if score < 0.5:
+            k = 10 + (elo - 1000) * 40 / 200
+        elif score > 0.5:
+            k = 90 - (elo - 1000) * 40 / 200
+    elif 1350 < elo <= 1600:
+        k = 40
+    elif elo > 1600:
+        k = 32
+    expected = 1 / (1 + 10 ** ((foe_elo - elo) / 400))
+    return max(elo + k * (score - expected), ELO_START)
+
+
+# Glicko-1 update with a rating period of one battle
+def glicko_update(
+    rating: float,
+    deviation: float,
+    score: float,
+    foe_rating: float,
+    foe_deviation: float,
+) -> Tuple[float, float]:
+    g = 1 / math.sqrt(1 + 3 * _Q**2 * foe_deviation**2 / math.pi**2)
+    expected = 1 / (1 + 10 ** (-g * (rating - foe_rating) / 400))
+    inverse_d_squared = _Q**2 * g**2 * expected * (1 - expected)
+    precision = 1 / deviation**2 + inverse_d_squared
+    rating += _Q / precision * g * (score - expected)
+    return rating, max(math.sqrt(1 / precision), DEVIATION_MIN)
+
+
+# Glicko X-Act Estimate: the probability of beating a random ladder player
+def gxe(rating: float, deviation: float) -> float:
+    denominator = math.sqrt(
+        3 * math.log(10) ** 2 * deviation**2
+        + 2500 * (64 * math.pi**2 + 147 * math.log(10) ** 2)
+    )
+    value = 1 / (1 + 10 ** ((GLICKO_START - rating) * math.pi / denominator))
+    return round(value * 100, 1)
+
+
+# Shared by the processes of the players through a LocalLadderManager. Each battle
+# is reported by both players: the first report updates both ratings, using the
+# ratings they had before the battle
+class LocalLadder:
+    def __init__(self):
+        self.ratings: Dict[str, Dict[str, float]] = {}
+        self.reported_battles = set()
+        self._lock = threading.Lock()
+
+    def report(
+        self, battle_tag: str, player: str, opponent: str, score: Optional[float]
+    ) -> Dict[str, float]:
+        with self._lock:
+            if battle_tag not in self.reported_battles:
+                self.reported_battles.add(battle_tag)
+                self._update(player, opponent, 0.5 if score is None else score)
+            return self.get_ratings(player)
+
+    def get_ratings(self, username: str) -> Dict[str, float]:
+        if username not in self.ratings.keys():
+            return _initial_ratings()
+        return dict(self.ratings[username])
+
+    def _update(self, player: str, opponent: str, score: float):
+        ratings = self.ratings.setdefault(player, _initial_ratings())
+        foe_ratings = self.ratings.setdefault(opponent, _initial_ratings())
+        elo = elo_update(ratings["elo"], score, foe_ratings["elo"])
+        foe_elo = elo_update(foe_ratings["elo"], 1 - score, ratings["elo"])
+        rpr, rprd = glicko_update(
+            ratings["rpr"],
+            ratings["rprd"],
+            score,
+            foe_ratings["rpr"],
+            foe_ratings["rprd"],
+        )
+        foe_rpr, foe_rprd = glicko_update(
+            foe_ratings["rpr"],
+            foe_ratings["rprd"],
+            1 - score,
+            ratings["rpr"],
+            ratings["rprd"],
+        )
+        _set_ratings(ratings, elo, rpr, rprd)
+        _set_ratings(foe_ratings, foe_elo, foe_rpr, foe_rprd)
+
+
+class LocalLadderManager(BaseManager):
+    pass
+
+
+LocalLadderManager.register("LocalLadder", LocalLadder)
+
+
+# Same keys as the ratings of the official website returned by get_ratings
+def _initial_ratings() -> Dict[str, float]:
+    return {
+        "elo": ELO_START,
+        "gxe": gxe(GLICKO_START, DEVIATION_START),
+        "rpr": GLICKO_START,
+        "rprd": DEVIATION_START,
+    }
+
+
+def _set_ratings(ratings, elo, rpr, rprd):
+    ratings["elo"] = elo
+    ratings["rpr"] = rpr
+    ratings["rprd"] = rprd
+    ratings["gxe"] = gxe(rpr, rprd)
@@ -0,0 +1,259 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Adaptive cross evaluation: instead of playing every pair, the pool of processes
+# keeps playing batches of the pairs whose next battles are expected to reduce
+# the uncertainty on the ratings the most
+import asyncio
+import multiprocessing
+import numpy as np
+import os
+import tempfile
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from poke_env.data import to_id_str
+from poke_env.player.player import Player
+from poke_env.server_configuration import (
+    LocalhostServerConfiguration,
+    ServerConfiguration,
+)
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .create_agent import count_agents, create_agent, get_player_configurations
+from .decision_latency import (
+    export_latency_histograms,
+    instrument_player,
+    merge_latency_histograms,
+)
+from .parallel_cross_evaluation import get_entries
+from .ratings import RatingEngine
+from .result_store import get_player_key, ResultStore
+
+# Index and server of this process, chosen when the worker starts
+_WORKER = 0
+_SERVER_CONFIGURATION: ServerConfiguration = LocalhostServerConfiguration
+# Players of each cli entry, created by the first matchup that needs them
+_PLAYERS: Dict[int, List[Player]] = {}
+# Directory where the process saves the latency of its agents, if measured
+_LATENCY_DIRECTORY: Optional[str] = None
+
+
+class MatchmakingScheduler:
+    def __init__(
+        self,
+        engine: RatingEngine,
+        batch_size: int = 100,
+        max_battles_per_pair: Optional[int] = None,
+    ):
+        if batch_size <= 0:
+            raise ValueError(f"Expected a positive batch size. Got {batch_size}")
+        self.engine = engine
+        self.batch_size = batch_size
+        self.max_battles_per_pair = max_battles_per_pair
+
+    # Expected reduction of the total variance of the ratings after a batch of
+    # battles between each pair, given the current estimates
+    def information_gains(self) -> np.ndarray:
+        theta = self.engine.log_strengths
+        covariance = self.engine.covariance
+        probabilities = 1 / (1 + np.exp(theta[None, :] - theta[:, None]))
+        information = self.batch_size * probabilities * (1 - probabilities)
+        variances = np.diag(covariance)
+        differences = variances[:, None] + variances[None, :] - 2 * covariance
+        # Squared norm of the covariance column of the rating difference
+        squared_norms = np.sum(covariance**2, axis=0)
+        products = covariance @ covariance
+        projections = squared_norms[:, None] + squared_norms[None, :] - 2 * products
+        return projections * information / (1 + differences * information)
+
+    # Pairs already being played are excluded, and only the candidates (all the
+    # rated players by default) are scheduled
+    def next_pair(
+        self,
+        excluded: Iterable[Tuple[str, str]] = (),
+        candidates: Optional[Iterable[str]] = None,
+    ) -> Optional[Tuple[str, str]]:
+        gains = self.information_gains()
+        gains[np.tril_indices_from(gains)] = -np.inf
+        if candidates is not None:
+            candidates = set(candidates)
+            outside = [
+                i
+                for i, player in enumerate(self.engine.players)
+                if player not in candidates
+            ]
+            gains[outside, :] = -np.inf
+            gains[:, outside] = -np.inf
+        if self.max_battles_per_pair is not None:
+            battles = self.engine.wins + self.engine.wins.T
+            gains[battles >= self.max_battles_per_pair] = -np.inf
+        for player, opponent in excluded:
+            i = self.engine.players.index(player)
+            j = self.engine.players.index(opponent)
+            gains[min(i, j), max(i, j)] = -np.inf
+        if gains.size == 0 or np.isneginf(gains.max()):
+            return None
+        i, j = np.unravel_index(np.argmax(gains), gains.shape)
+        return self.engine.players[i], self.engine.players[j]
+
+
+def adaptive_cross_evaluate(
+    agent_names: List[str],
+    battle_format: str,
+    max_battles: int,
+    batch_size: int = 100,
+    workers: int = 2,
+    server_configurations: Optional[List[ServerConfiguration]] = None,
+    max_concurrent_battles: int = 30,
+    store: Optional[ResultStore] = None,
+    max_battles_per_pair: Optional[int] = None,
+    latency_histograms: Optional[str] = None,
+) -> RatingEngine:
+    if workers < 1:
+        raise ValueError(f"Expected at least one worker. Got {workers}")
+    if not server_configurations:
+        server_configurations = [LocalhostServerConfiguration]
+    members = get_players(agent_names, battle_format)
+    if store is not None:
+        engine = RatingEngine.from_store(store, battle_format)
+    else:
+        engine = RatingEngine()
+    for key in members.keys():
+        engine.add_player(key)
+    engine.fit()
+    scheduler = MatchmakingScheduler(engine, batch_size, max_battles_per_pair)
+    context = multiprocessing.get_context("spawn")
+    configurations = context.Queue()
+    for i in range(workers):
+        configurations.put((i, server_configurations[i % len(server_configurations)]))
+    remaining_battles = max_battles
+    running = {}
+    latency_directory = None
+    if latency_histograms is not None:
+        latency_directory = tempfile.mkdtemp()
+    with ProcessPoolExecutor(
+        workers,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(configurations, latency_directory),
+    ) as pool:
+        while remaining_battles > 0 or running:
+            while remaining_battles > 0 and len(running) < workers:
+                # Players only known from the stored results are not scheduled
+                pair = scheduler.next_pair(running.values(), members.keys())
+                if pair is None:
+                    break
+                battles = min(batch_size, remaining_battles)
+                remaining_battles -= battles
+                future = pool.submit(
+                    play_pair,
+                    members[pair[0]],
+                    members[pair[1]],
+                    battle_format,
+                    battles,
+                    max_concurrent_battles,
+                )
+                running[future] = pair
+            if not running:
+                break
+            done, _ = wait(running.keys(), return_when=FIRST_COMPLETED)
+            for future in done:
+                player, opponent = running.pop(future)
+                wins, losses, battles = future.result()
+                engine.add_results(player, opponent, wins, losses)
+                if store is not None:
+                    store.record_matchups(
+                        battle_format,
+                        [
+                            (player, opponent, wins, battles),
+                            (opponent, player, losses, battles),
+                        ],
+                    )
+            engine.fit()
+    if latency_directory is not None:
+        merge_latency_histograms(latency_directory, latency_histograms)
+    return engine
+
+
+# Entry, cli name and position in the entry of the players of the cli agents
+def get_players(
+    agent_names: List[str], battle_format: str
+) -> Dict[str, Tuple[int, str, int]]:
+    players = {}
+    for entry, agent_name, copy in get_entries(agent_names):
+        for member in range(count_agents(agent_name, battle_format)):
+            players[get_player_key(agent_name, copy, member, battle_format)] = (
+                entry,
+                agent_name,
+                member,
+            )
+    return players
+
+
+def play_pair(
+    player: Tuple[int, str, int],
+    opponent: Tuple[int, str, int],
+    battle_format: str,
+    battles: int,
+    max_concurrent_battles: int,
+) -> Tuple[int, int, int]:
+    return asyncio.get_event_loop().run_until_complete(
+        _play_pair(player, opponent, battle_format, battles, max_concurrent_battles)
+    )
+
+
+async def _play_pair(player, opponent, battle_format, battles, max_concurrent_battles):
+    p_1 = _get_player(*player, battle_format, max_concurrent_battles)
+    p_2 = _get_player(*opponent, battle_format, max_concurrent_battles)
+    p_1.reset_battles()
+    p_2.reset_battles()
+    await asyncio.gather(
+        p_1.send_challenges(to_id_str(p_2.username), battles, to_wait=p_2.logged_in),
+        p_2.accept_challenges(to_id_str(p_1.username), battles),
+    )
+    if _LATENCY_DIRECTORY is not None:
+        export_latency_histograms(
+            os.path.join(_LATENCY_DIRECTORY, f"{os.getpid()}.json")
+        )
+    return p_1.n_won_battles, p_2.n_won_battles, p_1.n_finished_battles
+
+
+def _get_player(entry, agent_name, member, battle_format, max_concurrent_battles):
+    if entry not in _PLAYERS.keys():
+        # Processes sharing a server need different usernames
+        _PLAYERS[entry] = create_agent(
+            agent_name,
+            battle_format,
+            get_player_configurations(
+                f"Match{_WORKER}-{entry}", agent_name, battle_format
+            ),
+            _SERVER_CONFIGURATION,
+            False,
+            False,
+            max_concurrent_battles,
+        )
+        # Copies of the same agent share their histograms
+        if _LATENCY_DIRECTORY is not None:
+            for i, agent in enumerate(_PLAYERS[entry]):
+                instrument_player(agent, get_player_key(agent_name, member=i))
+    return _PLAYERS[entry][member]
+
+
+def _init_worker(configurations, latency_directory=None):
+    global _WORKER, _SERVER_CONFIGURATION, _LATENCY_DIRECTORY
+    _WORKER, _SERVER_CONFIGURATION = configurations.get()
+    _LATENCY_DIRECTORY = latency_directory
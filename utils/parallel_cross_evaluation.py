@@ -0,0 +1,313 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Cross evaluation of agents with the matchups shared by a pool of processes
+import asyncio
+import math
+import multiprocessing
+import os
+import tempfile
+
+from collections import Counter
+from concurrent.futures import as_completed, ProcessPoolExecutor
+from itertools import combinations
+from poke_env.data import to_id_str
+from poke_env.server_configuration import (
+    LocalhostServerConfiguration,
+    ServerConfiguration,
+)
+from typing import Dict, List, Optional, Tuple
+
+from .close_player import close_player
+from .create_agent import create_agent, get_player_configurations, loads_several_agents
+from .decision_latency import (
+    export_latency_histograms,
+    instrument_player,
+    merge_latency_histograms,
+)
+from .player_evaluation import is_settled, sequential_compare_players
+from .result_store import get_player_key, ResultStore
+
+# Server used by the players of this process, chosen when the worker starts
+_SERVER_CONFIGURATION: ServerConfiguration = LocalhostServerConfiguration
+# Directory where the process saves the latency of its agents, if measured
+_LATENCY_DIRECTORY: Optional[str] = None
+
+
+def parallel_cross_evaluate(
+    agent_names: List[str],
+    battle_format: str,
+    challenges: int,
+    workers: int = 2,
+    server_configurations: Optional[List[ServerConfiguration]] = None,
+    max_concurrent_battles: int = 30,
+    store: Optional[ResultStore] = None,
+    latency_histograms: Optional[str] = None,
+    settle_batch: Optional[int] = None,
+) -> Dict[str, Dict[str, Optional[float]]]:
+    if workers < 1:
+        raise ValueError(f"Expected at least one worker. Got {workers}")
+    if settle_batch is not None and settle_batch <= 0:
+        raise ValueError(f"Expected a positive batch size. Got {settle_batch}")
+    if not server_configurations:
+        server_configurations = [LocalhostServerConfiguration]
+    entries = get_entries(agent_names)
+    played = store.played_battles(battle_format) if store is not None else {}
+    if store is not None and settle_batch is not None:
+        # Pairs already told apart are not played again when resuming
+        played.update(
+            {
+                key: challenges
+                for key, (wins, battles) in store.matchup_results(battle_format).items()
+                if is_settled(wins, battles, math.ceil(challenges / settle_batch))
+            }
+        )
+    jobs = []
+    for i, j in get_matchups(agent_names):
+        sides = [entries[entry] for entry in sorted({i, j})]
+        if _is_finished(sides, played, challenges, battle_format):
+            continue
+        jobs.append(sides)
+    context = multiprocessing.get_context("spawn")
+    configurations = context.Queue()
+    for i in range(workers):
+        configurations.put(server_configurations[i % len(server_configurations)])
+    classes, results = {}, {}
+    latency_directory = None
+    if latency_histograms is not None:
+        latency_directory = tempfile.mkdtemp()
+    with ProcessPoolExecutor(
+        workers,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(configurations, latency_directory),
+    ) as pool:
+        futures = [
+            pool.submit(
+                play_matchup,
+                job,
+                sides,
+                battle_format,
+                challenges,
+                max_concurrent_battles,
+                played,
+                settle_batch,
+            )
+            for job, sides in enumerate(jobs)
+        ]
+        for future in as_completed(futures):
+            matchup_classes, matchup_results = future.result()
+            classes.update(matchup_classes)
+            results.update(matchup_results)
+            if store is not None:
+                store.record_matchups(
+                    battle_format,
+                    [
+                        (
+                            _get_key(entries, player, battle_format),
+                            _get_key(entries, opponent, battle_format),
+                            wins,
+                            battles,
+                        )
+                        for (player, opponent), (
+                            wins,
+                            battles,
+                        ) in matchup_results.items()
+                    ],
+                )
+    if latency_directory is not None:
+        merge_latency_histograms(latency_directory, latency_histograms)
+    if store is None:
+        return merge_matchup_results(classes, results)
+    players = []
+    for entry, agent_name, copy in entries:
+        if not loads_several_agents(agent_name):
+            players.append(get_player_key(agent_name, copy, 0, battle_format))
+            continue
+        members = sorted(member for e, member in classes.keys() if e == entry)
+        players.extend(
+            get_player_key(agent_name, copy, member, battle_format)
+            for member in members
+        )
+    return store.cross_evaluation(battle_format, players)
+
+
+# Agents of the cli with the number of their copy, used to name them in a store
+def get_entries(agent_names: List[str]) -> List[Tuple[int, str, int]]:
+    copies = Counter()
+    entries = []
+    for entry, agent_name in enumerate(agent_names):
+        copies[agent_name] += 1
+        entries.append((entry, agent_name, copies[agent_name]))
+    return entries
+
+
+def get_matchups(agent_names: List[str]) -> List[Tuple[int, int]]:
+    matchups = []
+    for i, agent_name in enumerate(agent_names):
+        # Only the agents loading a whole model folder play among themselves
+        if loads_several_agents(agent_name):
+            matchups.append((i, i))
+        matchups.extend((i, j) for j in range(i + 1, len(agent_names)))
+    return matchups
+
+
+def merge_matchup_results(
+    classes: Dict[Tuple[int, int], str],
+    results: Dict[Tuple[Tuple[int, int], Tuple[int, int]], Tuple[int, int]],
+) -> Dict[str, Dict[str, Optional[float]]]:
+    # Name the players as a sequential cross evaluation in a single process would
+    counter = Counter()
+    names = {}
+    for player in sorted(classes.keys()):
+        counter[classes[player]] += 1
+        names[player] = f"{classes[player]} {counter[classes[player]]}"
+    evaluation = {
+        names[player]: {names[opponent]: None for opponent in sorted(names.keys())}
+        for player in sorted(names.keys())
+    }
+    for (player, opponent), (wins, battles) in results.items():
+        if battles > 0:
+            evaluation[names[player]][names[opponent]] = wins / battles
+    return evaluation
+
+
+def play_matchup(
+    job: int,
+    entries: List[Tuple[int, str, int]],
+    battle_format: str,
+    challenges: int,
+    max_concurrent_battles: int,
+    played: Optional[Dict[Tuple[str, str], int]] = None,
+    settle_batch: Optional[int] = None,
+) -> Tuple[Dict, Dict]:
+    return asyncio.get_event_loop().run_until_complete(
+        _play_matchup(
+            job,
+            entries,
+            battle_format,
+            challenges,
+            max_concurrent_battles,
+            played,
+            settle_batch,
+        )
+    )
+
+
+async def _play_matchup(
+    job,
+    entries,
+    battle_format,
+    challenges,
+    max_concurrent_battles,
+    played=None,
+    settle_batch=None,
+):
+    if played is None:
+        played = {}
+    players = {}
+    for side, (entry, agent_name, _) in enumerate(entries):
+        # Matchups running at the same time on a server need different usernames
+        player_configurations = get_player_configurations(
+            f"Cross{job}-{'ab'[side]}", agent_name, battle_format
+        )
+        agents = create_agent(
+            agent_name,
+            battle_format,
+            player_configurations,
+            _SERVER_CONFIGURATION,
+            False,
+            False,
+            max_concurrent_battles,
+        )
+        for member, agent in enumerate(agents):
+            players[(entry, member)] = agent
+            # Copies of the same agent share their histograms
+            if _LATENCY_DIRECTORY is not None:
+                instrument_player(agent, get_player_key(agent_name, member=member))
+    if len(entries) == 1:
+        pairs = list(combinations(players.keys(), 2))
+    else:
+        pairs = [
+            (player, opponent)
+            for player in players.keys()
+            if player[0] == entries[0][0]
+            for opponent in players.keys()
+            if opponent[0] == entries[1][0]
+        ]
+    results = {}
+    try:
+        for player, opponent in pairs:
+            key = (
+                _get_key(entries, player, battle_format),
+                _get_key(entries, opponent, battle_format),
+            )
+            battles = challenges - played.get(key, 0)
+            if battles <= 0:
+                continue
+            p_1, p_2 = players[player], players[opponent]
+            if settle_batch is not None:
+                # Stop the pair as soon as one agent is better with 95% confidence over
+                # all the checks
+                await sequential_compare_players(p_1, p_2, battles, settle_batch)
+            else:
+                await asyncio.gather(
+                    p_1.send_challenges(
+                        to_id_str(p_2.username), battles, to_wait=p_2.logged_in
+                    ),
+                    p_2.accept_challenges(to_id_str(p_1.username), battles),
+                )
+            results[(player, opponent)] = (p_1.n_won_battles, p_1.n_finished_battles)
+            results[(opponent, player)] = (p_2.n_won_battles, p_2.n_finished_battles)
+            p_1.reset_battles()
+            p_2.reset_battles()
+    finally:
+        for agent in players.values():
+            close_player(agent)
+        if _LATENCY_DIRECTORY is not None:
+            export_latency_histograms(
+                os.path.join(_LATENCY_DIRECTORY, f"{os.getpid()}.json")
+            )
+    classes = {key: type(agent).__name__ for key, agent in players.items()}
+    return classes, results
+
+
+def _get_key(entries, player, battle_format) -> str:
+    entry, member = player
+    for e, agent_name, copy in entries:
+        if e == entry:
+            return get_player_key(agent_name, copy, member, battle_format)
+    raise ValueError(f"Entry {entry} is not part of the matchup")
+
+
+def _is_finished(sides, played, challenges, battle_format) -> bool:
+    # Matchups with agents of a whole model folder are checked by the workers
+    if any(loads_several_agents(agent_name) for _, agent_name, _ in sides):
+        return False
+    if len(sides) < 2:
+        return True
+    keys = tuple(
+        get_player_key(agent_name, copy, 0, battle_format)
+        for _, agent_name, copy in sides
+    )
+    return played.get(keys, 0) >= challenges
+
+
+def _init_worker(configurations, latency_directory=None):
+    global _SERVER_CONFIGURATION, _LATENCY_DIRECTORY
+    _SERVER_CONFIGURATION = configurations.get()
+    _LATENCY_DIRECTORY = latency_directory
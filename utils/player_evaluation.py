@@ -0,0 +1,183 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Evaluation of a player against the poke_env baselines reusing the same opponents
+import math
+
+from statistics import NormalDist
+from poke_env.player.player import Player
+from poke_env.player.utils import (
+    _EVALUATION_RATINGS,  # noqa used to evaluate against the same baselines
+    _estimate_strength_from_results,  # noqa used to evaluate against the same baselines
+)
+from poke_env.player_configuration import PlayerConfiguration
+from poke_env.server_configuration import (
+    LocalhostServerConfiguration,
+    ServerConfiguration,
+)
+from typing import List, Optional, Tuple
+
+
+def create_baselines(
+    max_concurrent_battles: int,
+    username_prefix: Optional[str] = None,
+    server_configuration: ServerConfiguration = LocalhostServerConfiguration,
+) -> List[Player]:
+    baselines = []
+    for baseline_class in _EVALUATION_RATINGS:
+        player_configuration = None
+        if username_prefix is not None:
+            player_configuration = PlayerConfiguration(
+                f"{username_prefix}{baseline_class.__name__}"[:18], None
+            )
+        baselines.append(
+            baseline_class(
+                player_configuration=player_configuration,
+                server_configuration=server_configuration,
+                max_concurrent_battles=max_concurrent_battles,
+            )
+        )
+    return baselines
+
+
+async def evaluate_against_baselines(
+    player: Player,
+    baselines: List[Player],
+    n_battles: int = 1000,
+    n_placement_battles: int = 30,
+) -> Tuple[float, Tuple[float, float]]:
+    if n_placement_battles * len(baselines) > n_battles // 2:
+        n_placement_battles = n_battles // len(baselines) // 2
+    if n_placement_battles <= 0:
+        raise ValueError(f"{n_battles} battles are not enough to evaluate a player")
+    player.reset_battles()
+    for baseline in baselines:
+        baseline.reset_battles()
+    for baseline in baselines:
+        await baseline.battle_against(player, n_placement_battles)
+    best_opponent = min(
+        baselines,
+        key=lambda p: (abs(p.win_rate - 0.5), -_EVALUATION_RATINGS[type(p)]),
+    )
+    remaining_battles = n_battles - len(baselines) * n_placement_battles
+    await best_opponent.battle_against(player, remaining_battles)
+    return _estimate_strength_from_results(
+        best_opponent.n_finished_battles,
+        best_opponent.n_lost_battles,
+        _EVALUATION_RATINGS[type(best_opponent)],
+    )
+
+
+async def sequential_evaluate_against_baselines(
+    player: Player,
+    baselines: List[Player],
+    max_battles: int = 1000,
+    n_placement_battles: int = 30,
+    batch_size: int = 100,
+    max_relative_width: float = 0.25,
+) -> Tuple[float, Tuple[float, float]]:
+    if n_placement_battles * len(baselines) > max_battles // 2:
+        n_placement_battles = max_battles // len(baselines) // 2
+    if n_placement_battles <= 0:
+        raise ValueError(f"{max_battles} battles are not enough to evaluate a player")
+    if batch_size <= 0:
+        raise ValueError(f"Expected a positive batch size. Got {batch_size}")
+    player.reset_battles()
+    for baseline in baselines:
+        baseline.reset_battles()
+    for baseline in baselines:
+        await baseline.battle_against(player, n_placement_battles)
+    best_opponent = min(
+        baselines,
+        key=lambda p: (abs(p.win_rate - 0.5), -_EVALUATION_RATINGS[type(p)]),
+    )
+    remaining_battles = max_battles - len(baselines) * n_placement_battles
+    while remaining_battles > 0:
+        battles = min(batch_size, remaining_battles)
+        await best_opponent.battle_against(player, battles)
+        remaining_battles -= battles
+        try:
+            evaluation = _estimate_strength_from_results(
+                best_opponent.n_finished_battles,
+                best_opponent.n_lost_battles,
+                _EVALUATION_RATINGS[type(best_opponent)],
+            )
+        except ValueError:
+            continue
+        if relative_interval_width(evaluation) <= max_relative_width:
+            return evaluation
+    return _estimate_strength_from_results(
+        best_opponent.n_finished_battles,
+        best_opponent.n_lost_battles,
+        _EVALUATION_RATINGS[type(best_opponent)],
+    )
+
+
+async def sequential_compare_players(
+    player_1: Player,
+    player_2: Player,
+    max_battles: int = 1000,
+    batch_size: int = 100,
+) -> Tuple[float, Tuple[float, float], int]:
+    if batch_size <= 0:
+        raise ValueError(f"Expected a positive batch size. Got {batch_size}")
+    player_1.reset_battles()
+    player_2.reset_battles()
+    checks = math.ceil(max_battles / batch_size)
+    remaining_battles = max_battles
+    while remaining_battles > 0:
+        battles = min(batch_size, remaining_battles)
+        await player_1.battle_against(player_2, battles)
+        remaining_battles -= battles
+        if is_settled(player_1.n_won_battles, player_1.n_finished_battles, checks):
+            break
+    win_rate, interval = win_rate_interval(
+        player_1.n_won_battles, player_1.n_finished_battles
+    )
+    return win_rate, interval, player_1.n_finished_battles
+
+
+# Whether one of the players is better than the other with 95% confidence over all
+# the checks of a sequential comparison, splitting the error among them (Bonferroni)
+def is_settled(wins: int, battles: int, checks: int = 1) -> bool:
+    _, (lower_bound, upper_bound) = win_rate_interval(wins, battles, 1 - 0.05 / checks)
+    return lower_bound > 0.5 or upper_bound < 0.5
+
+
+# Wilson score interval, which unlike the normal one keeps a width at win rates of 0 or 1
+def win_rate_interval(
+    wins: int, battles: int, confidence: float = 0.95
+) -> Tuple[float, Tuple[float, float]]:
+    if battles <= 0:
+        return 0.5, (0.0, 1.0)
+    win_rate = wins / battles
+    z = NormalDist().inv_cdf(1 - (1 - confidence) / 2)
+    denominator = 1 + z**2 / battles
+    centre = (win_rate + z**2 / (2 * battles)) / denominator
+    error = (
+        z
+        * math.sqrt(win_rate * (1 - win_rate) / battles + z**2 / (4 * battles**2))
+        / denominator
+    )
+    return win_rate, (max(0.0, centre - error), min(1.0, centre + error))
+
+
+def relative_interval_width(evaluation: Tuple[float, Tuple[float, float]]) -> float:
+    estimate, (lower_bound, upper_bound) = evaluation
+    if estimate <= 0 or math.isinf(upper_bound):
+        return math.inf
+    return (upper_bound - lower_bound) / estimate
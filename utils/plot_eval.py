@@ -21,23 +21,32 @@ import os.path
 import seaborn as sns
 import time
 
+from poke_env.player.baselines import MaxBasePowerPlayer, SimpleHeuristicsPlayer
+from poke_env.player.random_player import RandomPlayer
+from poke_env.player.utils import (
+    _EVALUATION_RATINGS,
+)  # noqa same scale as evaluate_player
 
-def plot_eval(evaluations, save=False, path="./logs"):
+# Strengths of the poke_env baselines on the scale of evaluate_player
+BASELINE_STRENGTHS = {
+    "Random player": _EVALUATION_RATINGS[RandomPlayer],
+    "Max base power player": _EVALUATION_RATINGS[MaxBasePowerPlayer],
+    "Simple heuristics player": _EVALUATION_RATINGS[SimpleHeuristicsPlayer],
+}
+
+
+def plot_eval(evaluations, save=False, path="./logs", baselines=None):
+    if baselines is None:
+        baselines = BASELINE_STRENGTHS
     if save:
         sns.set_theme()
     else:
         sns.set_theme("talk")
     sns.set_palette("colorblind")
     main_color = sns.color_palette()[0]
-    colors = sns.color_palette()[1:4]
+    colors = sns.color_palette()[1:]
     evaluations = evaluations[1:]
-    baseline_players = [
-        "Random player",
-        "Max base power player",
-        "Simple heuristics player",
-    ]
-    baseline_values = [1, 7.665994, 128.757145]
-    for player, value, color in zip(baseline_players, baseline_values, colors):
+    for (player, value), color in zip(baselines.items(), colors):
         plt.axhline(
             value,
             label=player,
@@ -91,8 +100,9 @@ def plot_eval(evaluations, save=False, path="./logs"):
         plt.tight_layout()
         plt.savefig(file_path, backend="agg")
     else:
-        if max_value < baseline_values[2]:
-            plt.ylim(0, baseline_values[2] * 1.025)
+        max_baseline = max(baselines.values(), default=0)
+        if max_value < max_baseline:
+            plt.ylim(0, max_baseline * 1.025)
         plt.show()
 
 
@@ -0,0 +1,112 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Aggregates the telemetry logs of rank.py and plots the elo of each agent, also
+# while the ranking is still running
+import math
+import matplotlib.pyplot as plt
+import os
+import seaborn as sns
+
+from numpy import mean
+from typing import Dict, List, Optional, Tuple
+
+from .battle_telemetry import read_telemetry
+
+
+def rank_telemetry_logs(save_path: str, run: Optional[str] = None) -> List[str]:
+    logs = []
+    for file in sorted(os.listdir(save_path)):
+        if not file.startswith("rank ") or not file.endswith(".jsonl"):
+            continue
+        if run is not None and not file.endswith(f" {run}.jsonl"):
+            continue
+        logs.append(os.path.join(save_path, file))
+    return logs
+
+
+# Battles without a rating keep the previous elo
+def elo_stats(records: List[dict]) -> Tuple[List[int], List[float]]:
+    stats = [[0], [1000]]
+    for index_of_battle, record in enumerate(records, 1):
+        stats[0].append(index_of_battle)
+        rating = record["rating"]
+        stats[1].append(rating if rating is not None else stats[1][-1])
+    return stats[0], stats[1]
+
+
+def write_rank_data(telemetry: Dict[str, List[dict]], path: str):
+    with open(path, "w") as data_file:
+        data_file.write("agent;index_of_battle;elo\n")
+        for agent, records in telemetry.items():
+            for index_of_battle, elo in zip(*elo_stats(records)):
+                data_file.write(f"{agent};{index_of_battle};{elo}\n")
+
+
+def plot_rank(agent: str, records: List[dict], plot_path: str):
+    indexes, elos = elo_stats(records)
+    means = []
+    window_size = max(math.floor(math.log2(len(indexes))), 1)
+    if window_size % 2 == 0:
+        window_size += 1
+    window_half_size = (window_size - 1) // 2
+    extended_stats = [
+        *[elos[0] for _ in range(window_half_size)],
+        *elos,
+        *[elos[-1] for _ in range(window_half_size)],
+    ]
+    for i in range(len(indexes)):
+        window = extended_stats[i : i + window_size]
+        means.append(mean(window))
+    means[0] = 1000
+    sns.set_theme()
+    plt.figure(dpi=300)
+    plt.bar(
+        indexes,
+        elos,
+        alpha=0.6,
+        color=sns.color_palette("colorblind")[0],
+        zorder=1,
+    )
+    plt.plot(indexes, means, color=sns.color_palette("colorblind")[0], zorder=2)
+    plt.suptitle(f"Elo of agent {agent} during {len(records)} battles")
+    plt.title("from a new account")
+    plt.xlabel("Battles")
+    plt.ylabel("Elo")
+    plt.ylim(0, max(elos) * 1.1)
+    if len(indexes) < 10:
+        plt.gca().tick_params(axis="x", label1On=False)
+    plt.tight_layout()
+    plt.savefig(plot_path, backend="agg")
+    plt.close()
+
+
+# Plots every log next to it and merges them in data.csv, returning the records
+# of each agent
+def aggregate_rank_telemetry(
+    save_path: str, run: Optional[str] = None
+) -> Dict[str, List[dict]]:
+    telemetry = {}
+    for log in rank_telemetry_logs(save_path, run):
+        records = read_telemetry(log)
+        if len(records) == 0:
+            continue
+        agent = records[0]["agent"]
+        telemetry.setdefault(agent, []).extend(records)
+        plot_rank(agent, records, log.replace(".jsonl", ".png"))
+    write_rank_data(telemetry, os.path.join(save_path, "data.csv"))
+    return telemetry
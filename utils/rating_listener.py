@@ -0,0 +1,91 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Reads the rating updates that Showdown sends to the battle room at the end of
+# a rated battle, instead of asking the website for the new ratings
+import html
+import re
+import threading
+
+from poke_env.data.normalize import to_id_str
+from poke_env.player.player import Player
+from typing import Dict, List, Optional, Tuple
+
+RATING_PATTERN = re.compile(r"^(.+)'s rating: (\d+) &rarr; <strong>(\d+)</strong>")
+
+
+def parse_rating_update(message: str) -> Optional[Tuple[str, int, int]]:
+    match = RATING_PATTERN.match(message)
+    if match is None:
+        return None
+    username = to_id_str(html.unescape(match.group(1)))
+    return username, int(match.group(2)), int(match.group(3))
+
+
+class RatingListener:
+    def __init__(self, player: Player):
+        self.username = to_id_str(player.username)
+        self.elo: Optional[int] = None
+        self.updates = 0
+        self.history: List[int] = []
+        self.battle_ratings: Dict[str, int] = {}
+        self._condition = threading.Condition()
+        # TFPlayer battles through the player of its environment
+        player = getattr(player, "internal_agent", None) or player
+        handle_battle_message = player._handle_battle_message
+
+        async def handle_rated_battle_message(split_messages):
+            battle_tag = split_messages[0][0][1:]
+            for split_message in split_messages[1:]:
+                if len(split_message) > 2 and split_message[1] == "raw":
+                    self.receive(split_message[2], battle_tag)
+            await handle_battle_message(split_messages)
+
+        player._handle_battle_message = handle_rated_battle_message
+
+    def receive(self, message: str, battle_tag: Optional[str] = None):
+        update = parse_rating_update(message)
+        if update is None or update[0] != self.username:
+            return
+        with self._condition:
+            self.elo = update[2]
+            self.history.append(self.elo)
+            if battle_tag is not None:
+                self.battle_ratings[battle_tag] = self.elo
+            self.updates += 1
+            self._condition.notify_all()
+
+    # Waits until more than previous_updates updates are received and returns the
+    # latest elo, or None if none arrives in time
+    def wait_for_update(self, previous_updates: int, timeout: float) -> Optional[int]:
+        with self._condition:
+            if self._condition.wait_for(
+                lambda: self.updates > previous_updates, timeout
+            ):
+                return self.elo
+        return None
+
+    # Waits for count updates after previous_updates and returns their elos in
+    # arrival order, fewer if they do not arrive in time
+    def wait_for_updates(
+        self, previous_updates: int, count: int, timeout: float
+    ) -> List[int]:
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self.updates >= previous_updates + count, timeout
+            )
+            return self.history[previous_updates : previous_updates + count]
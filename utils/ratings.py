@@ -0,0 +1,201 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Bradley-Terry ratings fitted over all the stored matchup results. Each player
+# also gets a few virtual games against a player of strength 1, so that the
+# ratings stay finite for undefeated players and for sparse pairings
+import math
+import numpy as np
+
+from typing import Dict, List, Optional, Tuple
+
+from .result_store import ResultStore
+
+# Elo scale: a player 400 points above another is expected to win 10 times as often
+ELO_SCALE = 400 / math.log(10)
+ELO_OFFSET = 1000
+
+
+class RatingEngine:
+    def __init__(
+        self,
+        prior_games: float = 2.0,
+        anchor: Optional[str] = None,
+        confidence: float = 1.96,
+    ):
+        if prior_games <= 0:
+            raise ValueError(
+                f"Expected a positive number of prior games. Got {prior_games}"
+            )
+        self.prior_games = prior_games
+        self.anchor = anchor
+        self.confidence = confidence
+        self.players: List[str] = []
+        self._indexes: Dict[str, int] = {}
+        self.wins = np.zeros((0, 0))
+        self.log_strengths = np.zeros(0)
+        self.covariance = np.zeros((0, 0))
+
+    @classmethod
+    def from_store(
+        cls, store: ResultStore, battle_format: str, **kwargs
+    ) -> "RatingEngine":
+        engine = cls(**kwargs)
+        for (player, opponent), (wins, _) in store.matchup_results(
+            battle_format
+        ).items():
+            engine.add_results(player, opponent, wins)
+        return engine.fit()
+
+    def add_player(self, player: str) -> int:
+        if player not in self._indexes.keys():
+            self._indexes[player] = len(self.players)
+            self.players.append(player)
+            self.wins = np.pad(self.wins, ((0, 1), (0, 1)))
+            self.log_strengths = np.append(self.log_strengths, 0.0)
+        return self._indexes[player]
+
+    # Results only count the wins of player against opponent: ties are ignored
+    def add_results(self, player: str, opponent: str, wins: int, losses: int = 0):
+        if player == opponent:
+            raise ValueError(f"{player} cannot be rated against itself")
+        i, j = self.add_player(player), self.add_player(opponent)
+        self.wins[i, j] += wins
+        self.wins[j, i] += losses
+
+    # Newton's method on the log-strengths, starting from the previous fit
+    def fit(self, max_iterations: int = 100, tolerance: float = 1e-9) -> "RatingEngine":
+        theta = self.log_strengths
+        likelihood = self._log_likelihood(theta)
+        hessian = self._hessian(theta)
+        for _ in range(max_iterations):
+            step = np.linalg.solve(hessian, self._gradient(theta))
+            new_likelihood = self._log_likelihood(theta + step)
+            while new_likelihood < likelihood and np.abs(step).max() > tolerance:
+                step /= 2
+                new_likelihood = self._log_likelihood(theta + step)
+            theta = theta + step
+            likelihood = new_likelihood
+            hessian = self._hessian(theta)
+            if np.abs(step).max() <= tolerance:
+                break
+        self.log_strengths = theta
+        self.covariance = np.linalg.inv(hessian)
+        return self
+
+    # Strength of each player with its confidence interval, on the scale where
+    # the anchor (or the virtual prior opponent) has strength 1
+    def ratings(self) -> Dict[str, Tuple[float, Tuple[float, float]]]:
+        log_ratings, deviations = self._relative_log_strengths()
+        with np.errstate(over="ignore"):
+            strengths = np.exp(log_ratings)
+            lower_bounds = np.exp(log_ratings - self.confidence * deviations)
+            upper_bounds = np.exp(log_ratings + self.confidence * deviations)
+        return {
+            player: (float(strength), (float(lower_bound), float(upper_bound)))
+            for player, strength, lower_bound, upper_bound in zip(
+                self.players, strengths, lower_bounds, upper_bounds
+            )
+        }
+
+    def elo_ratings(self) -> Dict[str, Tuple[float, Tuple[float, float]]]:
+        log_ratings, deviations = self._relative_log_strengths()
+        return {
+            player: (
+                float(ELO_OFFSET + ELO_SCALE * log_rating),
+                (
+                    float(
+                        ELO_OFFSET
+                        + ELO_SCALE * (log_rating - self.confidence * deviation)
+                    ),
+                    float(
+                        ELO_OFFSET
+                        + ELO_SCALE * (log_rating + self.confidence * deviation)
+                    ),
+                ),
+            )
+            for player, log_rating, deviation in zip(
+                self.players, log_ratings, deviations
+            )
+        }
+
+    # Win rates of the decisive battles, in the format of a cross evaluation
+    def win_rates(
+        self, players: Optional[List[str]] = None
+    ) -> Dict[str, Dict[str, Optional[float]]]:
+        if players is None:
+            players = self.players
+        evaluation = {}
+        for player in players:
+            evaluation[player] = {}
+            for opponent in players:
+                i, j = self._indexes[player], self._indexes[opponent]
+                games = self.wins[i, j] + self.wins[j, i]
+                evaluation[player][opponent] = (
+                    float(self.wins[i, j] / games) if games > 0 else None
+                )
+        return evaluation
+
+    # Ratings in the format expected by plot_eval
+    def evaluations(self, players: Optional[List[str]] = None) -> List[List]:
+        ratings = self.ratings()
+        if players is None:
+            players = self.players
+        return [["Player", "Evaluation"]] + [
+            [player, ratings[player]] for player in players if player in ratings
+        ]
+
+    # Point strengths, used as the baselines of the plotted evaluations
+    def strengths(self, players: Optional[List[str]] = None) -> Dict[str, float]:
+        ratings = self.ratings()
+        if players is None:
+            players = self.players
+        return {player: ratings[player][0] for player in players if player in ratings}
+
+    def _relative_log_strengths(self) -> Tuple[np.ndarray, np.ndarray]:
+        variances = np.diag(self.covariance)
+        if self.anchor is None or self.anchor not in self._indexes.keys():
+            return self.log_strengths, np.sqrt(variances)
+        a = self._indexes[self.anchor]
+        variances = variances + variances[a] - 2 * self.covariance[:, a]
+        return (
+            self.log_strengths - self.log_strengths[a],
+            np.sqrt(np.maximum(variances, 0)),
+        )
+
+    def _log_likelihood(self, theta: np.ndarray) -> float:
+        differences = theta[:, None] - theta[None, :]
+        likelihood = -np.sum(self.wins * np.logaddexp(0, -differences))
+        prior = np.logaddexp(0, -theta) + np.logaddexp(0, theta)
+        return likelihood - self.prior_games / 2 * np.sum(prior)
+
+    def _gradient(self, theta: np.ndarray) -> np.ndarray:
+        probabilities = _sigmoid(theta[:, None] - theta[None, :])
+        games = self.wins + self.wins.T
+        gradient = self.wins.sum(axis=1) - np.sum(games * probabilities, axis=1)
+        return gradient + self.prior_games * (0.5 - _sigmoid(theta))
+
+    # Negated hessian of the log-likelihood, positive definite thanks to the prior
+    def _hessian(self, theta: np.ndarray) -> np.ndarray:
+        probabilities = _sigmoid(theta[:, None] - theta[None, :])
+        information = (self.wins + self.wins.T) * probabilities * (1 - probabilities)
+        prior = self.prior_games * _sigmoid(theta) * (1 - _sigmoid(theta))
+        return np.diag(information.sum(axis=1) + prior) - information
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 0.5 * (1 + np.tanh(x / 2))
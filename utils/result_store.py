@@ -0,0 +1,251 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# On-disk store of evaluation results, appended as soon as they are available so
+# that interrupted or extended tournaments only play what is missing
+import hashlib
+import os
+import sqlite3
+import time
+
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .create_agent import get_model_paths, loads_several_agents
+
+# Hexadecimal digits of the model digest added to the keys of the players
+FINGERPRINT_LENGTH = 10
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS matchups (
+    battle_format TEXT NOT NULL,
+    player TEXT NOT NULL,
+    opponent TEXT NOT NULL,
+    wins INTEGER NOT NULL,
+    battles INTEGER NOT NULL,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS matchups_pair ON matchups (battle_format, player, opponent);
+CREATE TABLE IF NOT EXISTS evaluations (
+    battle_format TEXT NOT NULL,
+    player TEXT NOT NULL,
+    challenges INTEGER NOT NULL,
+    estimate REAL NOT NULL,
+    lower_bound REAL NOT NULL,
+    upper_bound REAL NOT NULL,
+    recorded_at REAL NOT NULL,
+    max_relative_width REAL
+);
+CREATE INDEX IF NOT EXISTS evaluations_player ON evaluations (battle_format, player);
+"""
+
+
+class ResultStore:
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(_SCHEMA)
+        # Databases created before the evaluations recorded their interval width
+        columns = [
+            row[1] for row in self.connection.execute("PRAGMA table_info(evaluations)")
+        ]
+        if "max_relative_width" not in columns:
+            with self.connection:
+                self.connection.execute(
+                    "ALTER TABLE evaluations ADD COLUMN max_relative_width REAL"
+                )
+
+    def record_matchups(
+        self, battle_format: str, results: Iterable[Tuple[str, str, int, int]]
+    ):
+        recorded_at = time.time()
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO matchups VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (battle_format, player, opponent, wins, battles, recorded_at)
+                    for player, opponent, wins, battles in results
+                ],
+            )
+
+    def played_battles(self, battle_format: str) -> Dict[Tuple[str, str], int]:
+        rows = self.connection.execute(
+            "SELECT player, opponent, SUM(battles) FROM matchups "
+            "WHERE battle_format = ? GROUP BY player, opponent",
+            (battle_format,),
+        )
+        return {(player, opponent): battles for player, opponent, battles in rows}
+
+    def matchup_results(self, battle_format: str) -> Dict[Tuple[str, str], Tuple]:
+        rows = self.connection.execute(
+            "SELECT player, opponent, SUM(wins), SUM(battles) FROM matchups "
+            "WHERE battle_format = ? GROUP BY player, opponent ORDER BY MIN(rowid)",
+            (battle_format,),
+        )
+        return {
+            (player, opponent): (wins, battles)
+            for player, opponent, wins, battles in rows
+        }
+
+    def cross_evaluation(
+        self, battle_format: str, players: Optional[List[str]] = None
+    ) -> Dict[str, Dict[str, Optional[float]]]:
+        results = self.matchup_results(battle_format)
+        if players is None:
+            players = list(dict.fromkeys(player for player, _ in results.keys()))
+        evaluation = {
+            player: {opponent: None for opponent in players} for player in players
+        }
+        for (player, opponent), (wins, battles) in results.items():
+            if player in evaluation.keys() and opponent in evaluation.keys():
+                evaluation[player][opponent] = wins / battles if battles > 0 else None
+        return evaluation
+
+    def record_evaluation(
+        self,
+        battle_format: str,
+        player: str,
+        challenges: int,
+        evaluation: Tuple[float, Tuple[float, float]],
+        max_relative_width: Optional[float] = None,
+    ):
+        estimate, (lower_bound, upper_bound) = evaluation
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO evaluations (battle_format, player, challenges, "
+                "estimate, lower_bound, upper_bound, recorded_at, max_relative_width) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    battle_format,
+                    player,
+                    challenges,
+                    estimate,
+                    lower_bound,
+                    upper_bound,
+                    time.time(),
+                    max_relative_width,
+                ),
+            )
+
+    # With challenges, only an evaluation played with the same challenges and the
+    # same interval width, or none for a fixed number of battles, is returned
+    def evaluation(
+        self,
+        battle_format: str,
+        player: str,
+        challenges: Optional[int] = None,
+        max_relative_width: Optional[float] = None,
+    ) -> Optional[Tuple[float, Tuple[float, float]]]:
+        query = (
+            "SELECT estimate, lower_bound, upper_bound FROM evaluations "
+            "WHERE battle_format = ? AND player = ?"
+        )
+        parameters = [battle_format, player]
+        if challenges is not None:
+            query += " AND challenges = ? AND max_relative_width IS ?"
+            parameters.extend([challenges, max_relative_width])
+        row = self.connection.execute(
+            query + " ORDER BY rowid DESC LIMIT 1", parameters
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], (row[1], row[2])
+
+    # Latest evaluation of each player, in the format expected by plot_eval
+    def evaluations(
+        self, battle_format: str, players: Optional[List[str]] = None
+    ) -> List[List]:
+        if players is None:
+            rows = self.connection.execute(
+                "SELECT player FROM evaluations WHERE battle_format = ? "
+                "GROUP BY player ORDER BY MIN(rowid)",
+                (battle_format,),
+            )
+            players = [row[0] for row in rows]
+        results = [["Player", "Evaluation"]]
+        for player in players:
+            evaluation = self.evaluation(battle_format, player)
+            if evaluation is not None:
+                results.append([player, evaluation])
+        return results
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+# Name identifying a cli agent across runs: copies of the same agent are numbered
+# and the agents loaded from a whole model folder are told apart by their position.
+# With the battle format, the agents loaded from a model are also told apart by its
+# fingerprint, so that retrained or reordered models are not mistaken for old ones
+def get_player_key(
+    agent_name: str,
+    copy: int = 1,
+    member: int = 0,
+    battle_format: Optional[str] = None,
+) -> str:
+    key = agent_name if copy == 1 else f"{agent_name} ({copy})"
+    if loads_several_agents(agent_name):
+        key = f"{key}/{member + 1}"
+    if battle_format is not None:
+        try:
+            model_paths = get_model_paths(agent_name, battle_format)
+        except FileNotFoundError:
+            model_paths = []
+        if member < len(model_paths):
+            fingerprint = get_model_fingerprint(model_paths[member])
+            if fingerprint is not None:
+                key = f"{key} #{fingerprint}"
+    return key
+
+
+# Digest of the contents of a model file or folder
+def get_model_fingerprint(path: str) -> Optional[str]:
+    if os.path.isfile(path):
+        files = [path]
+    elif os.path.isdir(path):
+        files = sorted(
+            os.path.join(root, file)
+            for root, _, folder_files in os.walk(path)
+            for file in folder_files
+        )
+    else:
+        return None
+    digest = hashlib.sha1()
+    for file in files:
+        status = os.stat(file)
+        digest.update(os.path.relpath(file, path).encode())
+        digest.update(_file_digest(file, status.st_size, status.st_mtime_ns))
+    return digest.hexdigest()[:FINGERPRINT_LENGTH]
+
+
+# Size and modification time only invalidate the cache of unchanged files
+@lru_cache(None)
+def _file_digest(path: str, size: int, modification_time: int) -> bytes:
+    digest = hashlib.sha1()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.digest()
@@ -21,6 +21,7 @@ import os
 import pickle
 
 from agents.base_classes.trainable_player import TrainablePlayer
+from utils.create_agent import get_model_folder, UnsupportedAgentType
 
 
 def update_model(agent: TrainablePlayer, model_path):
@@ -28,15 +29,11 @@ def update_model(agent: TrainablePlayer, model_path):
     current_time_string = current_time.strftime("%d-%m-%Y %H-%M-%S")
     agent_name = agent.__class__.__name__
     save_path = model_path
-    if agent_name == "SimpleRLAgent":
-        folder_name = "simpleRL"
-    elif agent_name == "ExpertRLAgent":
-        folder_name = "expertRL"
-    elif agent_name == "SarsaStark":
-        folder_name = "SarsaStark"
-    elif agent_name == "ExpertSarsaStark":
-        folder_name = "expertSarsaStark"
-    else:
+    try:
+        if not isinstance(agent, TrainablePlayer):
+            raise UnsupportedAgentType(f"{agent_name} is not trainable")
+        folder_name = get_model_folder(agent_name)
+    except UnsupportedAgentType:
         raise RuntimeError(f"{agent_name} is not a valid trainable agent")
     save_path = os.path.join(
         save_path, folder_name, agent.b_format, f"updated {current_time_string}.pokeai"
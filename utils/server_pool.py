@@ -0,0 +1,146 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Pool of local Pokémon Showdown servers sharing the battles of training and evaluation
+import os
+import socket
+import subprocess
+import time
+
+from poke_env.server_configuration import (
+    LocalhostServerConfiguration,
+    ServerConfiguration,
+)
+from typing import List, Optional
+
+SHOWDOWN_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "pokemon-showdown"
+)
+
+
+def get_server_configuration(port: int) -> ServerConfiguration:
+    return ServerConfiguration(
+        f"localhost:{port}", LocalhostServerConfiguration.authentication_url
+    )
+
+
+class ShowdownServerPool:
+    def __init__(
+        self,
+        servers: int = 1,
+        first_port: int = 8000,
+        launch: bool = True,
+        showdown_path: str = SHOWDOWN_PATH,
+        startup_timeout: float = 60.0,
+    ):
+        if servers < 1:
+            raise ValueError(f"Expected at least one server. Got {servers}")
+        self.ports = [first_port + i for i in range(servers)]
+        self.showdown_path = showdown_path
+        self.startup_timeout = startup_timeout
+        self.processes: List[Optional[subprocess.Popen]] = [None for _ in self.ports]
+        self.next_server = 0
+        if launch:
+            for i in range(servers):
+                self._launch(i)
+        try:
+            self.wait_until_healthy()
+        except Exception:
+            self.close()
+            raise
+
+    @property
+    def server_configurations(self) -> List[ServerConfiguration]:
+        return [get_server_configuration(port) for port in self.ports]
+
+    def next_server_configuration(self) -> ServerConfiguration:
+        port = self.ports[self.next_server]
+        self.next_server = (self.next_server + 1) % len(self.ports)
+        return get_server_configuration(port)
+
+    def is_healthy(self, server: int) -> bool:
+        process = self.processes[server]
+        if process is not None and process.poll() is not None:
+            return False
+        try:
+            with socket.create_connection(("localhost", self.ports[server]), 1):
+                return True
+        except OSError:
+            return False
+
+    def unhealthy_servers(self) -> List[int]:
+        return [i for i in range(len(self.ports)) if not self.is_healthy(i)]
+
+    def wait_until_healthy(self, timeout: Optional[float] = None):
+        if timeout is None:
+            timeout = self.startup_timeout
+        deadline = time.monotonic() + timeout
+        unhealthy = self.unhealthy_servers()
+        while len(unhealthy) > 0:
+            for server in unhealthy:
+                process = self.processes[server]
+                if process is not None and process.poll() is not None:
+                    raise RuntimeError(
+                        f"Showdown server on port {self.ports[server]} exited with "
+                        f"code {process.returncode}"
+                    )
+            if time.monotonic() > deadline:
+                ports = ", ".join(str(self.ports[server]) for server in unhealthy)
+                raise TimeoutError(f"Showdown servers on ports {ports} did not start")
+            time.sleep(0.5)
+            unhealthy = self.unhealthy_servers()
+
+    def restart(self, server: int):
+        self._stop(server)
+        self._launch(server)
+        self.wait_until_healthy()
+
+    def close(self):
+        for server in range(len(self.ports)):
+            self._stop(server)
+
+    def _launch(self, server: int):
+        self.processes[server] = subprocess.Popen(
+            [
+                "node",
+                "pokemon-showdown",
+                "start",
+                "--no-security",
+                str(self.ports[server]),
+            ],
+            cwd=self.showdown_path,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def _stop(self, server: int):
+        process = self.processes[server]
+        if process is None:
+            return
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        self.processes[server] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,93 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Mixed-radix encoding of discrete states into a single integer
+import numpy as np
+
+from typing import Iterable, Sequence, Tuple
+
+
+class StateEncoder:
+    def __init__(self, ranges: Iterable[Tuple[int, int]]):
+        self.ranges = tuple((int(low), int(high)) for low, high in ranges)
+        for low, high in self.ranges:
+            if high < low:
+                raise ValueError(f"Invalid feature range ({low}, {high})")
+        self.radices = tuple(high - low + 1 for low, high in self.ranges)
+        self._lows = np.array([low for low, _ in self.ranges], dtype=np.int64)
+        self._highs = np.array([high for _, high in self.ranges], dtype=np.int64)
+        self._place_values = np.ones(len(self.ranges), dtype=np.int64)
+        for feature in range(len(self.ranges) - 2, -1, -1):
+            self._place_values[feature] = (
+                self._place_values[feature + 1] * self.radices[feature + 1]
+            )
+
+    # With clamp the features out of range take the closest value of their range, so
+    # that an agent choosing a move never fails on an unexpected battle
+    def encode(self, state: Sequence[int], clamp: bool = False) -> int:
+        if len(state) != len(self.ranges):
+            raise ValueError(
+                f"Expected a state with {len(self.ranges)} features. Got {len(state)}"
+            )
+        code = 0
+        for value, (low, high), radix in zip(state, self.ranges, self.radices):
+            if not low <= value <= high:
+                if not clamp:
+                    raise ValueError(
+                        f"{value} is out of the feature range ({low}, {high})"
+                    )
+                value = min(max(value, low), high)
+            code = code * radix + value - low
+        return code
+
+    def encode_array(self, states, clamp: bool = False) -> np.ndarray:
+        states = np.asarray(states, dtype=np.int64)
+        if states.ndim != 2 or states.shape[1] != len(self.ranges):
+            raise ValueError(
+                f"Expected states with {len(self.ranges)} features. Got {states.shape}"
+            )
+        states = states - self._lows
+        if clamp:
+            states = np.clip(states, 0, self._highs - self._lows)
+        elif (states < 0).any() or (states > self._highs - self._lows).any():
+            raise ValueError("Some states are out of the feature ranges")
+        return states @ self._place_values
+
+    def decode(self, code: int) -> Tuple[int, ...]:
+        if not 0 <= code < self.size:
+            raise ValueError(f"{code} is not a valid encoded state")
+        state = []
+        for (low, _), radix in zip(reversed(self.ranges), reversed(self.radices)):
+            code, value = divmod(code, radix)
+            state.append(value + low)
+        return tuple(reversed(state))
+
+    @property
+    def size(self) -> int:
+        size = 1
+        for radix in self.radices:
+            size *= radix
+        return size
+
+    def __eq__(self, other):
+        return isinstance(other, StateEncoder) and self.ranges == other.ranges
+
+    def __hash__(self):
+        return hash(self.ranges)
+
+    def __repr__(self):
+        return f"StateEncoder({list(self.ranges)})"
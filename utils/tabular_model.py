@@ -0,0 +1,105 @@
+#
+# A pokémon showdown battle-bot project based on reinforcement learning techniques.
+# Copyright (C) 2022 Matteo Dell'Acqua
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Helpers to exchange and merge updates of tabular models between processes.
+# A tabular model maps a state to [action values, state visits, action visits].
+import copy
+
+from typing import Dict, List, Optional
+
+from .action_space_init import init_action_space
+from .state_encoder import StateEncoder
+
+
+class TabularModel(dict):
+    def __init__(self, *args, state_encoder: Optional[StateEncoder] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.state_encoder = state_encoder
+
+
+def encode_model_states(model: dict, state_encoder: StateEncoder) -> TabularModel:
+    previous_encoder = getattr(model, "state_encoder", None)
+    if isinstance(model, TabularModel) and previous_encoder == state_encoder:
+        return model
+    encoded_model = TabularModel(state_encoder=state_encoder)
+    for state, value in model.items():
+        if isinstance(state, int) and previous_encoder is not None:
+            state = previous_encoder.decode(state)
+        if isinstance(state, tuple):
+            state = state_encoder.encode(state)
+        encoded_model[state] = value
+    return encoded_model
+
+
+def get_model_delta(base: dict, model: dict) -> dict:
+    delta = {}
+    for state, value in model.items():
+        if state not in base.keys():
+            delta[state] = copy.deepcopy(value)
+            continue
+        base_value = base[state]
+        if (
+            value[1] != base_value[1]
+            or value[2] != base_value[2]
+            or value[0] != base_value[0]
+        ):
+            delta[state] = copy.deepcopy(value)
+    return delta
+
+
+def apply_model_delta(model: dict, delta: dict) -> dict:
+    for state, value in delta.items():
+        model[state] = copy.deepcopy(value)
+    return model
+
+
+def merge_model_deltas(base: dict, deltas: List[Dict]) -> dict:
+    states = set()
+    for delta in deltas:
+        states.update(delta.keys())
+    for state in states:
+        updates = [delta[state] for delta in deltas if state in delta.keys()]
+        action_space_size = len(updates[0][0])
+        if state not in base.keys():
+            base[state] = [
+                init_action_space(action_space_size),
+                0,
+                init_action_space(action_space_size),
+            ]
+        base_value = base[state]
+        visits = base_value[1]
+        for update in updates:
+            visits += update[1] - base_value[1]
+        for action in range(action_space_size):
+            base_samples = base_value[2][action]
+            samples = base_samples
+            total = base_samples * base_value[0][action]
+            changed_values = []
+            for update in updates:
+                new_samples = update[2][action] - base_samples
+                if new_samples > 0:
+                    samples += new_samples
+                    total += new_samples * update[0][action]
+                elif update[0][action] != base_value[0][action]:
+                    changed_values.append(update[0][action])
+            if samples > base_samples:
+                base_value[0][action] = total / samples
+            elif len(changed_values) > 0:
+                base_value[0][action] = sum(changed_values) / len(changed_values)
+            base_value[2][action] = samples
+        base_value[1] = visits
+    return base